@@ -0,0 +1,190 @@
+import math
+import random
+from array import array
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import DIFFICULTY_PRIORS, Question, UserAbility, UserAnswer
+from .sampling import rating_band, rating_sampler
+
+DEFAULTS = {
+    'ENABLED': False,
+    'TARGET_SUCCESS': 0.7,
+    'SEEN_LIMIT': 200,
+}
+
+# Four options, so a blind guess is right a quarter of the time
+GUESS = 0.25
+# Elo-style step sizes, shrinking as a rating gathers evidence:
+# base / (1 + answers * STEP_DECAY), never below MIN_STEP
+USER_STEP = 0.4
+QUESTION_STEP = 0.2
+STEP_DECAY = 0.05
+MIN_STEP = 0.05
+
+# Seen-sets are stored as packed unsigned 64-bit ids
+SEEN_TYPECODE = 'Q'
+
+
+def adaptive_setting(name):
+    return getattr(settings, 'QUIZ_ADAPTIVE', {}).get(name, DEFAULTS[name])
+
+
+def success_probability(ability, difficulty):
+    """Chance of a correct answer: a logistic curve in ability - difficulty,
+    floored at the guessing rate"""
+    return GUESS + (1 - GUESS) / (1 + math.exp(difficulty - ability))
+
+
+def target_difficulty(ability):
+    """Difficulty a user of this ability answers correctly with TARGET_SUCCESS odds"""
+    target = min(max(adaptive_setting('TARGET_SUCCESS'), GUESS + 0.01), 0.99)
+    return ability - math.log((target - GUESS) / (1 - target))
+
+
+def step(base, answers):
+    return max(MIN_STEP, base / (1 + answers * STEP_DECAY))
+
+
+def unpack_seen(data):
+    seen = array(SEEN_TYPECODE)
+    seen.frombytes(bytes(data))
+    return seen
+
+
+def select_questions(user, category, k):
+    """Pick up to k questions of a category near the user's level.
+
+    One query reads the user's ability and seen-set for the category; the
+    questions are drawn from ``rating_sampler``'s band buckets, nearest to
+    the target difficulty first and skipping the seen-set, and one upsert
+    appends them to the seen-set. The user's answer history is never read.
+    """
+    row = UserAbility.objects.filter(user=user, category=category).values_list('rating', 'recent_questions').first()
+    ability, recent = row or (0.0, b'')
+    seen = unpack_seen(recent)
+    band = rating_band(target_difficulty(ability))
+    picked = rating_sampler.sample_near(k, category.id, band, avoid=set(seen))
+    random.shuffle(picked)
+    remember(user, category, seen, picked)
+    return picked
+
+
+def remember(user, category, seen, question_ids):
+    """Append served questions to a seen-set, keeping the newest SEEN_LIMIT"""
+    served = set(question_ids)
+    seen = array(SEEN_TYPECODE, [question_id for question_id in seen if question_id not in served])
+    seen.extend(question_ids)
+    del seen[:max(0, len(seen) - adaptive_setting('SEEN_LIMIT'))]
+    UserAbility.objects.bulk_create(
+        [UserAbility(user=user, category=category, recent_questions=seen.tobytes())],
+        update_conflicts=True, unique_fields=['user', 'category'], update_fields=['recent_questions']
+    )
+
+
+def record_session(session):
+    """Fold a just-completed session's answers into the ratings.
+
+    Called inside the transaction that completes the session; anonymous
+    sessions are ignored. Each answer, in order, moves the user's ability
+    in the question's category up and the question's difficulty down by
+    ``correct - expected``. Both are written as F-expression deltas,
+    mostly with one ``bulk_update`` each, so completions racing on the
+    same rows add up.
+    """
+    if not session.user_id:
+        return
+    answers = list(
+        UserAnswer.objects.filter(quiz_session_id=session.id).order_by('answered_at', 'id').values_list(
+            'question_id', 'question__category_id', 'question__rating', 'question__rating_answers', 'is_correct'
+        )
+    )
+    if not answers:
+        return
+    category_ids = {category_id for _, category_id, _, _, _ in answers}
+    stored = {row.category_id: row for row in UserAbility.objects.filter(
+        user_id=session.user_id, category_id__in=category_ids
+    ).only('id', 'category_id', 'rating', 'answers')}
+    # Category quizzes create the row when they start; mixed quizzes may
+    # reach categories the user has no row for yet
+    missing = category_ids - stored.keys()
+    if missing:
+        UserAbility.objects.bulk_create(
+            [UserAbility(user_id=session.user_id, category_id=category_id) for category_id in missing],
+            ignore_conflicts=True
+        )
+
+    start = {category_id: (row.rating, row.answers) for category_id, row in stored.items()}
+    start.update(dict.fromkeys(missing, (0.0, 0)))
+    current = dict(start)
+    ratings = {}
+    for question_id, category_id, difficulty, rated, is_correct in answers:
+        ability, count = current[category_id]
+        surprise = int(is_correct) - success_probability(ability, difficulty)
+        current[category_id] = (ability + step(USER_STEP, count) * surprise, count + 1)
+        ratings[question_id] = (category_id, difficulty, difficulty - step(QUESTION_STEP, rated) * surprise)
+
+    deltas = {
+        category_id: {
+            'rating': F('rating') + (current[category_id][0] - start[category_id][0]),
+            'answers': F('answers') + (current[category_id][1] - start[category_id][1]),
+        }
+        for category_id in category_ids
+    }
+    for category_id, row in stored.items():
+        row.rating, row.answers = deltas[category_id]['rating'], deltas[category_id]['answers']
+    if stored:
+        UserAbility.objects.bulk_update(stored.values(), ['rating', 'answers'])
+    # Rows created above have no primary key here
+    for category_id in missing:
+        UserAbility.objects.filter(user_id=session.user_id, category_id=category_id).update(**deltas[category_id])
+    Question.objects.bulk_update([
+        Question(id=question_id, rating=F('rating') + (new - old), rating_answers=F('rating_answers') + 1)
+        for question_id, (_, old, new) in ratings.items()
+    ], ['rating', 'rating_answers'])
+
+    def refile():
+        for question_id, (category_id, _, new) in ratings.items():
+            rating_sampler.add(question_id, category_id, rating_band(new))
+
+    transaction.on_commit(refile)
+
+
+def rebuild():
+    """Refit every rating by replaying all answers of completed, signed-in sessions.
+
+    Questions restart from their difficulty prior and abilities from zero;
+    seen-sets are kept. Returns the number of questions and ability rows
+    that have answers behind them.
+    """
+    questions = {
+        question_id: (DIFFICULTY_PRIORS.get(difficulty, 0.0), 0)
+        for question_id, difficulty in Question.objects.order_by().values_list('id', 'difficulty_level').iterator(chunk_size=5000)
+    }
+    abilities = {}
+    rows = UserAnswer.objects.filter(
+        quiz_session__user__isnull=False, quiz_session__completed_at__isnull=False
+    ).order_by('answered_at', 'id').values_list('quiz_session__user_id', 'question_id', 'question__category_id', 'is_correct')
+    for user_id, question_id, category_id, is_correct in rows.iterator(chunk_size=5000):
+        ability, count = abilities.get((user_id, category_id), (0.0, 0))
+        difficulty, rated = questions[question_id]
+        surprise = int(is_correct) - success_probability(ability, difficulty)
+        abilities[user_id, category_id] = (ability + step(USER_STEP, count) * surprise, count + 1)
+        questions[question_id] = (difficulty - step(QUESTION_STEP, rated) * surprise, rated + 1)
+
+    with transaction.atomic():
+        Question.objects.bulk_update(
+            [Question(id=question_id, rating=rating, rating_answers=rated) for question_id, (rating, rated) in questions.items()],
+            ['rating', 'rating_answers'], batch_size=1000
+        )
+        UserAbility.objects.update(rating=0.0, answers=0)
+        UserAbility.objects.bulk_create(
+            [UserAbility(user_id=user_id, category_id=category_id, rating=ability, answers=count)
+             for (user_id, category_id), (ability, count) in abilities.items()],
+            update_conflicts=True, unique_fields=['user', 'category'], update_fields=['rating', 'answers'],
+            batch_size=1000
+        )
+    transaction.on_commit(rating_sampler.reset)
+    return sum(1 for _, rated in questions.values() if rated), len(abilities)
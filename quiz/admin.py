@@ -2,7 +2,12 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import Category, Question, QuizSession, QuizQuestion, UserAnswer
+from django.db.models import Count, F, FloatField
+from django.db.models.functions import Cast, NullIf
+from .changelist import KeysetPaginationMixin
+from .counters import median_time
+from .models import Category, Question, QuestionCounters, QuestionStats, QuizSession, QuizQuestion, UserAnswer
+from .paginator import EstimatedCountPaginator
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -10,13 +15,26 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description']
     list_filter = ['created_at']
     readonly_fields = ['created_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(question_count=Count('questions'))
+    
+    def get_question_count(self, obj):
+        return obj.question_count
+    get_question_count.short_description = 'Questions'
+    get_question_count.admin_order_field = 'question_count'
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
-    list_display = ['question_text', 'category', 'correct_answer', 'difficulty_level', 'created_at']
+    list_display = ['question_text', 'category', 'correct_answer', 'difficulty_level', 'get_attempts',
+                    'get_accuracy', 'get_pick_rates', 'get_median_time', 'created_at']
+    # Live numbers come from the QuestionCounters row, joined in the list query
+    list_select_related = ['category', 'counters']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_filter = ['category', 'correct_answer', 'difficulty_level', 'created_at']
     search_fields = ['question_text', 'explanation']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'rating', 'rating_answers']
     fieldsets = (
         ('Question Details', {
             'fields': ('category', 'question_text', 'difficulty_level')
@@ -28,9 +46,40 @@ class QuestionAdmin(admin.ModelAdmin):
             'fields': ('explanation', 'explanation_a', 'explanation_b', 'explanation_c', 'explanation_d')
         }),
         ('Additional Info', {
-            'fields': ('reference_link', 'created_at', 'updated_at')
+            'fields': ('reference_link', 'rating', 'rating_answers', 'created_at', 'updated_at')
         }),
     )
+    
+    def get_counters(self, obj):
+        try:
+            return obj.counters
+        except QuestionCounters.DoesNotExist:
+            return None
+    
+    def get_attempts(self, obj):
+        counters = self.get_counters(obj)
+        return counters.attempts if counters else 0
+    get_attempts.short_description = 'Attempts'
+    get_attempts.admin_order_field = 'counters__attempts'
+    
+    def get_accuracy(self, obj):
+        counters = self.get_counters(obj)
+        accuracy = counters.get_accuracy() if counters else None
+        return '-' if accuracy is None else f"{accuracy}%"
+    get_accuracy.short_description = 'Accuracy'
+    get_accuracy.admin_order_field = Cast('counters__correct', FloatField()) / NullIf(F('counters__attempts'), 0)
+    
+    def get_pick_rates(self, obj):
+        counters = self.get_counters(obj)
+        rates = counters.get_pick_rates() if counters else {}
+        return ' · '.join(f"{option} {rate}%" for option, rate in rates.items()) or '-'
+    get_pick_rates.short_description = 'Picks'
+    
+    def get_median_time(self, obj):
+        counters = self.get_counters(obj)
+        median = median_time(counters) if counters else None
+        return '-' if median is None else f"{median:.1f}s"
+    get_median_time.short_description = 'Median time'
 
 class QuizQuestionInline(admin.TabularInline):
     model = QuizQuestion
@@ -41,22 +90,47 @@ class UserAnswerInline(admin.TabularInline):
     model = UserAnswer
     extra = 0
     readonly_fields = ['question', 'selected_answer', 'is_correct', 'answered_at']
+    
+    def get_queryset(self, request):
+        # Question.__str__ shows the category name
+        return super().get_queryset(request).select_related('question__category')
 
 @admin.register(QuizSession)
-class QuizSessionAdmin(admin.ModelAdmin):
+class QuizSessionAdmin(KeysetPaginationMixin, admin.ModelAdmin):
     list_display = ['__str__', 'user', 'category', 'is_mixed', 'score', 'total_questions', 'get_percentage', 'started_at', 'completed_at']
     list_filter = ['category', 'is_mixed', 'started_at', 'completed_at']
+    list_select_related = ['user', 'category']
     search_fields = ['user__username', 'session_key']
+    raw_id_fields = ['user']
     readonly_fields = ['started_at', 'get_percentage']
     inlines = [UserAnswerInline]
+    ordering = keyset_ordering = ['-started_at', '-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     def get_percentage(self, obj):
         return f"{obj.get_percentage()}%"
     get_percentage.short_description = 'Score %'
+    get_percentage.admin_order_field = Cast('score', FloatField()) / NullIf(F('total_questions'), 0)
 
 @admin.register(UserAnswer)
-class UserAnswerAdmin(admin.ModelAdmin):
+class UserAnswerAdmin(KeysetPaginationMixin, admin.ModelAdmin):
     list_display = ['quiz_session', 'question', 'selected_answer', 'is_correct', 'answered_at']
     list_filter = ['is_correct', 'selected_answer', 'answered_at']
+    # Both __str__ methods show a category name
+    list_select_related = ['quiz_session__category', 'question__category']
+    search_fields = ['question__question_text']
+    raw_id_fields = ['quiz_session', 'question']
+    readonly_fields = ['answered_at']
+    ordering = keyset_ordering = ['-answered_at', '-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+@admin.register(QuestionStats)
+class QuestionStatsAdmin(admin.ModelAdmin):
+    list_display = ['question', 'answers', 'p_value', 'discrimination', 'rate_a', 'rate_b', 'rate_c', 'rate_d', 'median_time', 'flagged']
+    list_filter = ['flagged', 'question__category']
+    list_select_related = ['question__category']
     search_fields = ['question__question_text']
-    readonly_fields = ['answered_at']
\ No newline at end of file
+    ordering = ['discrimination']
+    readonly_fields = [field.name for field in QuestionStats._meta.fields]
@@ -0,0 +1,55 @@
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+
+from .paginator import InvalidCursor, KeysetPaginator
+
+CURSOR_VAR = 'cursor'
+
+
+class KeysetChangeList(ChangeList):
+    """Changelist that pages through the default ordering by cursor.
+
+    Sorting by a column falls back to numbered pages. The result count
+    still comes from the model admin's paginator.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Filter, search and sort links start again from the first page
+        if CURSOR_VAR not in (new_params or {}):
+            remove = [*(remove or []), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        self.keyset_page = None
+        if ORDER_VAR in self.params:
+            return super().get_results(request)
+        paginator = KeysetPaginator(self.queryset, self.list_per_page, self.model_admin.keyset_ordering)
+        try:
+            page = paginator.page(self.params.get(CURSOR_VAR))
+        except InvalidCursor:
+            raise IncorrectLookupParameters
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = page.object_list
+        self.can_show_all = False
+        self.multi_page = page.has_other_pages()
+        self.keyset_page = page
+        self.next_page_url = page.has_next() and self.get_query_string({CURSOR_VAR: page.next_cursor})
+        self.previous_page_url = page.has_previous() and self.get_query_string({CURSOR_VAR: page.previous_cursor})
+
+
+class KeysetPaginationMixin:
+    """ModelAdmin mixin paging the changelist by ``keyset_ordering`` cursors"""
+    keyset_ordering = None
+    change_list_template = 'admin/quiz/keyset_change_list.html'
+    
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
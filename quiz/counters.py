@@ -0,0 +1,120 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+
+from .models import QuestionCounters, UserAnswer
+
+# Upper bound in seconds of each time_taken bucket, None for the last one
+TIME_BUCKETS = [
+    (5, 'time_lt_5'), (10, 'time_lt_10'), (15, 'time_lt_15'), (20, 'time_lt_20'),
+    (25, 'time_lt_25'), (30, 'time_lt_30'), (None, 'time_ge_30'),
+]
+OPTION_FIELDS = {'A': 'picks_a', 'B': 'picks_b', 'C': 'picks_c', 'D': 'picks_d'}
+# Questions per upsert statement, keeping SQLite's bound parameters in check
+UPSERT_BATCH_SIZE = 50
+FIELDS = ['attempts', 'correct', *OPTION_FIELDS.values(), 'time_total', *(field for _, field in TIME_BUCKETS)]
+
+
+def time_bucket(seconds):
+    for bound, field in TIME_BUCKETS:
+        if bound is None or seconds < bound:
+            return field
+
+
+def tally(answers):
+    """Per-question counter increments of a batch of answers"""
+    totals = {}
+    for answer in answers:
+        counts = totals.setdefault(answer.question_id, Counter())
+        counts['attempts'] += 1
+        counts['correct'] += int(answer.is_correct)
+        counts[OPTION_FIELDS[answer.selected_answer]] += 1
+        if answer.time_taken is not None:
+            seconds = answer.time_taken.total_seconds()
+            counts['time_total'] += seconds
+            counts[time_bucket(seconds)] += 1
+    return totals
+
+
+def record(answers):
+    """Add just-written answers to their questions' counters.
+
+    The batch is summed per question in memory and written with one
+    ``INSERT ... ON CONFLICT DO UPDATE`` that adds the sums to the stored
+    counters (creating rows for first-time questions), so concurrent
+    writers never lose a count. The ORM's upsert can only overwrite
+    columns, hence the raw SQL; SQLite and PostgreSQL share the syntax.
+    """
+    totals = list(tally(answers).items())
+    quote = connection.ops.quote_name
+    table = quote(QuestionCounters._meta.db_table)
+    columns = ['question_id', *FIELDS]
+    row = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    increments = ', '.join(f'{quote(field)} = {table}.{quote(field)} + excluded.{quote(field)}' for field in FIELDS)
+    with connection.cursor() as cursor:
+        for start in range(0, len(totals), UPSERT_BATCH_SIZE):
+            batch = totals[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(quote(column) for column in columns)}) '
+                f'VALUES {", ".join([row] * len(batch))} '
+                f'ON CONFLICT ({quote("question_id")}) DO UPDATE SET {increments}',
+                [value for question_id, counts in batch for value in (question_id, *(counts[field] for field in FIELDS))]
+            )
+
+
+def median_time(counters):
+    """Median time taken in seconds, interpolated within its bucket.
+
+    None without timed answers; answers of 30 seconds or more are counted
+    as exactly 30.
+    """
+    counts = [getattr(counters, field) for _, field in TIME_BUCKETS]
+    timed = sum(counts)
+    if not timed:
+        return None
+    remaining = timed / 2
+    lower = 0
+    for (bound, _), count in zip(TIME_BUCKETS, counts):
+        if bound is None:
+            return lower
+        if count and remaining <= count:
+            return lower + (bound - lower) * remaining / count
+        remaining -= count
+        lower = bound
+
+
+def compute():
+    """Counters recomputed from raw UserAnswer rows, as ``{question_id: {field: value}}``"""
+    aggregates = {
+        'attempts': Count('id'),
+        'correct': Count('id', filter=Q(is_correct=True)),
+        'time_total': Sum('time_taken'),
+        **{field: Count('id', filter=Q(selected_answer=option)) for option, field in OPTION_FIELDS.items()},
+    }
+    lower = 0
+    for bound, field in TIME_BUCKETS:
+        timed = Q(time_taken__gte=timedelta(seconds=lower))
+        if bound is not None:
+            timed &= Q(time_taken__lt=timedelta(seconds=bound))
+        aggregates[field] = Count('id', filter=timed)
+        lower = bound
+    counters = {}
+    for row in UserAnswer.objects.order_by().values('question_id').annotate(**aggregates).iterator(chunk_size=5000):
+        question_id = row.pop('question_id')
+        row['time_total'] = row['time_total'].total_seconds() if row['time_total'] else 0.0
+        counters[question_id] = row
+    return counters
+
+
+def rebuild():
+    """Replace every question's counters with freshly computed ones"""
+    counters = compute()
+    with transaction.atomic():
+        QuestionCounters.objects.all().delete()
+        QuestionCounters.objects.bulk_create(
+            [QuestionCounters(question_id=question_id, **values) for question_id, values in counters.items()],
+            batch_size=1000
+        )
+    return len(counters)
@@ -0,0 +1,80 @@
+import time
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils.functional import SimpleLazyObject
+
+from .models import Category, QuizSession
+
+# The catalog only changes when a Category or Question is edited, which
+# bumps its version in the default cache. Unless CACHES names a backend
+# shared between processes, that is each worker's own memory, and only the
+# editing worker sees the bump; the others serve their copy until it
+# expires, so it is kept for a few minutes at most. The recent sessions
+# block is simply short-lived
+CATALOG_TIMEOUT = 5 * 60
+RECENT_SESSIONS_TIMEOUT = 30
+RECENT_SESSIONS = 5
+
+VERSION_KEY = 'quiz:home:version'
+
+
+def catalog_version():
+    """Current catalog version, as stored in the default cache"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # A fresh value, so entries written before an eviction are never reused
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_catalog():
+    """Retire the cached catalog and home page fragments"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+
+
+def catalog(version=None):
+    """Categories with their question counts, plus the totals shown on the home page.
+
+    Computed with one annotated query and cached under the catalog version.
+    """
+    key = f'quiz:home:catalog:{version or catalog_version()}'
+    data = cache.get(key)
+    if data is None:
+        categories = list(Category.objects.annotate(question_count=Count('questions')))
+        data = {
+            'categories': categories,
+            'total_categories': len(categories),
+            'total_questions': sum(category.question_count for category in categories),
+        }
+        cache.set(key, data, CATALOG_TIMEOUT)
+    return data
+
+
+def recent_sessions():
+    return list(
+        QuizSession.objects.filter(completed_at__isnull=False)
+        .select_related('category')
+        .order_by('-completed_at')[:RECENT_SESSIONS]
+    )
+
+
+def home_context():
+    """Template context for the home page.
+
+    The data is loaded lazily: the template renders it inside ``{% cache %}``
+    fragments keyed by ``catalog_version``, so a cached fragment is served
+    as precomputed HTML without touching the catalog cache or the database.
+    """
+    version = catalog_version()
+    return {
+        'catalog_version': version,
+        'catalog': SimpleLazyObject(lambda: catalog(version)),
+        'catalog_timeout': CATALOG_TIMEOUT,
+        'recent_sessions': SimpleLazyObject(recent_sessions),
+        'recent_sessions_timeout': RECENT_SESSIONS_TIMEOUT,
+    }
@@ -0,0 +1,153 @@
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .home import invalidate_catalog
+from .models import Category, Question
+from .payloads import question_payloads
+from .sampling import question_sampler, rating_sampler
+
+# Column order of exported files; "category" holds the category name
+FIELDS = [
+    'category', 'question_text', 'option_a', 'option_b', 'option_c', 'option_d',
+    'correct_answer', 'explanation', 'explanation_a', 'explanation_b', 'explanation_c',
+    'explanation_d', 'reference_link', 'difficulty_level',
+]
+QUESTION_FIELDS = FIELDS[1:]
+UPDATE_FIELDS = [field for field in QUESTION_FIELDS if field not in ('question_text', 'option_a', 'option_b', 'option_c', 'option_d')]
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    """Yield (line_number, dict) pairs from a CSV or JSONL stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(stream, 1):
+            if line.strip():
+                yield line_number, json.loads(line)
+
+
+def write_rows(stream, fmt, rows):
+    """Write dict rows to a CSV or JSONL stream"""
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def export_rows(queryset=None, chunk_size=2000):
+    """Stream questions as dict rows without loading the table into memory"""
+    queryset = Question.objects.all() if queryset is None else queryset
+    columns = ['category__name', *QUESTION_FIELDS]
+    for values in queryset.order_by('id').values_list(*columns).iterator(chunk_size=chunk_size):
+        yield dict(zip(FIELDS, values))
+
+
+class QuestionImporter:
+    """Validate, dedupe and upsert question rows in batches.
+
+    Rows are matched to existing questions through the indexed
+    ``Question.content_hash`` column, one ``content_hash__in`` query per
+    batch; a match updates the remaining fields instead of inserting a
+    duplicate. Each batch is written in its own transaction with
+    ``bulk_create`` and ``bulk_update``.
+    """
+
+    def __init__(self, batch_size=2000, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.categories = {c.name: c for c in Category.objects.all()}
+        self.created = self.updated = self.skipped = 0
+        self.errors = []
+
+    def category(self, name):
+        if name not in self.categories:
+            if self.dry_run:
+                self.categories[name] = Category(name=name)
+            else:
+                self.categories[name], _ = Category.objects.get_or_create(name=name)
+        return self.categories[name]
+
+    def build(self, line_number, row):
+        """Return a validated, unsaved Question or None after recording the error"""
+        name = (row.get('category') or '').strip()
+        if not name:
+            self.errors.append((line_number, {'category': ['This field cannot be blank.']}))
+            return None
+        values = {field: (row.get(field) or '').strip() for field in QUESTION_FIELDS}
+        values['correct_answer'] = values['correct_answer'].upper()
+        values['difficulty_level'] = values['difficulty_level'].lower() or 'medium'
+        question = Question(category=self.category(name), **values)
+        try:
+            # Field constraints only; duplicates are resolved per batch
+            question.clean_fields(exclude=['category'])
+        except ValidationError as e:
+            self.errors.append((line_number, e.message_dict))
+            return None
+        question.content_hash = question.compute_content_hash()
+        question.reset_rating()
+        return question
+
+    def run(self, rows):
+        batch = {}
+        for line_number, row in rows:
+            question = self.build(line_number, row)
+            if question is None:
+                continue
+            key = question.content_hash
+            if key in batch:
+                self.skipped += 1
+            batch[key] = question
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = {}
+        if batch:
+            self.flush(batch)
+        return self
+
+    def flush(self, batch):
+        creates, updates, unrated = [], [], []
+        now = timezone.now()
+        known = {
+            key: (question_id, rated)
+            for key, question_id, rated in Question.objects.filter(content_hash__in=batch).values_list(
+                'content_hash', 'id', 'rating_answers'
+            )
+        }
+        for key, question in batch.items():
+            if key in known:
+                question.id, rated = known[key]
+                question.updated_at = now
+                # Unrated questions take the prior of their (maybe new) difficulty
+                (updates if rated else unrated).append(question)
+            else:
+                creates.append(question)
+        if not self.dry_run:
+            fields = [*UPDATE_FIELDS, 'category', 'updated_at']
+            with transaction.atomic():
+                Question.objects.bulk_create(creates)
+                Question.objects.bulk_update(updates, fields)
+                Question.objects.bulk_update(unrated, [*fields, 'rating'])
+            question_payloads.invalidate(*(q.id for q in updates + unrated))
+        self.created += len(creates)
+        self.updated += len(updates) + len(unrated)
+
+    def finish(self):
+        """Let this process's question index and the home page see the bulk changes"""
+        if not self.dry_run and (self.created or self.updated):
+            question_sampler.reset()
+            rating_sampler.reset()
+            invalidate_catalog()
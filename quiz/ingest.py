@@ -0,0 +1,223 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, connections
+from django.db.models import Exists, OuterRef
+
+from .models import QuizQuestion, UserAnswer
+from .services import grade_answer, write_answers
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'MAX_QUEUE': 10000,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL_MS': 50,
+    'PUT_TIMEOUT': 1.0,
+    'SYNC_TIMEOUT': 5.0,
+}
+
+ANSWER_OPTIONS = {'A', 'B', 'C', 'D'}
+NOT_IN_SESSION = 'Question is not part of this session'
+
+
+def write_behind_setting(name):
+    return getattr(settings, 'QUIZ_ANSWER_WRITE_BEHIND', {}).get(name, DEFAULTS[name])
+
+
+class AnswerQueueFull(Exception):
+    """The write-behind queue stayed full for PUT_TIMEOUT seconds"""
+
+
+class AnswerWriter:
+    """Bounded in-process queue of graded answers with a background writer.
+
+    ``submit`` validates, grades and enqueues an answer; the writer thread
+    flushes the queue with ``write_answers`` every FLUSH_INTERVAL_MS or
+    BATCH_SIZE answers, whichever comes first. A batch that fails is
+    retried one answer at a time, so a bad answer only loses itself. Pending answers are counted per
+    session so ``sync`` can block a read until that session's writes are
+    visible. The thread is started on first use and drained at exit; with
+    ``background=False`` nothing is written until ``flush`` is called.
+    """
+
+    def __init__(self, background=True):
+        self.background = background
+        self._queue = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._pending = {}
+        self._pending_keys = set()
+        self._flushed = threading.Condition()
+
+    def _ensure_started(self):
+        if self._queue is not None:
+            return
+        with self._start_lock:
+            if self._queue is not None:
+                return
+            self._queue = queue.Queue(maxsize=write_behind_setting('MAX_QUEUE'))
+            if not self.background:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='quiz-answer-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def submit(self, session, question_id, selected_answer, correct_answer, time_taken=0):
+        """Grade an answer and queue it for writing.
+
+        The client is told the answer was accepted before it is written, so
+        anything the writer would reject is refused here: ``ValueError`` for
+        a missing or unknown option or a question outside the session,
+        ``IntegrityError`` if the same answer is already pending or stored
+        and ``AnswerQueueFull`` when the queue does not drain in time.
+        """
+        question_id, answered = self._checked(session, question_id, selected_answer)
+        self._refuse_answered(answered.first())
+        return self._enqueue(grade_answer(session, question_id, selected_answer, correct_answer, time_taken))
+
+    def _checked(self, session, question_id, selected_answer):
+        """Validate an answer's fields; returns its question id and a query
+        of whether the question was answered, empty outside the session"""
+        question_id = int(question_id)
+        if selected_answer not in ANSWER_OPTIONS:
+            raise ValueError('Invalid answer')
+        return question_id, QuizQuestion.objects.filter(
+            quiz_session_id=session.id,
+            question_id=question_id
+        ).annotate(answered=Exists(UserAnswer.objects.filter(
+            quiz_session_id=OuterRef('quiz_session_id'),
+            question_id=OuterRef('question_id')
+        ))).values_list('answered', flat=True)
+
+    @staticmethod
+    def _refuse_answered(answered):
+        if answered is None:
+            raise ValueError(NOT_IN_SESSION)
+        if answered:
+            raise IntegrityError('Answer already submitted')
+
+    def _enqueue(self, answer):
+        self._ensure_started()
+        key = (answer.quiz_session_id, answer.question_id)
+        with self._flushed:
+            if key in self._pending_keys:
+                raise IntegrityError('Answer already submitted')
+            self._pending_keys.add(key)
+            self._pending[key[0]] = self._pending.get(key[0], 0) + 1
+        try:
+            self._queue.put(answer, timeout=write_behind_setting('PUT_TIMEOUT'))
+        except queue.Full:
+            self._release([answer])
+            raise AnswerQueueFull('Too many answers waiting to be saved')
+        return answer
+
+    def sync(self, session_id, timeout=None):
+        """Wait until every queued answer of a session has been written"""
+        if timeout is None:
+            timeout = write_behind_setting('SYNC_TIMEOUT')
+        with self._flushed:
+            return self._flushed.wait_for(lambda: session_id not in self._pending, timeout)
+
+    async def asubmit(self, session, question_id, selected_answer, correct_answer, time_taken=0):
+        """Async ``submit``: the session check uses the async ORM and a full
+        queue is waited on in a worker thread"""
+        question_id, answered = self._checked(session, question_id, selected_answer)
+        self._refuse_answered(await answered.afirst())
+        answer = grade_answer(session, question_id, selected_answer, correct_answer, time_taken)
+        return await sync_to_async(self._enqueue, thread_sensitive=False)(answer)
+
+    async def await_written(self, session_id, timeout=None):
+        """Async ``sync``; returns at once when none of the session's answers are queued"""
+        with self._flushed:
+            if session_id not in self._pending:
+                return True
+        return await sync_to_async(self.sync, thread_sensitive=False)(session_id, timeout)
+
+    def _release(self, answers):
+        with self._flushed:
+            for answer in answers:
+                session_id = answer.quiz_session_id
+                self._pending_keys.discard((session_id, answer.question_id))
+                self._pending[session_id] -= 1
+                if not self._pending[session_id]:
+                    del self._pending[session_id]
+            self._flushed.notify_all()
+
+    def _take_batch(self, block):
+        batch_size = write_behind_setting('BATCH_SIZE')
+        interval = write_behind_setting('FLUSH_INTERVAL_MS') / 1000
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=interval) if block else self._queue.get_nowait())
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + interval
+        while len(batch) < batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if block and remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        try:
+            try:
+                write_answers(batch)
+            except Exception:
+                logger.warning('Failed to write %d quiz answers, retrying one by one', len(batch), exc_info=True)
+                for answer in batch:
+                    try:
+                        write_answers([answer])
+                    except Exception:
+                        logger.exception(
+                            'Failed to write quiz answer for session %s, question %s',
+                            answer.quiz_session_id, answer.question_id
+                        )
+        finally:
+            self._release(batch)
+
+    def flush(self):
+        """Write everything currently queued from the calling thread"""
+        while self._queue is not None:
+            batch = self._take_batch(block=False)
+            if not batch:
+                break
+            self._flush(batch)
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                batch = self._take_batch(block=True)
+                if batch:
+                    self._flush(batch)
+            self.flush()
+        finally:
+            connections.close_all()
+
+    def stop(self, timeout=None):
+        """Stop the writer thread after draining the queue"""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            thread.join(timeout)
+            atexit.unregister(self.stop)
+        self.flush()
+        self._queue = None
+
+
+def write_behind_enabled():
+    return write_behind_setting('ENABLED')
+
+
+answer_writer = AnswerWriter()
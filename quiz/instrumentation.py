@@ -0,0 +1,126 @@
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+
+DEFAULTS = {
+    'SERVER_TIMING': False,
+    'STRICT_BUDGETS': False,
+}
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+# Recorder of the request being served. asgiref copies the context into the
+# threads that run a request's sync code and async ORM calls, so queries are
+# credited to their own request whichever thread or connection runs them
+current_recorder = ContextVar('quiz_query_recorder', default=None)
+
+
+def instrumentation_setting(name):
+    return getattr(settings, 'QUIZ_INSTRUMENTATION', {}).get(name, DEFAULTS[name])
+
+
+def fingerprint(sql):
+    """Normalize a parameterized statement so N+1 repeats compare equal"""
+    return IN_LIST.sub('IN (...)', sql)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view issued more queries than its declared budget"""
+
+
+def query_budget(max_queries):
+    """Declare the most SQL queries a view may issue per request"""
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+class QueryRecorder:
+    """Execute wrapper that times statements and tallies their fingerprints"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+
+def record_queries(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection; feeds ``current_recorder``"""
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver adding ``record_queries`` to a connection"""
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+class QueryStats:
+    """Per-view aggregate of recorded requests, kept in process memory"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def record(self, view_name, recorder, render_time, total_time):
+        with self._lock:
+            view = self._views.setdefault(view_name, {
+                'requests': 0,
+                'queries': 0,
+                'max_queries': 0,
+                'db_ms': 0.0,
+                'render_ms': 0.0,
+                'total_ms': 0.0,
+                'duplicates': Counter(),
+            })
+            view['requests'] += 1
+            view['queries'] += recorder.count
+            view['max_queries'] = max(view['max_queries'], recorder.count)
+            view['db_ms'] += recorder.duration * 1000
+            view['render_ms'] += render_time * 1000
+            view['total_ms'] += total_time * 1000
+            view['duplicates'].update(recorder.duplicates())
+
+    def report(self):
+        """JSON-serializable per-view summary with per-request averages"""
+        with self._lock:
+            report = {}
+            for view_name, view in sorted(self._views.items()):
+                requests = view['requests']
+                report[view_name] = {
+                    'requests': requests,
+                    'avg_queries': round(view['queries'] / requests, 2),
+                    'max_queries': view['max_queries'],
+                    'avg_db_ms': round(view['db_ms'] / requests, 3),
+                    'avg_render_ms': round(view['render_ms'] / requests, 3),
+                    'avg_total_ms': round(view['total_ms'] / requests, 3),
+                    'duplicate_queries': dict(view['duplicates'].most_common(10)),
+                }
+            return report
+
+
+query_stats = QueryStats()
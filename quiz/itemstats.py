@@ -0,0 +1,172 @@
+import itertools
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.utils import timezone
+
+from .models import Question, QuestionStats, UserAnswer
+from .sampling import rating_sampler
+
+OPTIONS = 'ABCD'
+# time_taken is counted in whole-second bins; the last bin also takes
+# everything slower. The quiz allows 30 seconds a question
+TIME_BINS = 61
+# Questions whose median time is worked out at once in results()
+MEDIAN_BLOCK = 10000
+# Questions with fewer answers are never flagged
+MIN_ANSWERS = 30
+
+# Columns streamed from UserAnswer; ``completed`` is annotated in compute()
+FIELDS = [
+    'question_id', 'is_correct', 'selected_answer', 'time_taken',
+    'quiz_session__score', 'quiz_session__total_questions', 'completed',
+]
+
+
+class Totals:
+    """Per-question running sums, one array row per question.
+
+    Memory is proportional to the number of questions (TIME_BINS 32-bit
+    counters each), not to the number of answers folded in; folding a
+    chunk only allocates arrays the size of the chunk.
+    """
+
+    def __init__(self, question_ids):
+        self.question_ids = question_ids
+        n = len(question_ids)
+        self.answers = np.zeros(n, np.int64)
+        self.correct = np.zeros(n, np.int64)
+        self.choices = np.zeros((n, len(OPTIONS)), np.int64)
+        self.times = np.zeros((n, TIME_BINS), np.int32)
+        # Sums for correlating correctness (x) with the rest score (y)
+        self.scored = np.zeros(n, np.int64)
+        self.sum_x = np.zeros(n)
+        self.sum_y = np.zeros(n)
+        self.sum_xy = np.zeros(n)
+        self.sum_yy = np.zeros(n)
+
+    def bincount(self, index, weights=None, width=1):
+        counts = np.bincount(index, weights, minlength=len(self.question_ids) * width)
+        return counts.reshape(-1, width) if width > 1 else counts
+
+    def add(self, rows):
+        """Fold a chunk of ``FIELDS`` rows into the sums"""
+        if not len(self.question_ids):
+            return
+        question_id, is_correct, selected, time_taken, score, total, completed = zip(*rows)
+        question_id = np.array(question_id, np.int64)
+        index = np.searchsorted(self.question_ids, question_id).clip(max=len(self.question_ids) - 1)
+        # Answers to questions created after the job started are left out
+        known = self.question_ids[index] == question_id
+        index = index[known]
+        x = np.array(is_correct, np.float64)[known]
+        self.answers += self.bincount(index)
+        self.correct += self.bincount(index, x).astype(np.int64)
+
+        choice = np.frombuffer(''.join(selected).encode(), np.uint8).astype(np.int64)[known] - ord('A')
+        valid = (choice >= 0) & (choice < len(OPTIONS))
+        self.choices += self.bincount(index[valid] * len(OPTIONS) + choice[valid], width=len(OPTIONS))
+
+        seconds = np.array([t.total_seconds() if t is not None else np.nan for t in time_taken])[known]
+        timed = ~np.isnan(seconds)
+        bins = np.clip(seconds[timed], 0, TIME_BINS - 1).astype(np.int64)
+        np.add.at(self.times, (index[timed], bins), 1)
+
+        # The rest score leaves this answer out of its own session's score
+        score, total = np.array(score, np.float64)[known], np.array(total, np.float64)[known]
+        rated = np.array(completed, bool)[known] & (total > 1)
+        i, x = index[rated], x[rated]
+        y = (score[rated] - x) / (total[rated] - 1)
+        self.scored += self.bincount(i)
+        self.sum_x += self.bincount(i, x)
+        self.sum_y += self.bincount(i, y)
+        self.sum_xy += self.bincount(i, x * y)
+        self.sum_yy += self.bincount(i, y * y)
+
+    def results(self):
+        """Statistics arrays for every question, NaN where undefined"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            answers = self.answers.astype(np.float64)
+            p_value = self.correct / answers
+            rates = self.choices / answers[:, None]
+
+            # Point-biserial correlation; x is 0/1, so sum(x * x) == sum(x)
+            m = self.scored.astype(np.float64)
+            mean_x, mean_y = self.sum_x / m, self.sum_y / m
+            var_x = self.sum_x / m - mean_x ** 2
+            var_y = self.sum_yy / m - mean_y ** 2
+            discrimination = (self.sum_xy / m - mean_x * mean_y) / np.sqrt(var_x * var_y)
+            discrimination[(m < 2) | (var_x <= 0) | (var_y <= 0)] = np.nan
+
+            # Median bin: the first whose running count reaches half the
+            # answers, in blocks of questions to bound the temporaries
+            median = np.full(len(self.question_ids), np.nan)
+            for start in range(0, len(self.question_ids), MEDIAN_BLOCK):
+                running = self.times[start:start + MEDIAN_BLOCK].cumsum(axis=1)
+                timed = running[:, -1]
+                block = (running < (timed / 2)[:, None]).sum(axis=1) + 0.5
+                median[start:start + MEDIAN_BLOCK] = np.where(timed > 0, block, np.nan)
+
+        key = p_value[:, None]
+        flagged = (self.answers >= MIN_ANSWERS) & (
+            (discrimination < 0) | (rates > key).any(axis=1)
+        )
+        return {
+            'answers': self.answers, 'p_value': p_value, 'discrimination': discrimination,
+            'rates': rates, 'median_time': median, 'flagged': flagged,
+        }
+
+
+def compute(chunk_size=50000):
+    """Item statistics over every stored answer.
+
+    Answers are streamed in chunks of ``chunk_size`` rows; each chunk is
+    turned into NumPy arrays and folded into per-question sums with
+    ``bincount``, so memory stays bounded however many answers there are.
+    Returns unsaved QuestionStats for the questions that have answers and
+    the number of answers read.
+    """
+    question_ids = np.fromiter(
+        Question.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=chunk_size), np.int64
+    )
+    totals = Totals(question_ids)
+    rows = UserAnswer.objects.order_by().annotate(
+        completed=ExpressionWrapper(Q(quiz_session__completed_at__isnull=False), output_field=BooleanField())
+    ).values_list(*FIELDS).iterator(chunk_size=chunk_size)
+    read = 0
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        totals.add(chunk)
+        read += len(chunk)
+
+    results = totals.results()
+    now = timezone.now()
+    stats = []
+    for i in np.flatnonzero(results['answers']):
+        rates = results['rates'][i]
+        median = results['median_time'][i]
+        discrimination = results['discrimination'][i]
+        stats.append(QuestionStats(
+            question_id=int(question_ids[i]),
+            answers=int(results['answers'][i]),
+            p_value=float(results['p_value'][i]),
+            discrimination=None if np.isnan(discrimination) else float(discrimination),
+            rate_a=float(rates[0]), rate_b=float(rates[1]), rate_c=float(rates[2]), rate_d=float(rates[3]),
+            median_time=None if np.isnan(median) else timedelta(seconds=float(median)),
+            flagged=bool(results['flagged'][i]),
+            computed_at=now,
+        ))
+    return stats, read
+
+
+def store(stats):
+    """Replace the stored item statistics.
+
+    Flagged questions leave the adaptive selector's buckets once the new
+    rows are committed.
+    """
+    with transaction.atomic():
+        QuestionStats.objects.all().delete()
+        QuestionStats.objects.bulk_create(stats, batch_size=1000)
+        transaction.on_commit(rating_sampler.reset)
@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField
+
+from .models import Category, LeaderboardEntry, QuizSession
+
+# Rows kept per board; the page shows the first 20
+LEADERBOARD_SIZE = 50
+
+RANKING = ['-percentage', '-score', 'started_at', 'id']
+
+
+def make_entry(session, board):
+    """Denormalize a completed session into a row of the given board"""
+    return LeaderboardEntry(
+        category=board,
+        session=session,
+        username=session.user.username if session.user else '',
+        category_name=session.category.name if session.category else '',
+        category_icon=session.category.icon if session.category else '',
+        score=session.score,
+        total_questions=session.total_questions,
+        percentage=session.score * 100.0 / session.total_questions,
+        started_at=session.started_at,
+    )
+
+
+def trim_board(board):
+    """Drop rows ranked below LEADERBOARD_SIZE on one board"""
+    stale = list(
+        LeaderboardEntry.objects.filter(category=board).order_by(*RANKING).values_list('id', flat=True)[LEADERBOARD_SIZE:]
+    )
+    if stale:
+        LeaderboardEntry.objects.filter(id__in=stale).delete()
+
+
+def record_session(session):
+    """Add a just-completed session to the global board and its category board"""
+    if not session.total_questions:
+        return
+    boards = [None] + ([session.category] if session.category else [])
+    with transaction.atomic():
+        LeaderboardEntry.objects.bulk_create([make_entry(session, board) for board in boards])
+        for board in boards:
+            trim_board(board)
+
+
+def top_entries(category=None, limit=20):
+    return LeaderboardEntry.objects.filter(category=category).order_by(*RANKING)[:limit]
+
+
+def rebuild():
+    """Recompute every board from completed QuizSession rows"""
+    ranked = QuizSession.objects.filter(
+        completed_at__isnull=False,
+        total_questions__gt=0
+    ).annotate(
+        percentage=ExpressionWrapper(F('score') * 100.0 / F('total_questions'), output_field=FloatField())
+    ).select_related('user', 'category').order_by(*RANKING)
+
+    entries = [make_entry(session, None) for session in ranked[:LEADERBOARD_SIZE]]
+    for category in Category.objects.all():
+        entries.extend(
+            make_entry(session, category)
+            for session in ranked.filter(category=category)[:LEADERBOARD_SIZE]
+        )
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(entries)
+    return len(entries)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from quiz.models import Question
+
+class Command(BaseCommand):
+    help = 'Fill in the content hash of questions saved before it existed, reporting duplicates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Questions hashed per bulk update')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Backfilling question content hashes...')
+        seen = set(Question.objects.filter(content_hash__isnull=False).values_list('content_hash', flat=True))
+        pending = (
+            Question.objects.filter(content_hash__isnull=True)
+            .order_by('id')
+            .only('id', 'question_text', 'option_a', 'option_b', 'option_c', 'option_d')
+        )
+        hashed = 0
+        duplicates = []
+        batch = []
+        for question in pending.iterator(chunk_size=options['batch_size']):
+            key = question.compute_content_hash()
+            if key in seen:
+                # Leave the duplicate unhashed so the unique index holds
+                duplicates.append(question.id)
+                continue
+            seen.add(key)
+            question.content_hash = key
+            batch.append(question)
+            if len(batch) >= options['batch_size']:
+                hashed += self.flush(batch)
+                batch = []
+        if batch:
+            hashed += self.flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Hashed {hashed} questions'))
+        if duplicates:
+            self.stdout.write(self.style.WARNING(
+                f'{len(duplicates)} duplicate questions left without a hash: '
+                + ', '.join(str(question_id) for question_id in duplicates)
+            ))
+
+    def flush(self, batch):
+        with transaction.atomic():
+            Question.objects.bulk_update(batch, ['content_hash'])
+        return len(batch)
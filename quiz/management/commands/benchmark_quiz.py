@@ -0,0 +1,275 @@
+import asyncio
+import json
+import random
+import re
+import statistics
+import subprocess
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.urls import resolve, reverse
+from quiz.home import invalidate_catalog
+from quiz.instrumentation import query_stats
+from quiz.models import Category, Question
+from quiz.payloads import question_payloads
+from quiz.sampling import question_sampler, rating_sampler
+
+QUESTION_ID = re.compile(r'id="question-id" value="(\d+)"')
+SESSION_URL = re.compile(r'/quiz/(\d+)/$')
+
+
+def percentile(samples, pct):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1]
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database and benchmark the quiz flow end to end'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=5, help='Categories to seed')
+        parser.add_argument('--questions', type=int, default=1000, help='Questions to seed, spread over the categories')
+        parser.add_argument('--quizzes', type=int, default=50, help='Quizzes to play')
+        parser.add_argument('--concurrency', type=int, default=1, help='Threads (or ASGI tasks) playing quizzes at once')
+        parser.add_argument(
+            '--asgi', action='store_true',
+            help='Drive the ASGI handler from asyncio tasks instead of the WSGI handler from threads'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for data and answers')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument(
+            '--compare', metavar='REPORT',
+            help='Add a comparison against an earlier report, e.g. one taken on another database'
+        )
+        parser.add_argument(
+            '--in-place', action='store_true',
+            help='Seed and play against the configured database instead of a fresh test database'
+        )
+
+    def handle(self, *args, **options):
+        old_config = None
+        if not options['in_place']:
+            old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                report = self.benchmark(options)
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                report['comparison'] = self.compare(report, json.load(f))
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f'✓ Wrote benchmark report to {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        categories = Category.objects.bulk_create([
+            Category(name=f'Benchmark category {i + 1}')
+            for i in range(options['categories'])
+        ])
+        questions = [
+            Question(
+                category=categories[i % len(categories)],
+                question_text=f'Benchmark question {i + 1}?',
+                option_a='Option A', option_b='Option B', option_c='Option C', option_d='Option D',
+                correct_answer=rng.choice('ABCD'),
+                explanation='Benchmark explanation.',
+                difficulty_level=rng.choice(['easy', 'medium', 'hard']),
+            )
+            for i in range(options['questions'])
+        ]
+        for question in questions:
+            question.content_hash = question.compute_content_hash()
+            question.reset_rating()
+        Question.objects.bulk_create(questions, batch_size=500)
+        question_sampler.reset()
+        rating_sampler.reset()
+        question_payloads.clear()
+        invalidate_catalog()
+        return categories
+
+    def benchmark(self, options):
+        categories = self.seed(options)
+        timings = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+
+        def record(path, response, elapsed):
+            view_name = resolve(path).view_name
+            with lock:
+                timings[view_name].append(elapsed)
+                if response.status_code >= 400:
+                    errors[view_name] += 1
+                elif view_name == 'quiz:submit_answer' and not response.json()['success']:
+                    errors[view_name] += 1
+
+        def request(client, method, path, **kwargs):
+            start = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            record(path, response, time.perf_counter() - start)
+            return response
+
+        async def arequest(client, method, path, **kwargs):
+            start = time.perf_counter()
+            response = await getattr(client, method)(path, **kwargs)
+            record(path, response, time.perf_counter() - start)
+            return response
+
+        def play(quiz_numbers):
+            # Count server errors instead of letting them stop the thread
+            client = Client(raise_request_exception=False)
+            rng = random.Random(options['seed'] + quiz_numbers[0])
+            for number in quiz_numbers:
+                if number % 2:
+                    response = request(client, 'get', reverse('quiz:start_mixed_quiz'))
+                else:
+                    category = categories[number // 2 % len(categories)]
+                    response = request(client, 'get', reverse('quiz:start_quiz', args=[category.id]))
+                match = SESSION_URL.search(response.get('Location', ''))
+                if not match:
+                    continue
+                session_id = int(match.group(1))
+                question_url = reverse('quiz:quiz_question', args=[session_id])
+                while True:
+                    response = request(client, 'get', question_url)
+                    match = QUESTION_ID.search(response.content.decode()) if response.status_code == 200 else None
+                    if not match:
+                        break
+                    request(client, 'post', reverse('quiz:submit_answer'), content_type='application/json', data={
+                        'session_id': session_id,
+                        'question_id': int(match.group(1)),
+                        'selected_answer': rng.choice('ABCD'),
+                        'time_taken': rng.randint(2, 30),
+                    })
+                request(client, 'get', reverse('quiz:quiz_results', args=[session_id]))
+                request(client, 'get', reverse('quiz:revision_mode', args=[session_id]))
+
+        async def aplay(quiz_numbers):
+            # Same quiz flow as play(), through the ASGI handler
+            client = AsyncClient(raise_request_exception=False)
+            rng = random.Random(options['seed'] + quiz_numbers[0])
+            for number in quiz_numbers:
+                if number % 2:
+                    response = await arequest(client, 'get', reverse('quiz:start_mixed_quiz'))
+                else:
+                    category = categories[number // 2 % len(categories)]
+                    response = await arequest(client, 'get', reverse('quiz:start_quiz', args=[category.id]))
+                match = SESSION_URL.search(response.get('Location', ''))
+                if not match:
+                    continue
+                session_id = int(match.group(1))
+                question_url = reverse('quiz:quiz_question', args=[session_id])
+                while True:
+                    response = await arequest(client, 'get', question_url)
+                    match = QUESTION_ID.search(response.content.decode()) if response.status_code == 200 else None
+                    if not match:
+                        break
+                    await arequest(client, 'post', reverse('quiz:submit_answer'), content_type='application/json', data={
+                        'session_id': session_id,
+                        'question_id': int(match.group(1)),
+                        'selected_answer': rng.choice('ABCD'),
+                        'time_taken': rng.randint(2, 30),
+                    })
+                await arequest(client, 'get', reverse('quiz:quiz_results', args=[session_id]))
+                await arequest(client, 'get', reverse('quiz:revision_mode', args=[session_id]))
+
+        async def play_in_tasks(concurrency):
+            await asyncio.gather(*(
+                aplay(list(range(i, options['quizzes'], concurrency)))
+                for i in range(min(concurrency, options['quizzes']))
+            ))
+
+        def play_in_thread(quiz_numbers):
+            try:
+                play(quiz_numbers)
+            finally:
+                connections.close_all()
+
+        concurrency = max(1, options['concurrency'])
+        query_stats.reset()
+        start = time.perf_counter()
+        if options['asgi']:
+            # Like an ASGI server, thread-sensitive ORM work runs on this thread
+            async_to_sync(play_in_tasks)(concurrency)
+        elif concurrency == 1:
+            play(list(range(options['quizzes'])))
+        else:
+            workers = [
+                threading.Thread(target=play_in_thread, args=(list(range(i, options['quizzes'], concurrency)),))
+                for i in range(concurrency)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        wall_time = time.perf_counter() - start
+
+        queries = query_stats.report()
+        endpoints = {}
+        for view_name, samples in sorted(timings.items()):
+            samples.sort()
+            endpoints[view_name] = {
+                'requests': len(samples),
+                'errors': errors[view_name],
+                'p50_ms': round(percentile(samples, 50) * 1000, 3),
+                'p95_ms': round(percentile(samples, 95) * 1000, 3),
+                'p99_ms': round(percentile(samples, 99) * 1000, 3),
+                'throughput_rps': round(len(samples) / wall_time, 2),
+                'queries_per_request': queries.get(view_name, {}).get('avg_queries'),
+            }
+        total = sum(len(samples) for samples in timings.values())
+        return {
+            'commit': self.git_commit(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'handler': 'asgi' if options['asgi'] else 'wsgi',
+            'parameters': {name: options[name] for name in ('categories', 'questions', 'quizzes', 'concurrency', 'seed')},
+            'wall_time_s': round(wall_time, 3),
+            'requests': total,
+            'throughput_rps': round(total / wall_time, 2),
+            'endpoints': endpoints,
+        }
+
+    def compare(self, report, baseline):
+        """Ratios of this run's latencies and throughput to the baseline's"""
+        def ratio(value, base):
+            return round(value / base, 3) if value is not None and base else None
+
+        endpoints = {}
+        for view_name, stats in report['endpoints'].items():
+            base = baseline['endpoints'].get(view_name)
+            if base is None:
+                continue
+            endpoints[view_name] = {
+                name: ratio(stats[name], base[name])
+                for name in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps')
+            }
+        return {
+            'baseline': {name: baseline.get(name) for name in ('commit', 'database', 'handler', 'parameters')},
+            'throughput_ratio': ratio(report['throughput_rps'], baseline['throughput_rps']),
+            'endpoints': endpoints,
+        }
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
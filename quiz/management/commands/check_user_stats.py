@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from quiz import stats
+
+class Command(BaseCommand):
+    help = 'Compare the per-user statistics rollups with raw quiz session data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int, help='Only check these users')
+
+    def handle(self, *args, **options):
+        mismatches = stats.check(options['user_ids'] or None)
+        for key, expected, actual in mismatches:
+            self.stdout.write(f'✗ {key}: expected {expected}, stored {actual}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} rollup rows are out of date; run rebuild_user_stats')
+        self.stdout.write(self.style.SUCCESS('✓ User statistics match quiz sessions'))
@@ -0,0 +1,157 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+from quiz.instrumentation import fingerprint
+from quiz.models import Category, Question, QuizSession
+
+QUESTION_ID = re.compile(r'id="question-id" value="(\d+)"')
+SESSION_URL = re.compile(r'/quiz/(\d+)/$')
+
+# A plain table scan, as opposed to SEARCH or SCAN ... USING INDEX
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+# Django's subquery aliases, e.g. "quiz_quizsession" U0
+TABLE_ALIAS = re.compile(r'"(\w+)" ([A-Z]\d+)\b')
+
+# Small tables that are read in full on purpose: the category list and
+# Wagtail's site lookup
+DEFAULT_ALLOWED = ['quiz_category', 'wagtailcore_site']
+
+
+class Recorder:
+    """Execute wrapper that keeps each distinct SELECT with its first params"""
+
+    def __init__(self):
+        self.view_name = None
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.view_name and not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.setdefault((self.view_name, fingerprint(sql)), (sql, params))
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the queries of the quiz views against the current database and flag full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--allow', action='append', default=[], metavar='TABLE',
+            help=f'Table that may be scanned in full (always allowed: {", ".join(DEFAULT_ALLOWED)})'
+        )
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every query plan, not only the flagged ones')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.explain, self.scanned = self.explain_sqlite, SQLITE_SCAN
+        elif connection.vendor == 'postgresql':
+            self.explain, self.scanned = self.explain_postgresql, POSTGRES_SCAN
+        else:
+            raise CommandError(f'EXPLAIN is not supported for {connection.vendor}')
+        allowed = {*DEFAULT_ALLOWED, *options['allow']}
+
+        # The views write (sessions, answers); roll all of it back
+        recorder = Recorder()
+        with transaction.atomic():
+            with connection.execute_wrapper(recorder), \
+                    override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                self.exercise_views(recorder)
+            plans = [
+                (view_name, sql, self.explain(sql, params))
+                for (view_name, _), (sql, params) in recorder.queries.items()
+            ]
+            transaction.set_rollback(True)
+
+        flagged = 0
+        for view_name, sql, plan in plans:
+            scans = sorted(self.full_scans(sql, plan) - allowed)
+            if not scans and not options['verbose_plans']:
+                continue
+            flagged += bool(scans)
+            label = self.style.WARNING(f'FULL SCAN of {", ".join(scans)}') if scans else 'ok'
+            self.stdout.write(f'{view_name}: {label}')
+            self.stdout.write(f'  {sql}')
+            for line in plan:
+                self.stdout.write(f'    {line}')
+
+        if flagged:
+            raise CommandError(f'{flagged} of {len(plans)} queries scan a table in full')
+        self.stdout.write(self.style.SUCCESS(f'✓ Explained {len(plans)} queries, no full table scans'))
+
+    def full_scans(self, sql, plan):
+        """Names of the tables a plan reads in full"""
+        aliases = {alias: table for table, alias in TABLE_ALIAS.findall(sql)}
+        tables = set()
+        for line in plan:
+            match = self.scanned.search(line)
+            # SQLite also "scans" materialized subqueries, which are not tables
+            if match and not match.group(1).startswith('subquery'):
+                tables.add(aliases.get(match.group(1), match.group(1)))
+        return tables
+
+    def explain_sqlite(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def explain_postgresql(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def exercise_views(self, recorder):
+        """Request every quiz view once, the way a player would"""
+        client = Client()
+
+        def get(path):
+            recorder.view_name = resolve(path.split('?')[0]).view_name
+            try:
+                return client.get(path)
+            finally:
+                recorder.view_name = None
+
+        def post(path, data):
+            recorder.view_name = resolve(path).view_name
+            try:
+                return client.post(path, content_type='application/json', data=data)
+            finally:
+                recorder.view_name = None
+
+        get(reverse('quiz:home'))
+        get(reverse('quiz:leaderboard'))
+        category = Category.objects.annotate(question_count=Count('questions')).order_by('-question_count').first()
+        if category is not None:
+            get(f'{reverse("quiz:leaderboard")}?category={category.id}')
+            get(reverse('quiz:start_quiz', args=[category.id]))
+
+        response = get(reverse('quiz:start_mixed_quiz'))
+        match = SESSION_URL.search(response.get('Location', ''))
+        if match:
+            session_id = int(match.group(1))
+            response = get(reverse('quiz:quiz_question', args=[session_id]))
+            match = QUESTION_ID.search(response.content.decode())
+            if match:
+                question_id = int(match.group(1))
+                post(reverse('quiz:submit_answer'), {
+                    'session_id': session_id, 'question_id': question_id, 'selected_answer': 'A',
+                })
+                get(f'{reverse("quiz:get_question_details", args=[question_id])}?session_id={session_id}')
+            get(reverse('quiz:quiz_results', args=[session_id]))
+            get(reverse('quiz:revision_mode', args=[session_id]))
+        elif Question.objects.exists():
+            get(reverse('quiz:get_question_details', args=[Question.objects.values_list('id', flat=True).first()]))
+
+        player = User.objects.filter(
+            id__in=QuizSession.objects.filter(user__isnull=False).values('user')[:1]
+        ).first() or User.objects.first()
+        if player is not None:
+            client.force_login(player)
+            get(reverse('quiz:user_stats'))
+            get(reverse('quiz:session_history'))
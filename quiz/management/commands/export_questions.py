@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from quiz.importing import detect_format, export_rows, write_rows
+from quiz.models import Question
+
+class Command(BaseCommand):
+    help = 'Export questions to a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to write, or '-' for stdout")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--category', help='Only export this category (by name)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options['path'], options['format'])
+        questions = Question.objects.all()
+        if options['category']:
+            questions = questions.filter(category__name=options['category'])
+
+        started = time.perf_counter()
+        count = 0
+
+        def counted(rows):
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+
+        rows = counted(export_rows(questions, options['chunk_size']))
+        if options['path'] == '-':
+            write_rows(self.stdout, fmt, rows)
+            return
+        with open(options['path'], 'w', newline='', encoding='utf-8') as stream:
+            write_rows(stream, fmt, rows)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Exported {count} questions in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)'
+        ))
@@ -0,0 +1,258 @@
+import bisect
+import math
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from quiz.home import invalidate_catalog
+from quiz.models import Category, Question, QuizSession, QuizQuestion, UserAnswer
+
+DIFFICULTIES = [('easy', 30, -1.0), ('medium', 50, 0.0), ('hard', 20, 1.0)]
+QUIZ_LENGTH = 15
+
+
+def mix(*values):
+    """Cheap deterministic hash of a few integers to 0..2**32-1"""
+    h = 2166136261
+    for value in values:
+        h = ((h ^ (value & 0xffffffff)) * 16777619) & 0xffffffff
+    return h
+
+
+def question_traits(seed, category_index, position):
+    """Difficulty (name, offset) and correct answer of a generated question"""
+    h = mix(seed, category_index, position)
+    roll = h % 100
+    for name, weight, offset in DIFFICULTIES:
+        if roll < weight:
+            break
+        roll -= weight
+    return name, offset, 'ABCD'[(h >> 8) % 4]
+
+
+class IdPool:
+    """Ids of one category's generated questions stored as (first_id, count) runs"""
+
+    def __init__(self):
+        self.runs = []
+        self.ends = []
+        self.size = 0
+
+    def extend(self, ids):
+        ids = sorted(ids)
+        start = 0
+        for i in range(1, len(ids) + 1):
+            if i == len(ids) or ids[i] != ids[i - 1] + 1:
+                self.runs.append((ids[start], i - start))
+                self.size += i - start
+                self.ends.append(self.size)
+                start = i
+
+    def __getitem__(self, position):
+        run = bisect.bisect_right(self.ends, position)
+        first_id, count = self.runs[run]
+        return first_id + position - (self.ends[run] - count)
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the auto_now_add timestamps we generate"""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add in saved:
+            field.auto_now_add = auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generate a large, reproducible synthetic question bank and quiz history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--questions', type=int, default=100_000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--sessions', type=int, default=100_000)
+        parser.add_argument('--completion-rate', type=float, default=0.85, help='Share of sessions answered to the end')
+        parser.add_argument('--mixed-rate', type=float, default=0.2, help='Share of sessions that are mixed quizzes')
+        parser.add_argument('--anonymous-rate', type=float, default=0.3, help='Share of sessions without a user')
+        parser.add_argument('--days', type=int, default=365, help='Spread session start times over this many days')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--skip-rollups', action='store_true', help='Do not rebuild the leaderboard, user stats, question counters and ratings')
+
+    def handle(self, *args, **options):
+        if options['categories'] < 1 or options['questions'] < max(options['categories'], QUIZ_LENGTH):
+            raise CommandError(f'Need at least one category, one question per category and {QUIZ_LENGTH} questions')
+        self.options = options
+        self.seed = options['seed']
+        self.rng = random.Random(self.seed)
+        self.epoch = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        self.tag = f'gen{self.seed}'
+
+        started = time.perf_counter()
+        timestamp_fields = [
+            Question._meta.get_field('created_at'),
+            QuizSession._meta.get_field('started_at'),
+            UserAnswer._meta.get_field('answered_at'),
+        ]
+        with explicit_timestamps(*timestamp_fields):
+            categories = self.generate_categories()
+            pools = self.generate_questions(categories)
+            users = self.generate_users()
+            rows = len(categories) + self.options['questions'] + len(users)
+            rows += self.generate_sessions(categories, pools, users)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Generated {rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)'
+        ))
+
+        if not options['skip_rollups']:
+            call_command('rebuild_leaderboard', stdout=self.stdout)
+            call_command('rebuild_user_stats', stdout=self.stdout)
+            # Answers are bulk inserted, bypassing counters.record and the
+            # rating updates of complete_session
+            call_command('rebuild_question_counters', stdout=self.stdout)
+            call_command('rebuild_ratings', stdout=self.stdout)
+
+    def generate_categories(self):
+        categories = Category.objects.bulk_create([
+            Category(name=f'Synthetic {self.tag} category {i + 1}', description='Generated for scale testing')
+            for i in range(self.options['categories'])
+        ])
+        self.stdout.write(f'✓ Created {len(categories)} categories')
+        # Zipf-like popularity so a few categories dominate
+        self.category_weights = [1 / (i + 1) for i in range(len(categories))]
+        return categories
+
+    def generate_questions(self, categories):
+        batch_size = self.options['batch_size']
+        pools = [IdPool() for _ in categories]
+        # Category sizes follow the same skew as their popularity
+        total_weight = sum(self.category_weights)
+        sizes = [max(1, int(self.options['questions'] * w / total_weight)) for w in self.category_weights]
+        sizes[0] += self.options['questions'] - sum(sizes)
+
+        created = 0
+        for index, (category, size) in enumerate(zip(categories, sizes)):
+            for offset in range(0, size, batch_size):
+                batch = []
+                for position in range(offset, min(size, offset + batch_size)):
+                    difficulty, _, correct = question_traits(self.seed, index, position)
+                    question = Question(
+                        category=category,
+                        question_text=f'Synthetic question {position + 1} about {category.name}?',
+                        option_a='First option', option_b='Second option',
+                        option_c='Third option', option_d='Fourth option',
+                        correct_answer=correct,
+                        explanation=f'The answer is {correct}.',
+                        difficulty_level=difficulty,
+                        created_at=self.epoch,
+                        updated_at=self.epoch,
+                    )
+                    question.content_hash = question.compute_content_hash()
+                    question.reset_rating()
+                    batch.append(question)
+                with transaction.atomic():
+                    pools[index].extend(q.id for q in Question.objects.bulk_create(batch))
+                created += len(batch)
+        invalidate_catalog()
+        self.stdout.write(f'✓ Created {created} questions')
+        return pools
+
+    def generate_users(self):
+        batch_size = self.options['batch_size']
+        users = []
+        for offset in range(0, self.options['users'], batch_size):
+            batch = [
+                User(username=f'{self.tag}-user-{i + 1}', password='!')
+                for i in range(offset, min(self.options['users'], offset + batch_size))
+            ]
+            with transaction.atomic():
+                created = User.objects.bulk_create(batch)
+            # Only ids and a latent ability per user are kept
+            users.extend((user.id, self.rng.gauss(0.5, 1.0)) for user in created)
+        self.stdout.write(f'✓ Created {len(users)} users')
+        return users
+
+    def pick_questions(self, categories, pools, category_index):
+        """(category_index, position) pairs for one quiz"""
+        if category_index is None:
+            picks = set()
+            while len(picks) < QUIZ_LENGTH:
+                index = self.rng.randrange(len(categories))
+                picks.add((index, self.rng.randrange(pools[index].size)))
+            return list(picks)
+        pool = pools[category_index]
+        positions = self.rng.sample(range(pool.size), min(QUIZ_LENGTH, pool.size))
+        return [(category_index, position) for position in positions]
+
+    def generate_sessions(self, categories, pools, users):
+        options = self.options
+        sessions_per_batch = max(1, options['batch_size'] // QUIZ_LENGTH)
+        span = timedelta(days=options['days']).total_seconds()
+        rows = 0
+        for offset in range(0, options['sessions'], sessions_per_batch):
+            sessions, plans = [], []
+            for _ in range(min(sessions_per_batch, options['sessions'] - offset)):
+                mixed = self.rng.random() < options['mixed_rate']
+                category_index = None if mixed else self.rng.choices(range(len(categories)), self.category_weights)[0]
+                user_id, ability = (None, 0.0)
+                if users and self.rng.random() >= options['anonymous_rate']:
+                    user_id, ability = self.rng.choice(users)
+                picks = self.pick_questions(categories, pools, category_index)
+                completed = self.rng.random() < options['completion_rate']
+                answered = len(picks) if completed else self.rng.randrange(len(picks))
+
+                started_at = self.epoch + timedelta(seconds=self.rng.random() * span)
+                answers, score, clock = [], 0, started_at
+                for index, position in picks[:answered]:
+                    _, hardness, correct = question_traits(self.seed, index, position)
+                    took = timedelta(seconds=self.rng.randint(3, 30))
+                    clock += took
+                    is_correct = self.rng.random() < 1 / (1 + math.exp(hardness - ability))
+                    selected = correct if is_correct else self.rng.choice([c for c in 'ABCD' if c != correct])
+                    answers.append((pools[index][position], selected, is_correct, clock, took))
+                    score += is_correct
+
+                sessions.append(QuizSession(
+                    user_id=user_id,
+                    category=None if mixed else categories[category_index],
+                    is_mixed=mixed,
+                    started_at=started_at,
+                    completed_at=clock if completed else None,
+                    time_taken=clock - started_at if completed else None,
+                    score=score,
+                    total_questions=len(picks),
+                    answered_count=answered,
+                    current_order=answered + 1,
+                ))
+                plans.append(([pools[i][p] for i, p in picks], answers))
+
+            with transaction.atomic():
+                QuizSession.objects.bulk_create(sessions)
+                quiz_questions, user_answers = [], []
+                for session, (question_ids, answers) in zip(sessions, plans):
+                    quiz_questions.extend(
+                        QuizQuestion(quiz_session=session, question_id=question_id, order=order + 1)
+                        for order, question_id in enumerate(question_ids)
+                    )
+                    user_answers.extend(
+                        UserAnswer(
+                            quiz_session=session, question_id=question_id, selected_answer=selected,
+                            is_correct=is_correct, answered_at=answered_at, time_taken=took
+                        )
+                        for question_id, selected, is_correct, answered_at, took in answers
+                    )
+                QuizQuestion.objects.bulk_create(quiz_questions)
+                UserAnswer.objects.bulk_create(user_answers)
+            rows += len(sessions) + len(quiz_questions) + len(user_answers)
+        self.stdout.write(f'✓ Created {options["sessions"]} quiz sessions')
+        return rows
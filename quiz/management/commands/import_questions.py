@@ -0,0 +1,44 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from quiz.importing import QuestionImporter, detect_format, read_rows
+from quiz.models import Question
+
+class Command(BaseCommand):
+    help = 'Import questions from a CSV or JSONL file, updating questions with the same content'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and count without writing')
+        parser.add_argument('--max-errors', type=int, default=20, help='Invalid rows to print')
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options['path'], options['format'])
+        if Question.objects.filter(content_hash__isnull=True).exists():
+            self.stdout.write(self.style.WARNING(
+                'Some questions have no content hash and cannot be matched; run backfill_content_hashes first'
+            ))
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+        started = time.perf_counter()
+        try:
+            importer = QuestionImporter(batch_size=options['batch_size'], dry_run=options['dry_run'])
+            importer.run(read_rows(stream, fmt)).finish()
+        except (ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        elapsed = time.perf_counter() - started
+
+        for line_number, errors in importer.errors[:options['max_errors']]:
+            details = '; '.join(f'{field}: {" ".join(messages)}' for field, messages in errors.items())
+            self.stdout.write(self.style.WARNING(f'✗ Line {line_number}: {details}'))
+        rows = importer.created + importer.updated + importer.skipped + len(importer.errors)
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Checked" if options["dry_run"] else "Imported"} {rows} rows in {elapsed:.1f}s '
+            f'({rows / max(elapsed, 1e-9):,.0f} rows/s): {importer.created} created, {importer.updated} updated, '
+            f'{importer.skipped} duplicates skipped, {len(importer.errors)} invalid'
+        ))
@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from quiz.models import Category, Question
+from quiz.models import Category, Question, content_hash
 
 class Command(BaseCommand):
     help = 'Populate the database with sample quiz data'
@@ -457,9 +457,11 @@ class Command(BaseCommand):
             category = Category.objects.get(name=category_name)
             for q_data in questions:
                 question, created = Question.objects.get_or_create(
-                    category=category,
-                    question_text=q_data['question_text'],
-                    defaults=q_data
+                    content_hash=content_hash(
+                        q_data['question_text'], q_data['option_a'], q_data['option_b'],
+                        q_data['option_c'], q_data['option_d']
+                    ),
+                    defaults={'category': category, **q_data}
                 )
                 if created:
                     self.stdout.write(f'✓ Created question: {question.question_text[:50]}...')
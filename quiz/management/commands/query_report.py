@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+from quiz.instrumentation import query_stats
+from quiz.models import Category, Question, QuizSession
+
+class Command(BaseCommand):
+    help = 'Request quiz pages and report per-view query counts and timings as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='URL paths to request (default: the read-only quiz pages)')
+        parser.add_argument('--repeat', type=int, default=3, help='Requests per path')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def default_paths(self):
+        paths = [reverse('quiz:home'), reverse('quiz:leaderboard')]
+        category = Category.objects.first()
+        if category:
+            paths.append(reverse('quiz:leaderboard') + f'?category={category.id}')
+        question = Question.objects.first()
+        if question:
+            paths.append(reverse('quiz:get_question_details', args=[question.id]))
+        session = QuizSession.objects.filter(completed_at__isnull=False).first()
+        if session:
+            paths.append(reverse('quiz:quiz_results', args=[session.id]))
+            paths.append(reverse('quiz:revision_mode', args=[session.id]))
+        return paths
+
+    def handle(self, *args, **options):
+        client = Client()
+        query_stats.reset()
+        for path in options['paths'] or self.default_paths():
+            for _ in range(options['repeat']):
+                client.get(path)
+        
+        report = json.dumps(query_stats.report(), indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(report)
+            self.stdout.write(self.style.SUCCESS(f'✓ Wrote query report to {options["output"]}'))
+        else:
+            self.stdout.write(report)
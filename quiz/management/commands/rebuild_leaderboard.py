@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from quiz import leaderboard
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized leaderboard from completed quiz sessions'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding leaderboard...')
+        entries = leaderboard.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote {entries} leaderboard entries'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from quiz import counters
+
+class Command(BaseCommand):
+    help = 'Rebuild the live per-question answer counters from stored answers'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding question counters...')
+        questions = counters.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt counters for {questions} questions'))
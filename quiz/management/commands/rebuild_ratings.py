@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from quiz import adaptive
+
+class Command(BaseCommand):
+    help = 'Refit question difficulty and user ability ratings by replaying all rated answers'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding adaptive ratings...')
+        questions, abilities = adaptive.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'✓ Rated {questions} questions and {abilities} user/category abilities'))
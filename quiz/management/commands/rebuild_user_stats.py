@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from quiz import stats
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user statistics rollups from completed quiz sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int, help='Only rebuild these users')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding user statistics...')
+        users, categories = stats.rebuild(options['user_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt stats for {users} users ({categories} category rows)'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from quiz.models import QuizSession
+from quiz.services import repair_cursors
+
+class Command(BaseCommand):
+    help = 'Rebuild the question cursor of quiz sessions from their answers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('session_ids', nargs='*', type=int, help='Only repair these sessions')
+
+    def handle(self, *args, **options):
+        sessions = QuizSession.objects.all()
+        if options['session_ids']:
+            sessions = sessions.filter(id__in=options['session_ids'])
+        
+        self.stdout.write('Repairing quiz session cursors...')
+        repaired = repair_cursors(sessions)
+        self.stdout.write(self.style.SUCCESS(f'✓ Repaired {repaired} of {sessions.count()} sessions'))
@@ -0,0 +1,142 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from django.test.utils import override_settings
+from quiz.models import Category, Question, QuizSession, UserAnswer
+
+# Enough of the schema for answer writes; users are referenced by QuizSession
+MODELS = [User, Category, Question, QuizSession, UserAnswer]
+
+
+class Command(BaseCommand):
+    help = 'Hammer a scratch SQLite file with concurrent answer writes, with and without QUIZ_SQLITE_TUNING'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Threads writing answers, each on its own connection')
+        parser.add_argument('--readers', type=int, default=2, help='Threads reading answer counts meanwhile')
+        parser.add_argument('--answers', type=int, default=50, help='Answers written per writer')
+        parser.add_argument('--mode', choices=['default', 'tuned', 'both'], default='both')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        modes = ['default', 'tuned'] if options['mode'] == 'both' else [options['mode']]
+        report = {
+            'parameters': {name: options[name] for name in ('writers', 'readers', 'answers')},
+            'modes': {mode: self.run(mode, options) for mode in modes},
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f'✓ Wrote stress report to {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def run(self, mode, options):
+        """Play one round against a fresh database file, under its own alias"""
+        alias = f'quiz_stress_{mode}'
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                override_settings(QUIZ_SQLITE_TUNING={'ENABLED': mode == 'tuned'}):
+            connections.settings[alias] = connections.configure_settings({
+                'default': dict(connections.settings['default']),
+                alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(tmpdir, 'stress.sqlite3')},
+            })[alias]
+            try:
+                session_ids, question_ids = self.seed(alias, options)
+                return self.hammer(alias, session_ids, question_ids, options)
+            finally:
+                connections[alias].close()
+                del connections[alias]
+                del connections.settings[alias]
+
+    def seed(self, alias, options):
+        with connections[alias].schema_editor() as editor:
+            for model in MODELS:
+                editor.create_model(model)
+        # bulk_create sends no signals, so the live caches are not touched
+        category = Category.objects.using(alias).bulk_create([Category(name='Stress')])[0]
+        questions = Question.objects.using(alias).bulk_create([
+            Question(
+                category=category, question_text=f'Stress question {i}?',
+                option_a='A', option_b='B', option_c='C', option_d='D',
+                correct_answer='A', explanation='Because A.',
+            )
+            for i in range(options['answers'])
+        ])
+        sessions = QuizSession.objects.using(alias).bulk_create([
+            QuizSession(category=category, total_questions=options['answers'])
+            for _ in range(options['writers'])
+        ])
+        return [s.id for s in sessions], [q.id for q in questions]
+
+    def hammer(self, alias, session_ids, question_ids, options):
+        lock = threading.Lock()
+        results = {'answers_written': 0, 'locked_errors': 0, 'reads': 0}
+        done = threading.Event()
+
+        def count(name, amount=1):
+            with lock:
+                results[name] += amount
+
+        def write(session_id):
+            # Same shape as record_answer: read the session, then write
+            try:
+                for question_id in question_ids:
+                    try:
+                        with transaction.atomic(using=alias):
+                            session = QuizSession.objects.using(alias).get(id=session_id)
+                            UserAnswer.objects.using(alias).create(
+                                quiz_session_id=session.id, question_id=question_id,
+                                selected_answer='A', is_correct=True,
+                            )
+                            QuizSession.objects.using(alias).filter(id=session.id).update(
+                                answered_count=F('answered_count') + 1,
+                                current_order=F('current_order') + 1,
+                                score=F('score') + 1,
+                            )
+                        count('answers_written')
+                    except OperationalError as e:
+                        if 'locked' not in str(e):
+                            raise
+                        count('locked_errors')
+            finally:
+                connections[alias].close()
+
+        def read():
+            try:
+                while not done.is_set():
+                    try:
+                        UserAnswer.objects.using(alias).filter(quiz_session_id__in=session_ids).count()
+                        count('reads')
+                    except OperationalError as e:
+                        if 'locked' not in str(e):
+                            raise
+                        count('locked_errors')
+            finally:
+                connections[alias].close()
+
+        writers = [threading.Thread(target=write, args=(session_id,)) for session_id in session_ids]
+        readers = [threading.Thread(target=read) for _ in range(options['readers'])]
+        start = time.perf_counter()
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        with connections[alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            results['journal_mode'] = cursor.fetchone()[0]
+        results['elapsed_s'] = round(elapsed, 3)
+        results['answers_per_s'] = round(results['answers_written'] / elapsed, 1)
+        return results
@@ -0,0 +1,94 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .instrumentation import QueryBudgetExceeded, QueryRecorder, current_recorder, instrumentation_setting, query_stats
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetMiddleware:
+    """Record SQL count, DB time and render time of every request.
+
+    The numbers are aggregated per view in ``query_stats`` and, when
+    ``QUIZ_INSTRUMENTATION['SERVER_TIMING']`` is set, returned in a
+    ``Server-Timing`` header. Views declaring a ``@query_budget`` that they
+    exceed are logged, or fail with ``QueryBudgetExceeded`` when
+    ``QUIZ_INSTRUMENTATION['STRICT_BUDGETS']`` is set. Budgets cover every
+    query of the request, including the lazy session and user lookups.
+    Works under both WSGI and ASGI, so async views are not pushed onto a
+    thread.
+
+    Connections are per thread, and under ASGI a request's queries run on
+    sync threads, possibly shared with concurrent requests. So the recorder
+    is not installed on a connection: it is made ``current_recorder`` for
+    the request, and the ``record_queries`` wrapper every connection gets
+    (see ``signals.py``) credits each query to the request it belongs to.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        request._query_budget = None
+        request._render_time = 0.0
+        start = time.perf_counter()
+        token = current_recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        request._query_budget = None
+        request._render_time = 0.0
+        start = time.perf_counter()
+        token = current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder, time.perf_counter() - start)
+
+    def finish(self, request, response, recorder, total_time):
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        query_stats.record(view_name, recorder, request._render_time, total_time)
+
+        if instrumentation_setting('SERVER_TIMING'):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries"',
+                f'render;dur={request._render_time * 1000:.2f}',
+                f'total;dur={total_time * 1000:.2f}',
+            ])
+
+        budget = request._query_budget
+        if budget is not None and recorder.count > budget:
+            message = f'{view_name} issued {recorder.count} queries, budget is {budget}'
+            if instrumentation_setting('STRICT_BUDGETS'):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None)
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._render_time = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:54
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, F, IntegerField, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_cursors(apps, schema_editor):
+    """Point existing sessions at their first unanswered question.
+
+    Frozen copy of quiz.services.repair_cursors: without it every session
+    would restart at question 1 with no answers counted.
+    """
+    QuizSession = apps.get_model('quiz', 'QuizSession')
+    QuizQuestion = apps.get_model('quiz', 'QuizQuestion')
+    UserAnswer = apps.get_model('quiz', 'UserAnswer')
+    answers = UserAnswer.objects.filter(
+        quiz_session_id=OuterRef('id')
+    ).order_by().values('quiz_session_id')
+    unanswered = QuizQuestion.objects.filter(
+        quiz_session_id=OuterRef('id')
+    ).exclude(
+        Exists(UserAnswer.objects.filter(
+            quiz_session_id=OuterRef('quiz_session_id'),
+            question_id=OuterRef('question_id')
+        ))
+    ).order_by().values('quiz_session_id').annotate(first=Min('order')).values('first')
+    sessions = QuizSession.objects.annotate(
+        actual_answered=Coalesce(Subquery(
+            answers.annotate(count=Count('id')).values('count'), output_field=IntegerField()
+        ), 0),
+        actual_score=Coalesce(Subquery(
+            answers.filter(is_correct=True).annotate(count=Count('id')).values('count'),
+            output_field=IntegerField()
+        ), 0),
+        actual_order=Coalesce(
+            Subquery(unanswered, output_field=IntegerField()),
+            F('total_questions') + 1,
+            output_field=IntegerField()
+        ),
+    ).only('id')
+    batch = []
+    for session in sessions.iterator(chunk_size=1000):
+        session.answered_count = session.actual_answered
+        session.score = session.actual_score
+        session.current_order = session.actual_order
+        batch.append(session)
+        if len(batch) >= 1000:
+            QuizSession.objects.bulk_update(batch, ['answered_count', 'score', 'current_order'])
+            batch = []
+    if batch:
+        QuizSession.objects.bulk_update(batch, ['answered_count', 'score', 'current_order'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsession',
+            name='answered_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quizsession',
+            name='current_order',
+            field=models.PositiveIntegerField(default=1, help_text='Order of the next question to show'),
+        ),
+        migrations.RunPython(backfill_cursors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, FloatField
+
+# Frozen copies of quiz.leaderboard.LEADERBOARD_SIZE and RANKING
+LEADERBOARD_SIZE = 50
+RANKING = ['-percentage', '-score', 'started_at', 'id']
+
+
+def backfill_leaderboard(apps, schema_editor):
+    """Rank the completed sessions already stored.
+
+    Frozen copy of quiz.leaderboard.rebuild; without it the boards start
+    empty.
+    """
+    Category = apps.get_model('quiz', 'Category')
+    LeaderboardEntry = apps.get_model('quiz', 'LeaderboardEntry')
+    QuizSession = apps.get_model('quiz', 'QuizSession')
+    ranked = QuizSession.objects.filter(
+        completed_at__isnull=False,
+        total_questions__gt=0
+    ).annotate(
+        percentage=ExpressionWrapper(F('score') * 100.0 / F('total_questions'), output_field=FloatField())
+    ).select_related('user', 'category').order_by(*RANKING)
+
+    def make_entry(session, board):
+        return LeaderboardEntry(
+            category=board,
+            session=session,
+            username=session.user.username if session.user else '',
+            category_name=session.category.name if session.category else '',
+            category_icon=session.category.icon if session.category else '',
+            score=session.score,
+            total_questions=session.total_questions,
+            percentage=session.score * 100.0 / session.total_questions,
+            started_at=session.started_at,
+        )
+
+    entries = [make_entry(session, None) for session in ranked[:LEADERBOARD_SIZE]]
+    for category in Category.objects.all():
+        entries.extend(
+            make_entry(session, category)
+            for session in ranked.filter(category=category)[:LEADERBOARD_SIZE]
+        )
+    LeaderboardEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0002_quizsession_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(blank=True, max_length=150)),
+                ('category_name', models.CharField(blank=True, max_length=100)),
+                ('category_icon', models.CharField(blank=True, max_length=50)),
+                ('score', models.IntegerField()),
+                ('total_questions', models.IntegerField()),
+                ('percentage', models.FloatField()),
+                ('started_at', models.DateTimeField()),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='quiz.category')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='quiz.quizsession')),
+            ],
+            options={
+                'ordering': ['-percentage', '-score', 'started_at', 'id'],
+                'indexes': [models.Index(fields=['category', '-percentage', '-score', 'started_at'], name='quiz_leaderboard_rank_idx')],
+                'unique_together': {('category', 'session')},
+            },
+        ),
+        migrations.RunPython(backfill_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_user_stats(apps, schema_editor):
+    """Fold the completed sessions already stored into the new rollups.
+
+    Frozen copy of quiz.stats.rebuild; without it every existing player
+    starts at zero.
+    """
+    QuizSession = apps.get_model('quiz', 'QuizSession')
+    UserStats = apps.get_model('quiz', 'UserStats')
+    UserCategoryStats = apps.get_model('quiz', 'UserCategoryStats')
+    users, categories = {}, {}
+    rows = QuizSession.objects.filter(
+        completed_at__isnull=False, user__isnull=False
+    ).order_by().values_list('user_id', 'category_id', 'score', 'total_questions')
+    for user_id, category_id, score, total_questions in rows.iterator(chunk_size=5000):
+        # QuizSession.get_percentage
+        percentage = round((score / total_questions) * 100) if total_questions else 0
+        totals = users.setdefault(user_id, dict.fromkeys(
+            ['total_sessions', 'total_questions', 'total_correct', 'percentage_sum', 'best_percentage'], 0
+        ))
+        totals['total_sessions'] += 1
+        totals['total_questions'] += total_questions
+        totals['total_correct'] += score
+        totals['percentage_sum'] += percentage
+        totals['best_percentage'] = max(totals['best_percentage'], percentage)
+        if category_id:
+            totals = categories.setdefault((user_id, category_id), dict.fromkeys(
+                ['sessions', 'total_score', 'total_questions'], 0
+            ))
+            totals['sessions'] += 1
+            totals['total_score'] += score
+            totals['total_questions'] += total_questions
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id, **totals) for user_id, totals in users.items()],
+        batch_size=1000
+    )
+    UserCategoryStats.objects.bulk_create(
+        [UserCategoryStats(user_id=user_id, category_id=category_id, **totals)
+         for (user_id, category_id), totals in categories.items()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('quiz', '0003_leaderboardentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='quiz_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_sessions', models.PositiveIntegerField(default=0)),
+                ('total_questions', models.PositiveIntegerField(default=0)),
+                ('total_correct', models.PositiveIntegerField(default=0)),
+                ('percentage_sum', models.PositiveIntegerField(default=0, help_text="Sum of each session's rounded percentage")),
+                ('best_percentage', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'User stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserCategoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sessions', models.PositiveIntegerField(default=0)),
+                ('total_score', models.PositiveIntegerField(default=0)),
+                ('total_questions', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_category_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'User category stats',
+                'unique_together': {('user', 'category')},
+            },
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0004_user_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(editable=False, help_text='SHA-256 of the normalized question text and options', max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0005_question_content_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['category', 'difficulty_level'], name='quiz_question_cat_diff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(condition=models.Q(('completed_at__isnull', False)), fields=['-completed_at'], name='quiz_session_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(condition=models.Q(('completed_at__isnull', False)), fields=['user', '-started_at'], name='quiz_session_user_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useranswer',
+            index=models.Index(fields=['quiz_session', 'is_correct'], name='quiz_answer_session_ok_idx'),
+        ),
+    ]
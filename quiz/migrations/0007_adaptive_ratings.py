@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of quiz.models.DIFFICULTY_PRIORS
+DIFFICULTY_PRIORS = {'easy': -1.0, 'medium': 0.0, 'hard': 1.0}
+
+
+def seed_ratings(apps, schema_editor):
+    """Start existing questions at the rating of their difficulty level"""
+    Question = apps.get_model('quiz', 'Question')
+    for difficulty, rating in DIFFICULTY_PRIORS.items():
+        Question.objects.filter(difficulty_level=difficulty).update(rating=rating)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0006_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='rating',
+            field=models.FloatField(default=0.0, editable=False, help_text='Estimated difficulty in logits, fitted from answers (see quiz/adaptive.py)'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='rating_answers',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Rated answers the estimate is based on'),
+        ),
+        migrations.CreateModel(
+            name='UserAbility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.FloatField(default=0.0, help_text='Estimated ability in logits')),
+                ('answers', models.PositiveIntegerField(default=0, help_text='Rated answers the estimate is based on')),
+                ('recent_questions', models.BinaryField(default=b'', help_text='Packed ids of the questions served most recently, oldest first')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_abilities', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'User abilities',
+                'unique_together': {('user', 'category')},
+            },
+        ),
+        migrations.RunPython(seed_ratings, migrations.RunPython.noop),
+    ]
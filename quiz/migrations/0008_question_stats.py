@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0007_adaptive_ratings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='quiz.question')),
+                ('answers', models.PositiveIntegerField(default=0)),
+                ('p_value', models.FloatField(help_text='Fraction of answers that were correct')),
+                ('discrimination', models.FloatField(blank=True, help_text="Correlation between answering correctly and the rest of the session's score", null=True)),
+                ('rate_a', models.FloatField(default=0.0, help_text='Fraction of answers choosing option A')),
+                ('rate_b', models.FloatField(default=0.0, help_text='Fraction of answers choosing option B')),
+                ('rate_c', models.FloatField(default=0.0, help_text='Fraction of answers choosing option C')),
+                ('rate_d', models.FloatField(default=0.0, help_text='Fraction of answers choosing option D')),
+                ('median_time', models.DurationField(blank=True, help_text='Median time taken, from whole-second bins', null=True)),
+                ('flagged', models.BooleanField(default=False, help_text='Negative discrimination, or a distractor chosen more often than the key')),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Question stats',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0008_question_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionCounters',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to='quiz.question')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('picks_a', models.PositiveIntegerField(default=0)),
+                ('picks_b', models.PositiveIntegerField(default=0)),
+                ('picks_c', models.PositiveIntegerField(default=0)),
+                ('picks_d', models.PositiveIntegerField(default=0)),
+                ('time_total', models.FloatField(default=0.0, help_text='Sum of time taken, in seconds')),
+                ('time_lt_5', models.PositiveIntegerField(default=0)),
+                ('time_lt_10', models.PositiveIntegerField(default=0)),
+                ('time_lt_15', models.PositiveIntegerField(default=0)),
+                ('time_lt_20', models.PositiveIntegerField(default=0)),
+                ('time_lt_25', models.PositiveIntegerField(default=0)),
+                ('time_lt_30', models.PositiveIntegerField(default=0)),
+                ('time_ge_30', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Question counters',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_question_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='quizsession',
+            name='quiz_session_user_done_idx',
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(condition=models.Q(('completed_at__isnull', False)), fields=['user', '-started_at', '-id'], name='quiz_session_user_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(fields=['-started_at', '-id'], name='quiz_session_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useranswer',
+            index=models.Index(fields=['-answered_at', '-id'], name='quiz_answer_answered_idx'),
+        ),
+    ]
@@ -3,7 +3,23 @@ from django.db import models
 # Create your models here.
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+import hashlib
 import json
+import re
+
+WHITESPACE = re.compile(r'\s+')
+
+# Starting difficulty rating (in logits) of a question nobody has answered yet
+DIFFICULTY_PRIORS = {'easy': -1.0, 'medium': 0.0, 'hard': 1.0}
+
+def normalize_text(text):
+    return WHITESPACE.sub(' ', text).strip().casefold()
+
+def content_hash(question_text, option_a, option_b, option_c, option_d):
+    """Fingerprint of a question's normalized text and options"""
+    parts = [normalize_text(part) for part in (question_text, option_a, option_b, option_c, option_d)]
+    return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -48,13 +64,48 @@ class Question(models.Model):
     ], default='medium')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    content_hash = models.CharField(max_length=64, unique=True, null=True, editable=False,
+                                    help_text="SHA-256 of the normalized question text and options")
+    rating = models.FloatField(default=0.0, editable=False,
+                               help_text="Estimated difficulty in logits, fitted from answers (see quiz/adaptive.py)")
+    rating_answers = models.PositiveIntegerField(default=0, editable=False,
+                                                 help_text="Rated answers the estimate is based on")
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['category', 'difficulty_level'], name='quiz_question_cat_diff_idx'),
+        ]
     
     def __str__(self):
         return f"{self.category.name}: {self.question_text[:50]}..."
     
+    def compute_content_hash(self):
+        return content_hash(self.question_text, self.option_a, self.option_b, self.option_c, self.option_d)
+    
+    def clean(self):
+        self.content_hash = self.compute_content_hash()
+        duplicates = Question.objects.filter(content_hash=self.content_hash).exclude(pk=self.pk)
+        if duplicates.exists():
+            raise ValidationError("A question with the same text and options already exists.")
+    
+    def save(self, *args, **kwargs):
+        self.content_hash = self.compute_content_hash()
+        derived = {'content_hash'}
+        if not self.rating_answers:
+            self.reset_rating()
+            derived.add('rating')
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], *derived}
+        super().save(*args, **kwargs)
+    
+    def reset_rating(self):
+        """Until answers come in, the rating follows the editor's difficulty.
+
+        ``save`` does this for unrated questions; bulk writes must call it.
+        """
+        self.rating = DIFFICULTY_PRIORS.get(self.difficulty_level, 0.0)
+    
     def get_options(self):
         return {
             'A': self.option_a,
@@ -82,9 +133,22 @@ class QuizSession(models.Model):
     score = models.IntegerField(default=0)
     total_questions = models.IntegerField(default=0)
     time_taken = models.DurationField(null=True, blank=True)
+    current_order = models.PositiveIntegerField(default=1, help_text="Order of the next question to show")
+    answered_count = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-started_at']
+        indexes = [
+            # Recent completed sessions on the home page
+            models.Index(fields=['-completed_at'], name='quiz_session_completed_idx',
+                         condition=models.Q(completed_at__isnull=False)),
+            # A user's completed sessions, newest first, on the stats and
+            # history pages; id makes it the history's keyset
+            models.Index(fields=['user', '-started_at', '-id'], name='quiz_session_user_done_idx',
+                         condition=models.Q(completed_at__isnull=False)),
+            # Keyset pages of the admin changelist
+            models.Index(fields=['-started_at', '-id'], name='quiz_session_started_idx'),
+        ]
     
     def __str__(self):
         category_name = self.category.name if self.category else "Mixed Quiz"
@@ -133,6 +197,154 @@ class UserAnswer(models.Model):
     class Meta:
         unique_together = ['quiz_session', 'question']
         ordering = ['answered_at']
+        indexes = [
+            models.Index(fields=['quiz_session', 'is_correct'], name='quiz_answer_session_ok_idx'),
+            # Keyset pages of the admin changelist
+            models.Index(fields=['-answered_at', '-id'], name='quiz_answer_answered_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Answer for {self.question.question_text[:30]}... - {self.selected_answer}"
+
+
+class LeaderboardEntry(models.Model):
+    """Materialized top-N row; category is the board it belongs to, None for the global board"""
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='leaderboard_entries')
+    session = models.ForeignKey(QuizSession, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    username = models.CharField(max_length=150, blank=True)
+    category_name = models.CharField(max_length=100, blank=True)
+    category_icon = models.CharField(max_length=50, blank=True)
+    score = models.IntegerField()
+    total_questions = models.IntegerField()
+    percentage = models.FloatField()
+    started_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-percentage', '-score', 'started_at', 'id']
+        unique_together = ['category', 'session']
+        indexes = [
+            models.Index(fields=['category', '-percentage', '-score', 'started_at'], name='quiz_leaderboard_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.username or 'Anonymous'} - {self.category_name or 'Mixed Quiz'} - {self.percentage:.0f}%"
+    
+    def get_percentage(self):
+        return round(self.percentage)
+
+
+class UserStats(models.Model):
+    """Running totals over a user's completed quiz sessions"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='quiz_stats')
+    total_sessions = models.PositiveIntegerField(default=0)
+    total_questions = models.PositiveIntegerField(default=0)
+    total_correct = models.PositiveIntegerField(default=0)
+    percentage_sum = models.PositiveIntegerField(default=0, help_text="Sum of each session's rounded percentage")
+    best_percentage = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name_plural = "User stats"
+    
+    def __str__(self):
+        return f"Stats for {self.user}"
+    
+    def get_average_percentage(self):
+        if self.total_sessions == 0:
+            return 0
+        return round(self.percentage_sum / self.total_sessions, 1)
+
+class UserCategoryStats(models.Model):
+    """Running totals over a user's completed sessions in one category"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_category_stats')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    sessions = models.PositiveIntegerField(default=0)
+    total_score = models.PositiveIntegerField(default=0)
+    total_questions = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name_plural = "User category stats"
+        unique_together = ['user', 'category']
+    
+    def __str__(self):
+        return f"{self.user} - {self.category}"
+    
+    def get_percentage(self):
+        if self.total_questions == 0:
+            return 0
+        return round((self.total_score / self.total_questions) * 100)
+
+
+class UserAbility(models.Model):
+    """A user's estimated ability in one category, plus the questions they saw there recently"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_abilities')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    rating = models.FloatField(default=0.0, help_text="Estimated ability in logits")
+    answers = models.PositiveIntegerField(default=0, help_text="Rated answers the estimate is based on")
+    recent_questions = models.BinaryField(default=b'', editable=False,
+                                          help_text="Packed ids of the questions served most recently, oldest first")
+    
+    class Meta:
+        verbose_name_plural = "User abilities"
+        unique_together = ['user', 'category']
     
     def __str__(self):
-        return f"Answer for {self.question.question_text[:30]}... - {self.selected_answer}"
\ No newline at end of file
+        return f"{self.user} - {self.category}: {self.rating:+.2f}"
+
+
+class QuestionStats(models.Model):
+    """Item statistics of a question, written by the compute_item_stats command"""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    answers = models.PositiveIntegerField(default=0)
+    p_value = models.FloatField(help_text="Fraction of answers that were correct")
+    discrimination = models.FloatField(null=True, blank=True,
+                                       help_text="Correlation between answering correctly and the rest of the session's score")
+    rate_a = models.FloatField(default=0.0, help_text="Fraction of answers choosing option A")
+    rate_b = models.FloatField(default=0.0, help_text="Fraction of answers choosing option B")
+    rate_c = models.FloatField(default=0.0, help_text="Fraction of answers choosing option C")
+    rate_d = models.FloatField(default=0.0, help_text="Fraction of answers choosing option D")
+    median_time = models.DurationField(null=True, blank=True, help_text="Median time taken, from whole-second bins")
+    flagged = models.BooleanField(default=False, help_text="Negative discrimination, or a distractor chosen more often than the key")
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name_plural = "Question stats"
+    
+    def __str__(self):
+        return f"Stats for question {self.question_id}"
+
+
+class QuestionCounters(models.Model):
+    """Running answer counters of a question, bumped as answers are written (see quiz/counters.py)"""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='counters')
+    attempts = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    picks_a = models.PositiveIntegerField(default=0)
+    picks_b = models.PositiveIntegerField(default=0)
+    picks_c = models.PositiveIntegerField(default=0)
+    picks_d = models.PositiveIntegerField(default=0)
+    # time_taken sketch: a histogram of 5-second buckets plus the total
+    time_total = models.FloatField(default=0.0, help_text="Sum of time taken, in seconds")
+    time_lt_5 = models.PositiveIntegerField(default=0)
+    time_lt_10 = models.PositiveIntegerField(default=0)
+    time_lt_15 = models.PositiveIntegerField(default=0)
+    time_lt_20 = models.PositiveIntegerField(default=0)
+    time_lt_25 = models.PositiveIntegerField(default=0)
+    time_lt_30 = models.PositiveIntegerField(default=0)
+    time_ge_30 = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name_plural = "Question counters"
+    
+    def __str__(self):
+        return f"Counters for question {self.question_id}"
+    
+    def get_accuracy(self):
+        if self.attempts == 0:
+            return None
+        return round(self.correct / self.attempts * 100)
+    
+    def get_pick_rates(self):
+        if self.attempts == 0:
+            return {}
+        picks = {'A': self.picks_a, 'B': self.picks_b, 'C': self.picks_c, 'D': self.picks_d}
+        return {option: round(count / self.attempts * 100) for option, count in picks.items()}
@@ -0,0 +1,145 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+def estimated_count(model, using='default'):
+    """Approximate row count of a model's table, without scanning it.
+
+    PostgreSQL's planner statistics (``pg_class.reltuples``) or SQLite's
+    ``sqlite_stat1``, falling back to the largest rowid on SQLite. Returns
+    None when the database has no usable estimate.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [connection.ops.quote_name(table)])
+            row = cursor.fetchone()
+            # -1 until the table is first vacuumed or analyzed
+            return int(row[0]) if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+                stats = [int(stat.split()[0]) for stat, in cursor.fetchall()]
+            except DatabaseError:
+                # No ANALYZE has been run yet
+                stats = []
+            if stats:
+                return max(stats)
+            cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+            return cursor.fetchone()[0] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that takes the count of an unfiltered queryset from
+    database statistics instead of ``SELECT COUNT(*)``.
+
+    Filtered querysets, and tables estimated below EXACT_BELOW rows, are
+    counted exactly. An overestimate only leaves the last pages short.
+    """
+
+    EXACT_BELOW = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where and not queryset.query.distinct:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.EXACT_BELOW:
+                return estimate
+        return super().count
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator, with the cursors of its neighbours"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Seek pagination over a queryset ordered by a unique key.
+
+    ``ordering`` lists the key's fields as in ``order_by``, e.g.
+    ``['-started_at', '-id']``; the fields must be non-null and the last
+    one unique. A page is addressed by an opaque cursor holding the key of
+    the row it starts after (or, going back, before), and is fetched with one
+    ``WHERE key < cursor ORDER BY key LIMIT per_page + 1`` query. With an
+    index on the key, page N costs the same as page 1.
+    """
+
+    def __init__(self, object_list, per_page, ordering):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.fields = [object_list.model._meta.get_field(name) for name, _ in self.keys]
+
+    def page(self, cursor=None):
+        """The page a cursor points at; the first page when it is empty"""
+        forward, values = self.decode(cursor) if cursor else (True, None)
+        queryset = self.object_list.order_by(*(
+            f'-{name}' if descending == forward else name for name, descending in self.keys
+        ))
+        if values is not None:
+            queryset = queryset.filter(self.seek(values, forward))
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        # Coming from a cursor, there is always a page on the side we came from
+        has_next, has_previous = (more, values is not None) if forward else (values is not None, more)
+        return KeysetPage(
+            rows,
+            self.encode(rows[-1], True) if has_next and rows else None,
+            self.encode(rows[0], False) if has_previous and rows else None,
+        )
+
+    def seek(self, values, forward):
+        """Rows past ``values`` in the direction of travel"""
+        condition, equal = Q(), Q()
+        for (name, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode(self, row, forward):
+        data = {'d': 'n' if forward else 'p', 'k': [field.value_to_string(row) for field in self.fields]}
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+    def decode(self, cursor):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values = [field.to_python(value) for field, value in zip(self.fields, data['k'], strict=True)]
+            return data['d'] == 'n', values
+        except (TypeError, KeyError, ValueError, ValidationError) as e:
+            raise InvalidCursor('Invalid cursor') from e
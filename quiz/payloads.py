@@ -0,0 +1,229 @@
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Question
+
+QuestionPayload = namedtuple('QuestionPayload', ['updated_at', 'details_json', 'correct_answer', 'explanation'])
+
+DEFAULTS = {
+    'MAX_BYTES': 8 * 1024 * 1024,
+    'LOCAL_TTL': 300,
+    'BACKEND': None,
+}
+
+
+def build_payload(question):
+    """Serialize a question for the details API and grading"""
+    details = {
+        'id': question.id,
+        'question': question.question_text,
+        'options': question.get_options(),
+        'correct_answer': question.correct_answer,
+        'explanation': question.explanation,
+        'explanations': question.get_explanations(),
+        'reference_link': question.reference_link,
+        'category': question.category.name,
+        'difficulty': question.difficulty_level,
+    }
+    return QuestionPayload(
+        updated_at=question.updated_at.isoformat(),
+        details_json=json.dumps(details, cls=DjangoJSONEncoder).encode(),
+        correct_answer=question.correct_answer,
+        explanation=question.explanation,
+    )
+
+
+def details_json(payload, user_answer=None):
+    """Splice the per-request ``user_answer`` into the cached details JSON"""
+    return b'%s, "user_answer": %s}' % (payload.details_json[:-1], json.dumps(user_answer).encode())
+
+
+class QuestionPayloadCache:
+    """Two-tier cache of QuestionPayload entries keyed by question id.
+
+    The first tier is an in-process LRU bounded by ``MAX_BYTES``; entries
+    expire after ``LOCAL_TTL`` seconds so other processes pick up edits.
+    The optional second tier is the Django cache named by ``BACKEND``.
+    Both are configured through ``settings.QUIZ_QUESTION_CACHE`` and
+    invalidated from the Question/Category save signals. Ids may be given
+    as ints or numeric strings (as posted by the quiz page).
+
+    A save invalidates with the question's new ``updated_at``: until a
+    payload at least that recent has been loaded, older ones are refused
+    from either tier, so a reader that loaded the row just before the save
+    cannot put the stale payload back.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._floors = {}
+
+    def _setting(self, name):
+        return getattr(settings, 'QUIZ_QUESTION_CACHE', {}).get(name, DEFAULTS[name])
+
+    def _backend(self):
+        alias = self._setting('BACKEND')
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def _key(question_id):
+        return f'quiz:question:{question_id}'
+
+    @staticmethod
+    def _sizeof(payload):
+        return len(payload.details_json) + len(payload.explanation) + 100
+
+    def _get_local(self, question_id):
+        with self._lock:
+            entry = self._entries.get(question_id)
+            if entry is None:
+                return None
+            expires, payload = entry
+            if expires < time.monotonic() or not self._fresh(question_id, payload):
+                self._pop_local(question_id)
+                return None
+            self._entries.move_to_end(question_id)
+            return payload
+
+    def _fresh(self, question_id, payload):
+        floor = self._floors.get(question_id)
+        return floor is None or datetime.fromisoformat(payload.updated_at) >= floor
+
+    def _loaded(self, question_id, payload):
+        """Keep a payload just built from the database; it clears any floor it meets"""
+        with self._lock:
+            if not self._fresh(question_id, payload):
+                return False
+            self._floors.pop(question_id, None)
+        self._set_local(question_id, payload)
+        return True
+
+    def _pop_local(self, question_id):
+        entry = self._entries.pop(question_id, None)
+        if entry is not None:
+            self._size -= self._sizeof(entry[1])
+
+    def _set_local(self, question_id, payload):
+        size = self._sizeof(payload)
+        max_bytes = self._setting('MAX_BYTES')
+        if size > max_bytes:
+            return
+        with self._lock:
+            self._pop_local(question_id)
+            self._entries[question_id] = (time.monotonic() + self._setting('LOCAL_TTL'), payload)
+            self._size += size
+            while self._size > max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= self._sizeof(evicted)
+
+    def get(self, question_id):
+        """Return the payload for a question, loading it on a miss.
+
+        Raises ``Question.DoesNotExist`` for unknown ids and ``ValueError``
+        for ids that are not numbers.
+        """
+        question_id = int(question_id)
+        payload = self._get_local(question_id)
+        if payload is not None:
+            return payload
+
+        backend = self._backend()
+        if backend is not None:
+            payload = backend.get(self._key(question_id))
+            if payload is not None and self._fresh(question_id, payload):
+                self._set_local(question_id, payload)
+                return payload
+        question = Question.objects.select_related('category').get(id=question_id)
+        payload = build_payload(question)
+        if self._loaded(question_id, payload) and backend is not None:
+            backend.set(self._key(question_id), payload)
+        return payload
+
+    async def aget(self, question_id):
+        """Async ``get``: a local hit returns at once, a miss uses the async cache and ORM"""
+        question_id = int(question_id)
+        payload = self._get_local(question_id)
+        if payload is not None:
+            return payload
+
+        backend = self._backend()
+        if backend is not None:
+            payload = await backend.aget(self._key(question_id))
+            if payload is not None and self._fresh(question_id, payload):
+                self._set_local(question_id, payload)
+                return payload
+        question = await Question.objects.select_related('category').aget(id=question_id)
+        payload = build_payload(question)
+        if self._loaded(question_id, payload) and backend is not None:
+            await backend.aset(self._key(question_id), payload)
+        return payload
+
+    async def aget_many(self, question_ids):
+        """Payloads for several questions as a dict keyed by (int) id.
+
+        Local hits are served directly, the shared tier is read with one
+        ``get_many`` and the remaining questions with one ``id__in`` query.
+        Unknown ids are left out.
+        """
+        payloads = {}
+        missing = []
+        for question_id in {int(question_id) for question_id in question_ids}:
+            payload = self._get_local(question_id)
+            if payload is None:
+                missing.append(question_id)
+            else:
+                payloads[question_id] = payload
+
+        backend = self._backend()
+        if missing and backend is not None:
+            cached = await backend.aget_many([self._key(question_id) for question_id in missing])
+            for question_id in missing:
+                payload = cached.get(self._key(question_id))
+                if payload is not None and self._fresh(question_id, payload):
+                    payloads[question_id] = payload
+                    self._set_local(question_id, payload)
+            missing = [question_id for question_id in missing if question_id not in payloads]
+        if missing:
+            loaded = {}
+            async for question in Question.objects.filter(id__in=missing).select_related('category'):
+                loaded[question.id] = build_payload(question)
+            payloads.update(loaded)
+            loaded = {question_id: payload for question_id, payload in loaded.items() if self._loaded(question_id, payload)}
+            if loaded and backend is not None:
+                await backend.aset_many({self._key(question_id): payload for question_id, payload in loaded.items()})
+        return payloads
+
+    def invalidate(self, *question_ids, updated_at=None):
+        """Evict questions from both tiers.
+
+        ``updated_at`` is the questions' new modification time, when known;
+        payloads older than it are refused until a fresh one is loaded.
+        """
+        question_ids = [int(question_id) for question_id in question_ids]
+        with self._lock:
+            for question_id in question_ids:
+                self._pop_local(question_id)
+                if updated_at is not None:
+                    self._floors[question_id] = updated_at
+        backend = self._backend()
+        if backend is not None:
+            backend.delete_many([self._key(question_id) for question_id in question_ids])
+
+    def clear(self):
+        """Empty the in-process tier"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._floors.clear()
+
+
+question_payloads = QuestionPayloadCache()
@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import UserAnswer
+
+# A completed session's results never change
+RESULTS_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def results_cache_key(session_id):
+    return f'quiz:results:{session_id}'
+
+
+def summarize(session):
+    """Correct/incorrect counts and per-category breakdown of a session.
+
+    Computed with one query grouping the session's answers by category;
+    the summary of a completed session is cached.
+    """
+    if session.completed_at:
+        summary = cache.get(results_cache_key(session.id))
+        if summary is not None:
+            return summary
+
+    rows = UserAnswer.objects.filter(
+        quiz_session_id=session.id
+    ).order_by('question__category__name').values('question__category__name').annotate(
+        total=Count('id'),
+        correct=Count('id', filter=Q(is_correct=True))
+    )
+    category_stats = {}
+    for row in rows:
+        category_stats[row['question__category__name']] = {
+            'correct': row['correct'],
+            'total': row['total'],
+            'half_total': row['total'] / 2,
+        }
+    correct_count = sum(stats['correct'] for stats in category_stats.values())
+    summary = {
+        'correct_count': correct_count,
+        'incorrect_count': sum(stats['total'] for stats in category_stats.values()) - correct_count,
+        'category_stats': category_stats if session.is_mixed else {},
+    }
+
+    if session.completed_at:
+        cache.set(results_cache_key(session.id), summary, RESULTS_CACHE_TIMEOUT)
+    return summary
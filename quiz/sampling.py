@@ -0,0 +1,207 @@
+import random
+import threading
+import time
+
+from .models import Question
+
+# Width, in logits, of the rating bands used by RatingSampler; ratings past
+# the outermost band are clamped into it
+BAND_WIDTH = 0.5
+MAX_BAND = 6
+
+
+def rating_band(rating):
+    """Band index of a difficulty rating"""
+    return max(-MAX_BAND, min(MAX_BAND, round(rating / BAND_WIDTH)))
+
+
+class QuestionSampler:
+    """In-memory index of question ids bucketed by (category, difficulty).
+
+    The index is loaded lazily with a single ``values_list`` query and kept
+    up to date from the ``Question`` save/delete signals (see ``signals.py``).
+    Each bucket is a plain list plus an id -> position map, so additions and
+    removals are O(1) (swap with last) and sampling k ids is O(k).
+    Bulk writes fire no signals, so the index is also reloaded every
+    MAX_AGE seconds.
+    """
+
+    # Give up topping up a sample after this many rounds of stale ids
+    MAX_ROUNDS = 3
+    MAX_AGE = 600
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Drop the index; it is rebuilt on next use"""
+        with self._lock:
+            self._buckets = {}
+            self._positions = {}
+            self._loaded = False
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            if time.monotonic() - self._loaded_at < self.MAX_AGE:
+                return
+            self.reset()
+        for question_id, category_id, difficulty in self._rows():
+            self._add(question_id, (category_id, difficulty))
+        self._loaded = True
+        self._loaded_at = time.monotonic()
+
+    def _rows(self):
+        rows = Question.objects.order_by().values_list('id', 'category_id', 'difficulty_level')
+        return rows.iterator(chunk_size=5000)
+
+    def _add(self, question_id, key):
+        bucket = self._buckets.setdefault(key, [])
+        self._positions[question_id] = (key, len(bucket))
+        bucket.append(question_id)
+
+    def _remove(self, question_id):
+        key, index = self._positions.pop(question_id)
+        bucket = self._buckets[key]
+        last = bucket.pop()
+        if last != question_id:
+            bucket[index] = last
+            self._positions[last] = (key, index)
+        if not bucket:
+            del self._buckets[key]
+
+    def add(self, question_id, category_id, difficulty):
+        """Index a new or updated question"""
+        with self._lock:
+            if not self._loaded:
+                return
+            key = (category_id, difficulty)
+            current = self._positions.get(question_id)
+            if current is not None:
+                if current[0] == key:
+                    return
+                self._remove(question_id)
+            self._add(question_id, key)
+
+    def discard(self, question_id):
+        """Remove a question from the index if present"""
+        with self._lock:
+            if question_id in self._positions:
+                self._remove(question_id)
+
+    def _matching_buckets(self, category_id=None, difficulty=None):
+        return [
+            bucket for (bucket_category, bucket_difficulty), bucket in self._buckets.items()
+            if (category_id is None or bucket_category == category_id)
+            and (difficulty is None or bucket_difficulty == difficulty)
+        ]
+
+    def count(self, category_id=None, difficulty=None):
+        """Number of indexed questions matching the filters"""
+        with self._lock:
+            self._ensure_loaded()
+            return sum(len(b) for b in self._matching_buckets(category_id, difficulty))
+
+    def _sample_ids(self, k, category_id, difficulty, exclude):
+        buckets = self._matching_buckets(category_id, difficulty)
+        total = sum(len(b) for b in buckets)
+        picked = []
+        for index in random.sample(range(total), min(total, k + len(exclude))):
+            for bucket in buckets:
+                if index < len(bucket):
+                    question_id = bucket[index]
+                    break
+                index -= len(bucket)
+            if question_id not in exclude:
+                picked.append(question_id)
+                if len(picked) == k:
+                    break
+        return picked
+
+    def sample(self, k, category_id=None, difficulty=None):
+        """Return up to k random question ids that exist in the database.
+
+        The ids are checked with one ``id__in`` query; ids that have gone
+        missing (deleted by another process, rolled back) are dropped from
+        the index and the sample is topped up.
+        """
+        return self._verified(k, lambda n, exclude: self._sample_ids(n, category_id, difficulty, exclude))
+
+    def _verified(self, k, draw):
+        """Collect up to k ids from ``draw(n, exclude)`` that exist in the database"""
+        picked = []
+        for _ in range(self.MAX_ROUNDS):
+            with self._lock:
+                self._ensure_loaded()
+                candidates = draw(k - len(picked), set(picked))
+            if not candidates:
+                break
+            existing = set(
+                Question.objects.filter(id__in=candidates).values_list('id', flat=True)
+            )
+            for question_id in candidates:
+                if question_id in existing:
+                    picked.append(question_id)
+                else:
+                    self.discard(question_id)
+            if len(picked) >= k or len(existing) == len(candidates):
+                break
+        return picked
+
+
+class RatingSampler(QuestionSampler):
+    """Question ids bucketed by (category, rating band) for adaptive selection.
+
+    Kept current from the same signals as ``QuestionSampler``; ratings move
+    in bulk updates when sessions complete, so ``adaptive.record_session``
+    re-files the questions it rated. Questions flagged by the item
+    statistics job are remembered when the index loads and never added
+    back; storing new statistics resets the index.
+    """
+
+    def reset(self):
+        with self._lock:
+            super().reset()
+            self._flagged = set()
+
+    def _rows(self):
+        rows = Question.objects.order_by().values_list('id', 'category_id', 'rating', 'stats__flagged')
+        for question_id, category_id, rating, flagged in rows.iterator(chunk_size=5000):
+            if flagged:
+                self._flagged.add(question_id)
+            else:
+                yield question_id, category_id, rating_band(rating)
+
+    def add(self, question_id, category_id, band):
+        """Index a new or re-rated question, unless it is flagged"""
+        with self._lock:
+            if question_id not in self._flagged:
+                super().add(question_id, category_id, band)
+
+    def sample_near(self, k, category_id, band, avoid=()):
+        """Return up to k existing question ids of a category, nearest band first.
+
+        Bands are visited outwards from ``band`` (band, band + 1, band - 1,
+        ...), skipping ids in ``avoid``; when the category runs out of
+        unavoided questions the rest are drawn ignoring ``avoid``. Work is
+        bounded by k, the number of bands and the size of ``avoid``, not by
+        the number of questions.
+        """
+        def draw(n, exclude):
+            picked = []
+            skip = exclude | set(avoid)
+            for offset in range(4 * MAX_BAND + 1):
+                nearby = band + (offset + 1) // 2 if offset % 2 else band - offset // 2
+                if abs(nearby) > MAX_BAND:
+                    continue
+                picked += self._sample_ids(n - len(picked), category_id, nearby, skip | set(picked))
+                if len(picked) == n:
+                    return picked
+            return picked + self._sample_ids(n - len(picked), category_id, None, exclude | set(picked))
+
+        return self._verified(k, draw)
+
+
+question_sampler = QuestionSampler()
+rating_sampler = RatingSampler()
@@ -0,0 +1,313 @@
+from collections import namedtuple
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.db.models import Count, Exists, F, IntegerField, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import adaptive, counters, leaderboard, stats
+from .models import QuizSession, QuizQuestion, UserAnswer
+
+BuiltSession = namedtuple('BuiltSession', ['session', 'statements'])
+
+
+class StatementCounter:
+    """Execute wrapper that counts SQL statements sent to the database"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def build_quiz_session(request, question_ids, category=None):
+    """Create a QuizSession and its QuizQuestion rows in one transaction.
+
+    The questions are written with a single ``bulk_create``. Returns the
+    session together with the number of statements issued inside the
+    transaction.
+    """
+    counter = StatementCounter()
+    with transaction.atomic(), connection.execute_wrapper(counter):
+        session = QuizSession.objects.create(
+            user=request.user if request.user.is_authenticated else None,
+            session_key=request.session.session_key,
+            category=category,
+            is_mixed=category is None,
+            total_questions=len(question_ids)
+        )
+        QuizQuestion.objects.bulk_create([
+            QuizQuestion(quiz_session=session, question_id=question_id, order=i + 1)
+            for i, question_id in enumerate(question_ids)
+        ])
+    return BuiltSession(session, counter.count)
+
+
+def next_quiz_question(session):
+    """Return the first unanswered QuizQuestion of a session, or None.
+
+    A single query anti-joins QuizQuestion against UserAnswer, ordered by
+    ``order``, and annotates the number of answers given so far as
+    ``answered_count``. The question row is loaded via ``select_related``.
+    """
+    answered = UserAnswer.objects.filter(
+        quiz_session_id=OuterRef('quiz_session_id'),
+        question_id=OuterRef('question_id')
+    )
+    answered_count = UserAnswer.objects.filter(
+        quiz_session_id=OuterRef('quiz_session_id')
+    ).order_by().values('quiz_session_id').annotate(count=Count('id')).values('count')
+    return QuizQuestion.objects.filter(
+        quiz_session_id=session.id
+    ).exclude(
+        Exists(answered)
+    ).annotate(
+        answered_count=Coalesce(Subquery(answered_count, output_field=IntegerField()), 0)
+    ).select_related('question').order_by('order').first()
+
+
+def grade_answer(session, question_id, selected_answer, correct_answer, time_taken=0):
+    """Build an unsaved, graded UserAnswer"""
+    return UserAnswer(
+        quiz_session=session,
+        question_id=question_id,
+        selected_answer=selected_answer,
+        is_correct=selected_answer == correct_answer,
+        time_taken=timedelta(seconds=time_taken)
+    )
+
+
+def first_unanswered(session_id):
+    """Subquery of the order of a session's first unanswered question"""
+    return QuizQuestion.objects.filter(
+        quiz_session_id=session_id
+    ).exclude(
+        Exists(UserAnswer.objects.filter(
+            quiz_session_id=OuterRef('quiz_session_id'),
+            question_id=OuterRef('question_id')
+        ))
+    ).order_by('order').values('order')[:1]
+
+
+def cursor_position(session_id):
+    """``current_order`` of a session: its first unanswered question, or
+    one past the last when every question is answered"""
+    return Coalesce(
+        Subquery(first_unanswered(session_id), output_field=IntegerField()),
+        F('total_questions') + 1,
+        output_field=IntegerField()
+    )
+
+
+def advance_cursor(answer):
+    """Move the session cursor past a saved answer.
+
+    ``answered_count`` and ``score`` are bumped with F-expressions and
+    ``current_order`` is set to the first question still unanswered, so
+    answers given out of order never leave the cursor on an answered
+    question. Raises ``ValueError`` when the question is not part of the
+    session.
+    """
+    in_session = QuizQuestion.objects.filter(quiz_session_id=OuterRef('id'), question_id=answer.question_id)
+    updated = QuizSession.objects.filter(Exists(in_session), id=answer.quiz_session_id).update(
+        answered_count=F('answered_count') + 1,
+        score=F('score') + int(answer.is_correct),
+        current_order=cursor_position(answer.quiz_session_id)
+    )
+    if not updated:
+        raise ValueError('Question is not part of this session')
+
+
+def record_answer(session, question_id, selected_answer, correct_answer, time_taken=0):
+    """Save a graded answer, advance the session cursor and bump the
+    question's counters atomically.
+
+    An answer to a question outside the session is rolled back with
+    ``ValueError``.
+    """
+    answer = grade_answer(session, question_id, selected_answer, correct_answer, time_taken)
+    with transaction.atomic():
+        answer.save()
+        advance_cursor(answer)
+        counters.record([answer])
+    return answer
+
+
+async def arecord_answer(session, question_id, selected_answer, correct_answer, time_taken=0):
+    """Async ``record_answer``.
+
+    The async ORM has no ``atomic()``, so the save and the cursor update
+    run together in one ``sync_to_async`` call.
+    """
+    return await sync_to_async(record_answer)(session, question_id, selected_answer, correct_answer, time_taken)
+
+
+def advance_cursors(answers):
+    """Move the cursors of the sessions of a batch of saved answers.
+
+    One UPDATE per session bumps ``answered_count`` and ``score`` and sets
+    ``current_order`` to the first question still unanswered, so answers
+    given out of order leave the cursor where ``repair_cursors`` would.
+    """
+    totals = {}
+    for answer in answers:
+        answered, correct = totals.get(answer.quiz_session_id, (0, 0))
+        totals[answer.quiz_session_id] = (answered + 1, correct + int(answer.is_correct))
+    for session_id, (answered, correct) in totals.items():
+        QuizSession.objects.filter(id=session_id).update(
+            answered_count=F('answered_count') + answered,
+            score=F('score') + correct,
+            current_order=cursor_position(session_id)
+        )
+
+
+def write_answers(answers):
+    """Save a batch of graded answers in one transaction.
+
+    Answers to questions outside their session, and answers already
+    stored (or repeated within the batch), are skipped, so a retried
+    submission cannot count twice; one query over QuizQuestion finds
+    both. The rest are written with one ``bulk_create`` and then advance
+    their sessions' cursors with one UPDATE per session and their
+    questions' counters with one upsert. Returns the answers that were
+    written.
+    """
+    in_session, seen = set(), set()
+    with transaction.atomic():
+        rows = QuizQuestion.objects.filter(
+            quiz_session_id__in={a.quiz_session_id for a in answers},
+            question_id__in={a.question_id for a in answers}
+        ).annotate(answered=Exists(UserAnswer.objects.filter(
+            quiz_session_id=OuterRef('quiz_session_id'),
+            question_id=OuterRef('question_id')
+        ))).values_list('quiz_session_id', 'question_id', 'answered')
+        for session_id, question_id, answered in rows:
+            in_session.add((session_id, question_id))
+            if answered:
+                seen.add((session_id, question_id))
+        fresh = []
+        for answer in answers:
+            key = (answer.quiz_session_id, answer.question_id)
+            if key in in_session and key not in seen:
+                seen.add(key)
+                fresh.append(answer)
+        UserAnswer.objects.bulk_create(fresh)
+        advance_cursors(fresh)
+        counters.record(fresh)
+    return fresh
+
+
+def record_answers(answers):
+    """Save one session's graded answers and look up the ones skipped.
+
+    Answers are written with ``write_answers``. Returns the written answers
+    and, for questions whose answer was already stored (or repeated in the
+    batch), a map of question id to the stored selection, so a retried
+    batch is graded exactly as the first attempt was. Skipped questions
+    missing from the map are not part of the session.
+    """
+    written = write_answers(answers)
+    written_ids = {id(answer) for answer in written}
+    skipped = [answer for answer in answers if id(answer) not in written_ids]
+    stored = {}
+    if skipped:
+        stored = dict(UserAnswer.objects.filter(
+            quiz_session_id=skipped[0].quiz_session_id,
+            question_id__in={answer.question_id for answer in skipped}
+        ).values_list('question_id', 'selected_answer'))
+    return written, stored
+
+
+async def arecord_answers(answers):
+    """Async ``record_answers``; the batch is written in one ``sync_to_async`` call"""
+    return await sync_to_async(record_answers)(answers)
+
+
+def complete_session(session):
+    """Mark a session completed and publish it to the leaderboard, the
+    user's statistics rollup and the adaptive ratings.
+
+    The conditional UPDATE makes completion happen once even when several
+    requests race past the last question. Returns whether this call did it.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        if not QuizSession.objects.filter(id=session.id, completed_at__isnull=True).update(completed_at=now):
+            return False
+        session.completed_at = now
+        leaderboard.record_session(session)
+        stats.record_session(session)
+        adaptive.record_session(session)
+    return True
+
+
+def cursor_quiz_question(session):
+    """Return the QuizQuestion at the session cursor, or None when done"""
+    if session.completed_at is not None or session.answered_count >= session.total_questions:
+        return None
+    quiz_question = QuizQuestion.objects.filter(
+        quiz_session_id=session.id,
+        order=session.current_order
+    ).select_related('question').first()
+    if quiz_question is None:
+        # Cursor out of step with the session's questions; fall back to
+        # the anti-join lookup
+        quiz_question = next_quiz_question(session)
+    else:
+        quiz_question.answered_count = session.answered_count
+    return quiz_question
+
+
+def repair_cursors(sessions):
+    """Rebuild the cursor of each session from its UserAnswer rows.
+
+    ``sessions`` is a QuizSession queryset; the cursor values are computed
+    in one annotated query and written back with ``bulk_update``. Returns
+    the number of sessions whose cursor changed.
+    """
+    answers = UserAnswer.objects.filter(
+        quiz_session_id=OuterRef('id')
+    ).order_by().values('quiz_session_id')
+    unanswered = QuizQuestion.objects.filter(
+        quiz_session_id=OuterRef('id')
+    ).exclude(
+        Exists(UserAnswer.objects.filter(
+            quiz_session_id=OuterRef('quiz_session_id'),
+            question_id=OuterRef('question_id')
+        ))
+    ).order_by().values('quiz_session_id').annotate(first=Min('order')).values('first')
+    annotated = sessions.annotate(
+        actual_answered=Coalesce(Subquery(
+            answers.annotate(count=Count('id')).values('count'), output_field=IntegerField()
+        ), 0),
+        actual_score=Coalesce(Subquery(
+            answers.filter(is_correct=True).annotate(count=Count('id')).values('count'),
+            output_field=IntegerField()
+        ), 0),
+        actual_order=Coalesce(
+            Subquery(unanswered, output_field=IntegerField()),
+            F('total_questions') + 1,
+            output_field=IntegerField()
+        ),
+    ).order_by('id')
+
+    fields = ['answered_count', 'score', 'current_order']
+    batch = []
+    repaired = 0
+    for session in annotated.iterator(chunk_size=1000):
+        actual = (session.actual_answered, session.actual_score, session.actual_order)
+        if (session.answered_count, session.score, session.current_order) == actual:
+            continue
+        session.answered_count, session.score, session.current_order = actual
+        batch.append(session)
+        repaired += 1
+        if len(batch) >= 1000:
+            QuizSession.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        QuizSession.objects.bulk_update(batch, fields)
+    return repaired
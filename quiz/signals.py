@@ -0,0 +1,44 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .home import invalidate_catalog
+from .instrumentation import install_recorder
+from .models import Category, Question
+from .payloads import question_payloads
+from .sampling import question_sampler, rating_band, rating_sampler
+from .sqlite import configure_connection
+
+connection_created.connect(configure_connection, dispatch_uid='quiz_sqlite_tuning')
+connection_created.connect(install_recorder, dispatch_uid='quiz_query_recorder')
+
+
+@receiver(post_save, sender=Question)
+def index_question(sender, instance, **kwargs):
+    """Keep the sampler index in step with question edits"""
+    question_sampler.add(instance.id, instance.category_id, instance.difficulty_level)
+    rating_sampler.add(instance.id, instance.category_id, rating_band(instance.rating))
+    question_payloads.invalidate(instance.id, updated_at=instance.updated_at)
+
+
+@receiver(post_delete, sender=Question)
+def unindex_question(sender, instance, **kwargs):
+    question_sampler.discard(instance.id)
+    rating_sampler.discard(instance.id)
+    question_payloads.invalidate(instance.id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_home_catalog(sender, **kwargs):
+    """Home page question counts and category grid"""
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=Category)
+def invalidate_category_questions(sender, instance, created, **kwargs):
+    """Cached question payloads embed the category name"""
+    if not created:
+        question_payloads.invalidate(*instance.questions.values_list('id', flat=True))
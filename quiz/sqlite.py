@@ -0,0 +1,44 @@
+from django.conf import settings
+
+DEFAULTS = {
+    'ENABLED': False,
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'BUSY_TIMEOUT_MS': 5000,
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    'CACHE_SIZE_KIB': 64 * 1024,
+    'TRANSACTION_MODE': 'IMMEDIATE',
+}
+
+
+def tuning_setting(name):
+    return getattr(settings, 'QUIZ_SQLITE_TUNING', {}).get(name, DEFAULTS[name])
+
+
+def pragmas():
+    """PRAGMA statements applied to every new SQLite connection"""
+    return [
+        f'PRAGMA journal_mode={tuning_setting("JOURNAL_MODE")}',
+        f'PRAGMA synchronous={tuning_setting("SYNCHRONOUS")}',
+        f'PRAGMA busy_timeout={int(tuning_setting("BUSY_TIMEOUT_MS"))}',
+        f'PRAGMA mmap_size={int(tuning_setting("MMAP_SIZE"))}',
+        # A negative cache_size is in KiB rather than pages
+        f'PRAGMA cache_size=-{int(tuning_setting("CACHE_SIZE_KIB"))}',
+    ]
+
+
+def configure_connection(sender, connection, **kwargs):
+    """``connection_created`` hook that applies QUIZ_SQLITE_TUNING.
+
+    Besides the pragmas, transactions start as ``BEGIN IMMEDIATE`` unless
+    the database's OPTIONS already choose a mode: a deferred transaction
+    that reads before writing cannot wait for the write lock and fails
+    with "database is locked" straight away, whatever the busy timeout.
+    """
+    if connection.vendor != 'sqlite' or not tuning_setting('ENABLED'):
+        return
+    with connection.cursor() as cursor:
+        for statement in pragmas():
+            cursor.execute(statement)
+    if connection.transaction_mode is None:
+        connection.transaction_mode = tuning_setting('TRANSACTION_MODE')
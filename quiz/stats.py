@@ -0,0 +1,116 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import QuizSession, UserCategoryStats, UserStats
+
+USER_FIELDS = ['total_sessions', 'total_questions', 'total_correct', 'percentage_sum', 'best_percentage']
+CATEGORY_FIELDS = ['sessions', 'total_score', 'total_questions']
+
+
+def record_session(session):
+    """Fold a just-completed session into its user's rollups.
+
+    Called inside the transaction that completes the session; anonymous
+    sessions are ignored.
+    """
+    if not session.user_id:
+        return
+    percentage = session.get_percentage()
+    UserStats.objects.get_or_create(user_id=session.user_id)
+    UserStats.objects.filter(user_id=session.user_id).update(
+        total_sessions=F('total_sessions') + 1,
+        total_questions=F('total_questions') + session.total_questions,
+        total_correct=F('total_correct') + session.score,
+        percentage_sum=F('percentage_sum') + percentage,
+        best_percentage=Greatest(F('best_percentage'), percentage),
+    )
+    if session.category_id:
+        UserCategoryStats.objects.get_or_create(user_id=session.user_id, category_id=session.category_id)
+        UserCategoryStats.objects.filter(user_id=session.user_id, category_id=session.category_id).update(
+            sessions=F('sessions') + 1,
+            total_score=F('total_score') + session.score,
+            total_questions=F('total_questions') + session.total_questions,
+        )
+
+
+def compute(user_ids=None):
+    """Recompute rollups from raw QuizSession rows.
+
+    Streams the completed sessions once and returns two dicts:
+    ``{user_id: {field: value}}`` and ``{(user_id, category_id): {field: value}}``.
+    """
+    sessions = QuizSession.objects.filter(completed_at__isnull=False, user__isnull=False)
+    if user_ids is not None:
+        sessions = sessions.filter(user_id__in=user_ids)
+    users, categories = {}, {}
+    rows = sessions.order_by().values_list('user_id', 'category_id', 'score', 'total_questions')
+    for user_id, category_id, score, total_questions in rows.iterator(chunk_size=5000):
+        percentage = QuizSession(score=score, total_questions=total_questions).get_percentage()
+        totals = users.setdefault(user_id, dict.fromkeys(USER_FIELDS, 0))
+        totals['total_sessions'] += 1
+        totals['total_questions'] += total_questions
+        totals['total_correct'] += score
+        totals['percentage_sum'] += percentage
+        totals['best_percentage'] = max(totals['best_percentage'], percentage)
+        if category_id:
+            totals = categories.setdefault((user_id, category_id), dict.fromkeys(CATEGORY_FIELDS, 0))
+            totals['sessions'] += 1
+            totals['total_score'] += score
+            totals['total_questions'] += total_questions
+    return users, categories
+
+
+def stored(user_ids=None):
+    """Current rollups in the same shape as ``compute``"""
+    user_rows = UserStats.objects.all()
+    category_rows = UserCategoryStats.objects.all()
+    if user_ids is not None:
+        user_rows = user_rows.filter(user_id__in=user_ids)
+        category_rows = category_rows.filter(user_id__in=user_ids)
+    users = {
+        row['user_id']: {field: row[field] for field in USER_FIELDS}
+        for row in user_rows.values('user_id', *USER_FIELDS)
+    }
+    categories = {
+        (row['user_id'], row['category_id']): {field: row[field] for field in CATEGORY_FIELDS}
+        for row in category_rows.values('user_id', 'category_id', *CATEGORY_FIELDS)
+    }
+    return users, categories
+
+
+def rebuild(user_ids=None):
+    """Replace the stored rollups with freshly computed ones"""
+    users, categories = compute(user_ids)
+    with transaction.atomic():
+        user_rows = UserStats.objects.all()
+        category_rows = UserCategoryStats.objects.all()
+        if user_ids is not None:
+            user_rows = user_rows.filter(user_id__in=user_ids)
+            category_rows = category_rows.filter(user_id__in=user_ids)
+        user_rows.delete()
+        category_rows.delete()
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id, **totals) for user_id, totals in users.items()],
+            batch_size=1000
+        )
+        UserCategoryStats.objects.bulk_create(
+            [UserCategoryStats(user_id=user_id, category_id=category_id, **totals)
+             for (user_id, category_id), totals in categories.items()],
+            batch_size=1000
+        )
+    return len(users), len(categories)
+
+
+def check(user_ids=None):
+    """Compare stored rollups with raw session data.
+
+    Returns a list of ``(key, expected, actual)`` mismatches, where key is a
+    user id or a ``(user_id, category_id)`` pair and missing rows are None.
+    """
+    mismatches = []
+    for expected, actual in zip(compute(user_ids), stored(user_ids)):
+        for key in sorted(expected.keys() | actual.keys()):
+            if expected.get(key) != actual.get(key):
+                mismatches.append((key, expected.get(key), actual.get(key)))
+    return mismatches
@@ -1,3 +1,1473 @@
-from django.test import TestCase
+import itertools
+import json
+import os
+import runpy
+import tempfile
+import unittest
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 # Create your tests here.
+from django.urls import reverse
+from django.utils import timezone
+
+from . import adaptive, admin, counters, leaderboard, views
+from .management.commands import explain_hot_queries
+from .instrumentation import QueryBudgetExceeded, fingerprint, query_stats
+from .models import DIFFICULTY_PRIORS, Category, LeaderboardEntry, Question, QuizSession, QuestionCounters, QuestionStats, QuizQuestion, UserAbility, UserAnswer, UserCategoryStats, UserStats
+from .ingest import AnswerQueueFull, AnswerWriter
+from .paginator import EstimatedCountPaginator, InvalidCursor, KeysetPaginator
+from .payloads import question_payloads
+from .sampling import question_sampler, rating_band, rating_sampler
+from .services import build_quiz_session, complete_session, record_answer, repair_cursors, write_answers
+
+
+# Question text must be unique across calls (see Question.content_hash)
+question_numbers = itertools.count()
+
+
+def make_questions(category, count, difficulty='medium'):
+    return [
+        Question.objects.create(
+            category=category,
+            question_text=f'{category.name} question {next(question_numbers)}?',
+            option_a='A', option_b='B', option_c='C', option_d='D',
+            correct_answer='A',
+            explanation='Because A.',
+            difficulty_level=difficulty,
+        )
+        for _ in range(count)
+    ]
+
+
+def make_session(questions, category=None, user=None):
+    session = QuizSession.objects.create(
+        user=user,
+        category=category,
+        is_mixed=category is None,
+        total_questions=len(questions)
+    )
+    QuizQuestion.objects.bulk_create([
+        QuizQuestion(quiz_session=session, question=question, order=i + 1)
+        for i, question in enumerate(questions)
+    ])
+    return session
+
+
+def answer(session, question, selected_answer='A'):
+    return record_answer(session, question.id, selected_answer, question.correct_answer)
+
+
+def play(client, category, correct, user=None, length=5):
+    """Answer a whole quiz, getting the first ``correct`` questions right"""
+    questions = make_questions(category, length)
+    session = make_session(questions, category, user)
+    for i, question in enumerate(questions):
+        answer(session, question, 'A' if i < correct else 'B')
+    client.get(reverse('quiz:quiz_question', args=[session.id]))
+    return session
+
+
+@override_settings(QUIZ_INSTRUMENTATION={'SERVER_TIMING': True, 'STRICT_BUDGETS': True})
+class QuizTestCase(TestCase):
+    """
+    Base test case that resets in-process indexes between tests and fails
+    any request that exceeds its view's query budget.
+    """
+
+    def setUp(self):
+        question_sampler.reset()
+        rating_sampler.reset()
+        question_payloads.clear()
+        cache.clear()
+        self.science = Category.objects.create(name='Science')
+        self.history = Category.objects.create(name='History')
+
+
+class QuestionSamplerTests(QuizTestCase):
+    """
+    Tests for the in-memory question sampler.
+    """
+
+    def test_sample_is_limited_to_category(self):
+        science_ids = {q.id for q in make_questions(self.science, 20)}
+        make_questions(self.history, 20)
+        sample = question_sampler.sample(15, category_id=self.science.id)
+        self.assertEqual(len(sample), 15)
+        self.assertEqual(len(set(sample)), 15)
+        self.assertTrue(set(sample) <= science_ids)
+
+    def test_index_follows_save_and_delete(self):
+        questions = make_questions(self.science, 3)
+        self.assertEqual(question_sampler.count(category_id=self.science.id), 3)
+        make_questions(self.science, 2, difficulty='hard')
+        self.assertEqual(question_sampler.count(category_id=self.science.id, difficulty='hard'), 2)
+        questions[0].category = self.history
+        questions[0].save()
+        questions[1].delete()
+        self.assertEqual(question_sampler.count(category_id=self.science.id), 3)
+        self.assertEqual(question_sampler.count(category_id=self.history.id), 1)
+
+    def test_stale_ids_are_dropped(self):
+        questions = make_questions(self.science, 6)
+        question_sampler.count()
+        Question.objects.filter(id=questions[0].id).delete()
+        sample = question_sampler.sample(6)
+        self.assertEqual(len(sample), 5)
+        self.assertNotIn(questions[0].id, sample)
+        self.assertEqual(question_sampler.count(), 5)
+
+
+class StartQuizTests(QuizTestCase):
+    """
+    Tests for starting category and mixed quizzes.
+    """
+
+    def test_start_quiz_creates_session(self):
+        make_questions(self.science, 20)
+        response = self.client.get(reverse('quiz:start_quiz', args=[self.science.id]))
+        session = QuizSession.objects.get()
+        self.assertRedirects(response, reverse('quiz:quiz_question', args=[session.id]), fetch_redirect_response=False)
+        self.assertEqual(session.total_questions, 15)
+        self.assertEqual(QuizQuestion.objects.filter(quiz_session=session).count(), 15)
+
+    def test_start_quiz_requires_enough_questions(self):
+        make_questions(self.science, 4)
+        response = self.client.get(reverse('quiz:start_quiz', args=[self.science.id]))
+        self.assertTemplateUsed(response, 'quiz/error.html')
+
+    def test_start_mixed_quiz(self):
+        make_questions(self.science, 8)
+        make_questions(self.history, 8)
+        self.client.get(reverse('quiz:start_mixed_quiz'))
+        session = QuizSession.objects.get()
+        self.assertTrue(session.is_mixed)
+        self.assertEqual(session.total_questions, 15)
+
+
+class BuildQuizSessionTests(QuizTestCase):
+    """
+    Tests for the batched session builder.
+    """
+
+    def test_session_and_questions_written_in_two_statements(self):
+        questions = make_questions(self.science, 15)
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        request.session = SessionStore()
+        # One SAVEPOINT/RELEASE pair from the test transaction plus two INSERTs
+        with self.assertNumQueries(4):
+            built = build_quiz_session(request, [q.id for q in questions], category=self.science)
+        self.assertEqual(built.statements, 2)
+        self.assertFalse(built.session.is_mixed)
+        orders = list(QuizQuestion.objects.filter(quiz_session=built.session).values_list('order', flat=True))
+        self.assertEqual(orders, list(range(1, 16)))
+
+
+class QuizQuestionViewTests(QuizTestCase):
+    """
+    Tests for resolving the current question of a session.
+    """
+
+    def test_shows_first_unanswered_question_in_order(self):
+        questions = make_questions(self.science, 5)
+        session = make_session(questions, self.science)
+        answer(session, questions[0])
+        answer(session, questions[2])
+        response = self.client.get(reverse('quiz:quiz_question', args=[session.id]))
+        self.assertEqual(response.context['question'], questions[1])
+        self.assertEqual(response.context['current_question_number'], 3)
+        self.assertEqual(response.context['progress_percentage'], 40)
+
+    def test_query_count_does_not_grow_with_quiz_length(self):
+        counts = []
+        for length in (5, 15):
+            questions = make_questions(self.science, length)
+            session = make_session(questions, self.science)
+            for question in questions[:length - 1]:
+                answer(session, question)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('quiz:quiz_question', args=[session.id]))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_completes_session_when_all_answered(self):
+        questions = make_questions(self.science, 5)
+        session = make_session(questions, self.science)
+        for question in questions:
+            answer(session, question, 'A' if question != questions[0] else 'B')
+        response = self.client.get(reverse('quiz:quiz_question', args=[session.id]))
+        self.assertRedirects(response, reverse('quiz:quiz_results', args=[session.id]), fetch_redirect_response=False)
+        session.refresh_from_db()
+        self.assertIsNotNone(session.completed_at)
+        self.assertEqual(session.score, 4)
+
+
+class SessionCursorTests(QuizTestCase):
+    """
+    Tests for the question cursor stored on QuizSession.
+    """
+
+    def test_answers_advance_cursor(self):
+        questions = make_questions(self.science, 5)
+        session = make_session(questions, self.science)
+        answer(session, questions[0])
+        answer(session, questions[1], 'B')
+        session.refresh_from_db()
+        self.assertEqual((session.current_order, session.answered_count, session.score), (3, 2, 1))
+
+    def test_out_of_order_answers_move_cursor_to_first_unanswered(self):
+        questions = make_questions(self.science, 3)
+        session = make_session(questions, self.science)
+        answer(session, questions[1])
+        session.refresh_from_db()
+        self.assertEqual(session.current_order, 1)
+        answer(session, questions[0])
+        session.refresh_from_db()
+        self.assertEqual((session.current_order, session.answered_count), (3, 2))
+        response = self.client.get(reverse('quiz:quiz_question', args=[session.id]))
+        self.assertEqual(response.context['question'], questions[2])
+
+    def test_answer_outside_session_is_rejected(self):
+        questions = make_questions(self.science, 3)
+        session = make_session(questions[:2], self.science)
+        with self.assertRaises(ValueError):
+            answer(session, questions[2])
+        self.assertFalse(UserAnswer.objects.exists())
+        self.assertFalse(QuestionCounters.objects.exists())
+        session.refresh_from_db()
+        self.assertEqual((session.current_order, session.answered_count), (1, 0))
+        self.assertEqual(write_answers([
+            UserAnswer(quiz_session=session, question=questions[2], selected_answer='A', is_correct=True)
+        ]), [])
+
+    def test_submit_answer_endpoint(self):
+        questions = make_questions(self.science, 5)
+        session = make_session(questions, self.science)
+        response = self.client.post(
+            reverse('quiz:submit_answer'),
+            data={'session_id': session.id, 'question_id': questions[0].id, 'selected_answer': 'A', 'time_taken': 4},
+            content_type='application/json'
+        )
+        self.assertTrue(response.json()['is_correct'])
+        session.refresh_from_db()
+        self.assertEqual((session.current_order, session.answered_count, session.score), (2, 1, 1))
+
+    def test_results_read_from_session(self):
+        questions = make_questions(self.science, 5)
+        session = make_session(questions, self.science)
+        for question in questions[:3]:
+            answer(session, question)
+        answer(session, questions[3], 'C')
+        response = self.client.get(reverse('quiz:quiz_results', args=[session.id]))
+        self.assertEqual(response.context['correct_count'], 3)
+        self.assertEqual(response.context['incorrect_count'], 1)
+
+    def test_repair_command_rebuilds_cursor(self):
+        questions = make_questions(self.science, 5)
+        session = make_session(questions, self.science)
+        for question in questions[:2]:
+            UserAnswer.objects.create(quiz_session=session, question=question, selected_answer='A', is_correct=True)
+        UserAnswer.objects.create(quiz_session=session, question=questions[3], selected_answer='B', is_correct=False)
+        call_command('repair_quiz_cursors', stdout=StringIO())
+        session.refresh_from_db()
+        self.assertEqual((session.current_order, session.answered_count, session.score), (3, 3, 2))
+
+    def test_migration_backfills_cursor(self):
+        questions = make_questions(self.science, 5)
+        session = make_session(questions, self.science)
+        UserAnswer.objects.create(quiz_session=session, question=questions[0], selected_answer='A', is_correct=True)
+        UserAnswer.objects.create(quiz_session=session, question=questions[1], selected_answer='B', is_correct=False)
+        import_module('quiz.migrations.0002_quizsession_cursor').backfill_cursors(apps, None)
+        session.refresh_from_db()
+        self.assertEqual((session.current_order, session.answered_count, session.score), (3, 2, 1))
+
+    def test_completed_session_with_missing_answers_shows_results(self):
+        questions = make_questions(self.science, 5)
+        session = make_session(questions, self.science)
+        answer(session, questions[0])
+        QuizSession.objects.filter(id=session.id).update(completed_at=timezone.now())
+        response = self.client.get(reverse('quiz:quiz_question', args=[session.id]))
+        self.assertRedirects(response, reverse('quiz:quiz_results', args=[session.id]), fetch_redirect_response=False)
+
+
+class QuestionPayloadCacheTests(QuizTestCase):
+    """
+    Tests for the cached question payloads.
+    """
+
+    def test_details_served_from_cache(self):
+        question = make_questions(self.science, 1)[0]
+        url = reverse('quiz:get_question_details', args=[question.id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(url).json()
+        self.assertFalse(any('quiz_question' in q['sql'] for q in queries))
+        self.assertEqual(data['category'], 'Science')
+        self.assertEqual(data['options']['A'], 'A')
+        self.assertIsNone(data['user_answer'])
+
+    def test_details_include_user_answer(self):
+        questions = make_questions(self.science, 5)
+        session = make_session(questions, self.science)
+        answer(session, questions[0], 'C')
+        url = reverse('quiz:get_question_details', args=[questions[0].id])
+        data = self.client.get(url, {'session_id': session.id}).json()
+        self.assertEqual(data['user_answer'], 'C')
+
+    def test_save_invalidates_payload(self):
+        question = make_questions(self.science, 1)[0]
+        self.assertEqual(question_payloads.get(question.id).explanation, 'Because A.')
+        question.explanation = 'Because of A.'
+        question.save()
+        self.assertEqual(question_payloads.get(question.id).explanation, 'Because of A.')
+        self.science.name = 'Sciences'
+        self.science.save()
+        url = reverse('quiz:get_question_details', args=[question.id])
+        self.assertEqual(self.client.get(url).json()['category'], 'Sciences')
+
+    def test_string_ids_share_entries_with_int_ids(self):
+        question = make_questions(self.science, 1)[0]
+        question_payloads.get(str(question.id))
+        question.correct_answer = 'B'
+        question.save()
+        self.assertEqual(question_payloads.get(str(question.id)).correct_answer, 'B')
+        self.assertEqual(list(question_payloads._entries), [question.id])
+
+    def test_payload_older_than_save_is_refused(self):
+        question = make_questions(self.science, 1)[0]
+        stale = question_payloads.get(question.id)
+        question.explanation = 'Because of A.'
+        question.save()
+        # A reader that loaded the row before the save puts it back
+        question_payloads._set_local(question.id, stale)
+        self.assertEqual(question_payloads.get(question.id).explanation, 'Because of A.')
+        self.assertEqual(question_payloads._floors, {})
+
+    def test_unknown_question_is_404(self):
+        response = self.client.get(reverse('quiz:get_question_details', args=[999]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(QUIZ_QUESTION_CACHE={'MAX_BYTES': 600})
+    def test_lru_respects_byte_budget(self):
+        questions = make_questions(self.science, 5)
+        for question in questions:
+            question_payloads.get(question.id)
+        self.assertLessEqual(question_payloads._size, 600)
+        self.assertIn(questions[-1].id, question_payloads._entries)
+        self.assertNotIn(questions[0].id, question_payloads._entries)
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        QUIZ_QUESTION_CACHE={'BACKEND': 'default'}
+    )
+    def test_shared_tier(self):
+        question = make_questions(self.science, 1)[0]
+        question_payloads.get(question.id)
+        question_payloads.clear()
+        with self.assertNumQueries(0):
+            payload = question_payloads.get(question.id)
+        self.assertEqual(payload.correct_answer, 'A')
+
+
+class AnswerWriterTests(QuizTestCase):
+    """
+    Tests for write-behind answer ingestion, flushed from the test thread.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.questions = make_questions(self.science, 5)
+        self.session = make_session(self.questions, self.science)
+        self.writer = AnswerWriter(background=False)
+
+    def test_flush_writes_answers_and_advances_cursor(self):
+        for question in self.questions[:3]:
+            self.writer.submit(self.session, question.id, 'A', question.correct_answer)
+        self.assertFalse(self.writer.sync(self.session.id, timeout=0))
+        self.assertEqual(UserAnswer.objects.count(), 0)
+        with self.assertNumQueries(6):
+            self.writer.flush()
+        self.assertTrue(self.writer.sync(self.session.id, timeout=0))
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.current_order, self.session.answered_count, self.session.score), (4, 3, 3))
+
+    def test_pending_duplicate_is_rejected(self):
+        question = self.questions[0]
+        self.writer.submit(self.session, question.id, 'A', question.correct_answer)
+        with self.assertRaises(IntegrityError):
+            self.writer.submit(self.session, question.id, 'B', question.correct_answer)
+
+    def test_stored_answer_is_rejected(self):
+        question = self.questions[0]
+        answer(self.session, question)
+        with self.assertRaises(IntegrityError):
+            self.writer.submit(self.session, question.id, 'B', question.correct_answer)
+        with self.assertRaises(IntegrityError):
+            async_to_sync(self.writer.asubmit)(self.session, question.id, 'B', question.correct_answer)
+        self.assertTrue(self.writer.sync(self.session.id, timeout=0))
+
+    def test_stored_duplicate_is_skipped(self):
+        question = self.questions[0]
+        answer(self.session, question)
+        written = write_answers([
+            UserAnswer(quiz_session=self.session, question=question, selected_answer='B', is_correct=False)
+        ])
+        self.assertEqual(written, [])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.answered_count, 1)
+
+    def test_invalid_answers_are_refused_before_queueing(self):
+        question = self.questions[0]
+        with self.assertRaises(ValueError):
+            self.writer.submit(self.session, question.id, None, question.correct_answer)
+        other = make_questions(self.history, 1)[0]
+        with self.assertRaises(ValueError):
+            self.writer.submit(self.session, other.id, 'A', other.correct_answer)
+        self.assertTrue(self.writer.sync(self.session.id, timeout=0))
+        self.writer.submit(self.session, str(question.id), 'A', question.correct_answer)
+        self.writer.flush()
+        self.assertEqual(UserAnswer.objects.get().question_id, question.id)
+
+    def test_failed_batch_is_retried_per_answer(self):
+        other_session = make_session(self.questions, self.science)
+        good = self.writer.submit(other_session, self.questions[0].id, 'A', 'A')
+        bad = self.writer.submit(self.session, self.questions[0].id, 'A', 'A')
+        bad.selected_answer = None
+        with self.assertLogs('quiz.ingest', 'WARNING'):
+            self.writer.flush()
+        self.assertEqual(list(UserAnswer.objects.values_list('quiz_session_id', flat=True)), [good.quiz_session_id])
+        self.assertTrue(self.writer.sync(self.session.id, timeout=0))
+
+    @override_settings(QUIZ_ANSWER_WRITE_BEHIND={'MAX_QUEUE': 1, 'PUT_TIMEOUT': 0.01})
+    def test_full_queue_applies_backpressure(self):
+        self.writer.submit(self.session, self.questions[0].id, 'A', 'A')
+        with self.assertRaises(AnswerQueueFull):
+            self.writer.submit(self.session, self.questions[1].id, 'A', 'A')
+        self.writer.flush()
+        self.writer.submit(self.session, self.questions[1].id, 'A', 'A')
+
+
+@override_settings(
+    QUIZ_ANSWER_WRITE_BEHIND={'ENABLED': True, 'FLUSH_INTERVAL_MS': 5},
+    QUIZ_INSTRUMENTATION={'STRICT_BUDGETS': True}
+)
+class AnswerWriterThreadTests(TransactionTestCase):
+    """
+    Tests for the background writer thread.
+    """
+
+    def test_answers_visible_to_next_question_request(self):
+        from .ingest import answer_writer
+        question_payloads.clear()
+        category = Category.objects.create(name='Science')
+        questions = make_questions(category, 5)
+        session = make_session(questions, category)
+        try:
+            response = self.client.post(
+                reverse('quiz:submit_answer'),
+                data={'session_id': session.id, 'question_id': questions[0].id, 'selected_answer': 'A'},
+                content_type='application/json'
+            )
+            self.assertTrue(response.json()['is_correct'])
+            response = self.client.get(reverse('quiz:quiz_question', args=[session.id]))
+            self.assertEqual(response.context['question'], questions[1])
+        finally:
+            answer_writer.stop()
+        self.assertEqual(UserAnswer.objects.filter(quiz_session=session).count(), 1)
+
+
+class LeaderboardTests(QuizTestCase):
+    """
+    Tests for the materialized leaderboard.
+    """
+
+    def test_completion_updates_global_and_category_boards(self):
+        alice = User.objects.create_user('alice')
+        play(self.client, self.science, 3, alice)
+        best = play(self.client, self.history, 5)
+        play(self.client, self.history, 5)  # revisiting must not add a second row
+        self.client.get(reverse('quiz:quiz_question', args=[best.id]))
+        self.assertEqual(LeaderboardEntry.objects.filter(category=None).count(), 3)
+        self.assertEqual(leaderboard.top_entries()[0].session, best)
+        science = list(leaderboard.top_entries(self.science))
+        self.assertEqual([(e.username, e.category_name, e.get_percentage()) for e in science], [('alice', 'Science', 60)])
+
+    def test_page_is_a_single_read(self):
+        for correct in range(5):
+            play(self.client, self.science, correct)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('quiz:leaderboard'))
+        self.assertEqual(sum('quiz_' in q['sql'] for q in queries), 1)
+        self.assertContains(response, 'Anonymous Player')
+
+    def test_boards_are_trimmed(self):
+        with mock.patch.object(leaderboard, 'LEADERBOARD_SIZE', 2):
+            for correct in (1, 4, 2):
+                play(self.client, self.science, correct)
+        scores = [e.score for e in leaderboard.top_entries()]
+        self.assertEqual(scores, [4, 2])
+
+    def test_rebuild_command(self):
+        play(self.client, self.science, 2)
+        play(self.client, self.history, 4)
+        LeaderboardEntry.objects.all().delete()
+        call_command('rebuild_leaderboard', stdout=StringIO())
+        self.assertEqual([e.score for e in leaderboard.top_entries()], [4, 2])
+        self.assertEqual([e.score for e in leaderboard.top_entries(self.history)], [4])
+
+    def test_migration_backfills_boards(self):
+        alice = User.objects.create_user('alice')
+        play(self.client, self.science, 2, alice)
+        play(self.client, self.history, 4)
+        LeaderboardEntry.objects.all().delete()
+        import_module('quiz.migrations.0003_leaderboardentry').backfill_leaderboard(apps, None)
+        self.assertEqual([(e.username, e.score) for e in leaderboard.top_entries()], [('', 4), ('alice', 2)])
+        self.assertEqual([e.score for e in leaderboard.top_entries(self.science)], [2])
+
+
+class UserStatsTests(QuizTestCase):
+    """
+    Tests for the per-user statistics rollup.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client.force_login(self.user)
+
+    def test_view_reads_rollup(self):
+        play(self.client, self.science, 3, self.user)
+        play(self.client, self.science, 5, self.user)
+        play(self.client, self.history, 1, self.user)
+        play(self.client, self.history, 5)
+        response = self.client.get(reverse('quiz:user_stats'))
+        self.assertEqual(response.context['total_sessions'], 3)
+        self.assertEqual(response.context['avg_score'], 60.0)
+        self.assertEqual(response.context['best_score'], 100)
+        self.assertEqual(response.context['total_questions_answered'], 15)
+        self.assertEqual(response.context['total_correct'], 9)
+        self.assertEqual(response.context['category_performance']['Science'], {
+            'sessions': 2, 'total_score': 8, 'total_questions': 10, 'percentage': 80,
+        })
+
+    def test_query_count_does_not_grow_with_sessions(self):
+        counts = []
+        for _ in range(2):
+            play(self.client, self.science, 3, self.user)
+            play(self.client, self.history, 3, self.user)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('quiz:user_stats'))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_check_and_rebuild_commands(self):
+        play(self.client, self.science, 3, self.user)
+        play(self.client, self.history, 4, self.user)
+        call_command('check_user_stats', stdout=StringIO())
+        UserStats.objects.filter(user=self.user).update(total_correct=0)
+        with self.assertRaises(CommandError):
+            call_command('check_user_stats', stdout=StringIO())
+        call_command('rebuild_user_stats', stdout=StringIO())
+        call_command('check_user_stats', stdout=StringIO())
+        self.assertEqual(UserStats.objects.get(user=self.user).total_correct, 7)
+
+    def test_migration_backfills_rollups(self):
+        play(self.client, self.science, 3, self.user)
+        play(self.client, self.history, 4, self.user)
+        UserStats.objects.all().delete()
+        UserCategoryStats.objects.all().delete()
+        import_module('quiz.migrations.0004_user_stats').backfill_user_stats(apps, None)
+        call_command('check_user_stats', stdout=StringIO())
+        self.assertEqual(UserStats.objects.get(user=self.user).total_correct, 7)
+
+
+class AdaptiveSelectionTests(QuizTestCase):
+    """
+    Tests for adaptive question selection and the ratings behind it.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('alice', password='secret')
+        self.easy = make_questions(self.science, 10, 'easy')
+        self.hard = make_questions(self.science, 10, 'hard')
+
+    def test_rating_starts_from_difficulty_until_answered(self):
+        question = self.easy[0]
+        self.assertEqual(question.rating, -1.0)
+        question.difficulty_level = 'hard'
+        question.save(update_fields=['difficulty_level'])
+        question.refresh_from_db()
+        self.assertEqual(question.rating, 1.0)
+        Question.objects.filter(id=question.id).update(rating=0.3, rating_answers=4)
+        question.refresh_from_db()
+        question.difficulty_level = 'easy'
+        question.save()
+        question.refresh_from_db()
+        self.assertEqual(question.rating, 0.3)
+
+    def test_picks_questions_near_ability(self):
+        UserAbility.objects.create(user=self.user, category=self.science, rating=2.0)
+        self.assertTrue(set(adaptive.select_questions(self.user, self.science, 5)) <= {q.id for q in self.hard})
+        other = User.objects.create_user('bob')
+        UserAbility.objects.create(user=other, category=self.science, rating=-2.0)
+        self.assertTrue(set(adaptive.select_questions(other, self.science, 5)) <= {q.id for q in self.easy})
+
+    def test_skips_recently_seen_questions(self):
+        first = adaptive.select_questions(self.user, self.science, 8)
+        second = adaptive.select_questions(self.user, self.science, 8)
+        self.assertFalse(set(first) & set(second))
+        # Only four unseen questions are left; the rest are recycled
+        third = adaptive.select_questions(self.user, self.science, 8)
+        self.assertEqual(len(set(third)), 8)
+        self.assertTrue(set(third) >= {q.id for q in self.easy + self.hard} - set(first) - set(second))
+
+    @override_settings(QUIZ_ADAPTIVE={'SEEN_LIMIT': 10})
+    def test_seen_set_is_bounded(self):
+        for _ in range(3):
+            picked = adaptive.select_questions(self.user, self.science, 8)
+        seen = adaptive.unpack_seen(UserAbility.objects.get(user=self.user, category=self.science).recent_questions)
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(list(seen[-8:]), picked)
+
+    def test_selection_does_not_read_history(self):
+        self.client.force_login(self.user)
+        counts = []
+        for _ in range(3):
+            with CaptureQueriesContext(connection) as queries:
+                adaptive.select_questions(self.user, self.science, 5)
+            counts.append(len(queries))
+            play(self.client, self.science, 3, self.user)
+        self.assertEqual(counts[1], counts[2])
+        self.assertTrue(all('quiz_useranswer' not in q['sql'] for q in queries.captured_queries))
+
+    def test_start_quiz_uses_adaptive_selection_when_signed_in(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('quiz:start_quiz', args=[self.science.id]))
+        session = QuizSession.objects.get()
+        self.assertRedirects(response, reverse('quiz:quiz_question', args=[session.id]), fetch_redirect_response=False)
+        served = list(session.quizquestion_set.values_list('question_id', flat=True))
+        ability = UserAbility.objects.get(user=self.user, category=self.science)
+        self.assertEqual(sorted(adaptive.unpack_seen(ability.recent_questions)), sorted(served))
+
+    def test_completion_updates_ratings(self):
+        self.client.force_login(self.user)
+        session = make_session(self.hard[:5], self.science, self.user)
+        for question in self.hard[:5]:
+            answer(session, question)
+        self.client.get(reverse('quiz:quiz_question', args=[session.id]))
+        ability = UserAbility.objects.get(user=self.user, category=self.science)
+        self.assertEqual(ability.answers, 5)
+        self.assertGreater(ability.rating, 0)
+        for question in Question.objects.filter(id__in=[q.id for q in self.hard[:5]]):
+            self.assertEqual(question.rating_answers, 1)
+            self.assertLess(question.rating, 1.0)
+        self.assertEqual(Question.objects.get(id=self.hard[5].id).rating, 1.0)
+
+    def test_rebuild_matches_online_updates(self):
+        self.client.force_login(self.user)
+        for questions, correct in ((self.easy[:5], 2), (self.hard[:5], 4)):
+            session = make_session(questions, self.science, self.user)
+            for i, question in enumerate(questions):
+                answer(session, question, 'A' if i < correct else 'B')
+            self.client.get(reverse('quiz:quiz_question', args=[session.id]))
+        online = UserAbility.objects.get(user=self.user, category=self.science).rating
+        UserAbility.objects.update(rating=0.0, answers=0)
+        Question.objects.update(rating=0.0, rating_answers=0)
+        call_command('rebuild_ratings', stdout=StringIO())
+        ability = UserAbility.objects.get(user=self.user, category=self.science)
+        self.assertAlmostEqual(ability.rating, online)
+        self.assertEqual(ability.answers, 10)
+        self.assertEqual(Question.objects.get(id=self.hard[5].id).rating, 1.0)
+
+    def test_rating_band_is_clamped(self):
+        self.assertEqual(rating_band(0.2), 0)
+        self.assertEqual(rating_band(-1.0), -2)
+        self.assertEqual(rating_band(50), rating_band(10))
+
+
+class ItemStatsTests(QuizTestCase):
+    """
+    Tests for the item statistics job.
+    """
+
+    def play_sessions(self, questions, answers_per_session):
+        for answers in answers_per_session:
+            session = make_session(questions, self.science)
+            for question, (selected, seconds) in zip(questions, answers):
+                record_answer(session, question.id, selected, question.correct_answer, seconds)
+            complete_session(session)
+
+    def test_statistics(self):
+        questions = make_questions(self.science, 4)
+        # The first question is answered correctly in the strongest sessions,
+        # the third only in the weakest
+        self.play_sessions(questions, [
+            [('A', 4), ('A', 6), ('B', 10), ('A', 3)],
+            [('A', 5), ('A', 7), ('B', 20), ('B', 3)],
+            [('B', 8), ('C', 9), ('B', 30), ('A', 3)],
+            [('D', 9), ('B', 12), ('A', 40), ('B', 3)],
+        ])
+        out = StringIO()
+        call_command('compute_item_stats', '--chunk-size', '5', stdout=out)
+        self.assertIn('4 questions from 16 answers', out.getvalue())
+
+        first = QuestionStats.objects.get(question=questions[0])
+        self.assertEqual(first.answers, 4)
+        self.assertEqual(first.p_value, 0.5)
+        self.assertEqual((first.rate_a, first.rate_b, first.rate_c, first.rate_d), (0.5, 0.25, 0.0, 0.25))
+        self.assertEqual(first.median_time, timedelta(seconds=5.5))
+        self.assertGreater(first.discrimination, 0)
+        third = QuestionStats.objects.get(question=questions[2])
+        self.assertLess(third.discrimination, 0)
+        # Too few answers to be flagged
+        self.assertFalse(QuestionStats.objects.filter(flagged=True).exists())
+
+    @mock.patch('quiz.itemstats.MIN_ANSWERS', 2)
+    def test_flagged_questions_leave_adaptive_buckets(self):
+        questions = make_questions(self.science, 3)
+        self.play_sessions(questions, [
+            [('A', 4), ('A', 6), ('B', 10)],
+            [('B', 8), ('B', 9), ('A', 30)],
+        ])
+        rating_sampler.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('compute_item_stats', stdout=StringIO())
+        self.assertEqual(
+            set(QuestionStats.objects.filter(flagged=True).values_list('question_id', flat=True)),
+            {questions[2].id}
+        )
+        self.assertEqual(rating_sampler.count(category_id=self.science.id), 2)
+
+        # Neither re-rating nor editing puts a flagged question back
+        user = User.objects.create_user('player')
+        session = make_session(questions, self.science, user)
+        for question in questions:
+            answer(session, question)
+        with self.captureOnCommitCallbacks(execute=True):
+            complete_session(session)
+        questions[2].explanation = 'Edited.'
+        questions[2].save()
+        self.assertEqual(rating_sampler.count(category_id=self.science.id), 2)
+
+    def test_rerun_replaces_rows(self):
+        questions = make_questions(self.science, 2)
+        self.play_sessions(questions, [[('A', 3), ('B', 4)]])
+        call_command('compute_item_stats', stdout=StringIO())
+        questions[1].delete()
+        call_command('compute_item_stats', stdout=StringIO())
+        self.assertEqual(list(QuestionStats.objects.values_list('question_id', flat=True)), [questions[0].id])
+
+
+class QuestionCountersTests(QuizTestCase):
+    """
+    Tests for the live per-question answer counters.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.questions = make_questions(self.science, 3)
+        self.session = make_session(self.questions, self.science)
+
+    def test_answers_bump_counters(self):
+        first, second, third = self.questions
+        record_answer(self.session, first.id, 'A', 'A', 3)
+        other = make_session(self.questions, self.science)
+        write_answers([
+            views.grade_answer(other, first.id, 'B', 'A', 12),
+            views.grade_answer(other, second.id, 'C', 'A', 40),
+        ])
+        counters = QuestionCounters.objects.get(question=first)
+        self.assertEqual((counters.attempts, counters.correct), (2, 1))
+        self.assertEqual((counters.picks_a, counters.picks_b, counters.picks_c, counters.picks_d), (1, 1, 0, 0))
+        self.assertEqual((counters.time_lt_5, counters.time_lt_15, counters.time_total), (1, 1, 15.0))
+        self.assertEqual(QuestionCounters.objects.get(question=second).time_ge_30, 1)
+        self.assertFalse(QuestionCounters.objects.filter(question=third).exists())
+
+    def test_rebuild_matches_live_counters(self):
+        for i, question in enumerate(self.questions):
+            record_answer(self.session, question.id, 'ABCD'[i], question.correct_answer, 7 * i + 1)
+        live = {row.pop('question_id'): row for row in QuestionCounters.objects.values('question_id', *counters.FIELDS)}
+        QuestionCounters.objects.all().delete()
+        call_command('rebuild_question_counters', stdout=StringIO())
+        rebuilt = {row.pop('question_id'): row for row in QuestionCounters.objects.values('question_id', *counters.FIELDS)}
+        self.assertEqual(rebuilt, live)
+
+    def test_median_time(self):
+        row = QuestionCounters(question=self.questions[0], time_lt_5=1, time_lt_10=2, time_lt_15=1)
+        self.assertEqual(counters.median_time(row), 7.5)
+        self.assertEqual(counters.median_time(QuestionCounters(time_ge_30=3)), 30)
+        self.assertIsNone(counters.median_time(QuestionCounters()))
+
+    def test_admin_list_reads_counters(self):
+        admin = User.objects.create_superuser('admin', password='secret')
+        self.client.force_login(admin)
+        url = reverse('admin:quiz_question_changelist')
+        for question in self.questions[:2]:
+            record_answer(self.session, question.id, 'B', question.correct_answer, 4)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        make_questions(self.science, 10)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url, {'o': '6'})
+        self.assertEqual(len(few), len(many))
+        self.assertContains(response, 'A 0% · B 100% · C 0% · D 0%', count=2)
+
+
+class AdminChangelistTests(QuizTestCase):
+    """
+    Tests for the quiz admin changelists.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_superuser('admin', password='secret')
+        self.client.force_login(self.user)
+
+    def add_rows(self, count):
+        category = Category.objects.create(name=f'Category {next(question_numbers)}')
+        questions = make_questions(category, count)
+        for _ in range(count):
+            session = make_session(questions, category, self.user)
+            answer(session, questions[0])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for name in ('category', 'question', 'quizsession', 'useranswer'):
+            url = reverse(f'admin:quiz_{name}_changelist')
+            self.add_rows(2)
+            with CaptureQueriesContext(connection) as few:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.add_rows(8)
+            with CaptureQueriesContext(connection) as many:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(len(few), len(many), name)
+
+    def test_sort_by_annotated_columns(self):
+        make_questions(self.history, 3)
+        make_questions(self.science, 1)
+        response = self.client.get(reverse('admin:quiz_category_changelist'), {'o': '-4'})
+        self.assertEqual([c.name for c in response.context['cl'].result_list], ['History', 'Science'])
+        questions = make_questions(self.science, 2)
+        low, high = make_session(questions, self.science), make_session(questions, self.science)
+        answer(high, questions[0])
+        response = self.client.get(reverse('admin:quiz_quizsession_changelist'), {'o': '-7'})
+        self.assertEqual([s.id for s in response.context['cl'].result_list], [high.id, low.id])
+
+    def test_estimated_count(self):
+        questions = make_questions(self.science, 5)
+        questions[0].delete()
+        with mock.patch.object(EstimatedCountPaginator, 'EXACT_BELOW', 0):
+            response = self.client.get(reverse('admin:quiz_question_changelist'))
+            self.assertEqual(response.context['cl'].result_count, questions[-1].id)
+            # Filtered lists are counted exactly
+            response = self.client.get(reverse('admin:quiz_question_changelist'), {'q': 'Science'})
+            self.assertEqual(response.context['cl'].result_count, 4)
+        response = self.client.get(reverse('admin:quiz_question_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 4)
+
+
+class KeysetPaginationTests(QuizTestCase):
+    """
+    Tests for keyset pagination of session lists.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client.force_login(self.user)
+        questions = make_questions(self.science, 1)
+        self.sessions = [make_session(questions, self.science, self.user) for _ in range(7)]
+        # Ties on started_at are broken by id
+        QuizSession.objects.filter(id__in=[s.id for s in self.sessions[2:5]]).update(started_at=self.sessions[2].started_at)
+        QuizSession.objects.update(completed_at=timezone.now())
+        self.newest_first = list(QuizSession.objects.order_by('-started_at', '-id').values_list('id', flat=True))
+
+    def test_walks_every_row_once_in_both_directions(self):
+        paginator = KeysetPaginator(QuizSession.objects.all(), 3, ['-started_at', '-id'])
+        pages, page = [], paginator.page()
+        self.assertFalse(page.has_previous())
+        while True:
+            pages.append([s.id for s in page])
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+        self.assertEqual([i for ids in pages for i in ids], self.newest_first)
+        self.assertEqual([len(ids) for ids in pages], [3, 3, 1])
+        back = paginator.page(paginator.page(page.previous_cursor).previous_cursor)
+        self.assertEqual([s.id for s in back], pages[0])
+        self.assertFalse(back.has_previous())
+
+    def test_later_pages_cost_the_same(self):
+        paginator = KeysetPaginator(QuizSession.objects.all(), 2, ['-started_at', '-id'])
+        with CaptureQueriesContext(connection) as first:
+            page = paginator.page()
+        for _ in range(2):
+            page = paginator.page(page.next_cursor)
+        with CaptureQueriesContext(connection) as last:
+            paginator.page(page.next_cursor)
+        self.assertEqual(len(first), len(last))
+        self.assertNotIn('OFFSET', last[0]['sql'])
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(QuizSession.objects.all(), 3, ['-started_at', '-id'])
+        for cursor in ('garbage', 'eyJkIjogIm4ifQ==', 'eyJkIjogIm4iLCAiayI6IFsieCIsICIxIl19'):
+            with self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
+
+    def test_history_view(self):
+        QuizSession.objects.create(user=self.user, total_questions=1)
+        make_session([], self.science, User.objects.create_user('bob'))
+        with mock.patch.object(views, 'SESSION_HISTORY_PAGE_SIZE', 4):
+            response = self.client.get(reverse('quiz:session_history'))
+            self.assertEqual([s.id for s in response.context['page']], self.newest_first[:4])
+            page = response.context['page']
+            response = self.client.get(reverse('quiz:session_history'), {'cursor': page.next_cursor})
+            self.assertEqual([s.id for s in response.context['page']], self.newest_first[4:])
+            self.assertContains(response, 'Newer')
+            self.assertNotContains(response, 'Older')
+            response = self.client.get(reverse('quiz:session_history'), {'cursor': 'garbage'})
+            self.assertEqual([s.id for s in response.context['page']], self.newest_first[:4])
+
+    def test_admin_changelist_pages_by_cursor(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+        url = reverse('admin:quiz_quizsession_changelist')
+        with mock.patch.object(admin.QuizSessionAdmin, 'list_per_page', 4):
+            response = self.client.get(url)
+            cl = response.context['cl']
+            self.assertEqual([s.id for s in cl.result_list], self.newest_first[:4])
+            response = self.client.get(url + cl.next_page_url)
+            self.assertEqual([s.id for s in response.context['cl'].result_list], self.newest_first[4:])
+            self.assertContains(response, 'Previous')
+            # Sorting by a column falls back to numbered pages
+            response = self.client.get(url, {'o': '5'})
+            self.assertIsNone(response.context['cl'].keyset_page)
+            self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 302)
+
+
+class ResultsSummaryTests(QuizTestCase):
+    """
+    Tests for the grouped results summary.
+    """
+
+    def test_mixed_breakdown_from_one_query(self):
+        science = make_questions(self.science, 3)
+        history = make_questions(self.history, 2)
+        session = make_session(science + history)
+        for question, selected in zip(science + history, 'ABAAB'):
+            answer(session, question, selected)
+        url = reverse('quiz:quiz_results', args=[session.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(sum('quiz_useranswer' in q['sql'] for q in queries), 1)
+        self.assertEqual(response.context['correct_count'], 3)
+        self.assertEqual(response.context['incorrect_count'], 2)
+        self.assertEqual(response.context['category_stats'], {
+            'History': {'correct': 1, 'total': 2, 'half_total': 1.0},
+            'Science': {'correct': 2, 'total': 3, 'half_total': 1.5},
+        })
+
+    def test_completed_summary_is_cached(self):
+        session = play(self.client, self.science, 4)
+        url = reverse('quiz:quiz_results', args=[session.id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertFalse(any('quiz_useranswer' in q['sql'] for q in queries))
+        self.assertEqual(response.context['correct_count'], 4)
+        self.assertEqual(response.context['category_stats'], {})
+
+
+class QueryBudgetTests(QuizTestCase):
+    """
+    Tests for the query instrumentation middleware.
+    """
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('quiz:leaderboard'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", render;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_exceeding_budget_fails(self):
+        with mock.patch.object(views.leaderboard, 'query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('quiz:leaderboard'))
+
+    @override_settings(QUIZ_INSTRUMENTATION={})
+    def test_server_timing_off_by_default(self):
+        response = self.client.get(reverse('quiz:leaderboard'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_signed_in_pages_fit_budgets(self):
+        user = User.objects.create_user('alice')
+        self.client.force_login(user)
+        session = play(self.client, self.science, 3, user)
+        for url in [
+            reverse('quiz:home'),
+            reverse('quiz:leaderboard'),
+            reverse('quiz:quiz_results', args=[session.id]),
+            reverse('quiz:revision_mode', args=[session.id]),
+            reverse('quiz:user_stats'),
+            reverse('quiz:session_history'),
+        ]:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s)')
+        )
+
+    def test_report_command(self):
+        play(self.client, self.science, 3)
+        out = StringIO()
+        call_command('query_report', '--repeat', '2', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['quiz:leaderboard']['requests'], 4)
+        self.assertIn('quiz:revision_mode', report)
+        self.assertGreater(report['quiz:home']['avg_queries'], 0)
+
+
+class BenchmarkCommandTests(QuizTestCase):
+    """
+    Smoke test for the quiz flow benchmark.
+    """
+
+    def test_benchmark_in_place(self):
+        out = StringIO()
+        call_command('benchmark_quiz', '--in-place', '--categories', '2', '--questions', '40', '--quizzes', '2', stdout=out)
+        report = json.loads(out.getvalue())
+        endpoints = report['endpoints']
+        self.assertEqual(endpoints['quiz:submit_answer']['requests'], 30)
+        self.assertEqual(sum(e['errors'] for e in endpoints.values()), 0)
+        self.assertEqual(set(endpoints['quiz:quiz_results']), {
+            'requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries_per_request',
+        })
+
+    def test_benchmark_asgi(self):
+        out = StringIO()
+        call_command(
+            'benchmark_quiz', '--in-place', '--asgi', '--concurrency', '2',
+            '--categories', '2', '--questions', '40', '--quizzes', '2', stdout=out
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['handler'], 'asgi')
+        self.assertEqual(report['endpoints']['quiz:submit_answer']['requests'], 30)
+        self.assertEqual(sum(e['errors'] for e in report['endpoints'].values()), 0)
+
+    def test_compare_with_baseline(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            baseline = os.path.join(tmpdir, 'baseline.json')
+            args = ['--in-place', '--categories', '2', '--questions', '40', '--quizzes', '1']
+            call_command('benchmark_quiz', *args, '--output', baseline, stdout=StringIO())
+            Category.objects.all().delete()
+            out = StringIO()
+            call_command('benchmark_quiz', *args, '--seed', '1', '--compare', baseline, stdout=out)
+        comparison = json.loads(out.getvalue())['comparison']
+        self.assertEqual(comparison['baseline']['parameters']['seed'], 0)
+        self.assertGreater(comparison['throughput_ratio'], 0)
+        self.assertEqual(set(comparison['endpoints']['quiz:submit_answer']), {'p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps'})
+
+
+class DatabaseProfileTests(TestCase):
+    """
+    Tests for the environment-selected database settings.
+    """
+
+    def load(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            return runpy.run_path(os.path.join(settings.PROJECT_DIR, 'settings', 'base.py'))['DATABASES']['default']
+
+    def test_sqlite_by_default(self):
+        os.environ.pop('POSTGRES_DB', None)
+        self.assertEqual(self.load()['ENGINE'], 'django.db.backends.sqlite3')
+
+    def test_postgres_pool_sized_to_threads(self):
+        database = self.load(POSTGRES_DB='quiz', GUNICORN_THREADS='8')
+        self.assertEqual(database['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(database['OPTIONS']['pool']['max_size'], 8)
+        self.assertNotIn('CONN_MAX_AGE', database)
+
+    def test_postgres_persistent_connections_without_pool(self):
+        database = self.load(POSTGRES_DB='quiz', POSTGRES_POOL='0')
+        self.assertNotIn('OPTIONS', database)
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+
+
+class GenerateQuizDataTests(TestCase):
+    """
+    Tests for the synthetic data generator.
+    """
+
+    def generate(self, seed):
+        call_command(
+            'generate_quiz_data', '--categories', '3', '--questions', '60', '--users', '5',
+            '--sessions', '40', '--batch-size', '50', '--seed', str(seed), stdout=StringIO()
+        )
+
+    def test_generated_data_is_consistent(self):
+        self.generate(1)
+        self.assertEqual(Question.objects.count(), 60)
+        self.assertEqual(QuizSession.objects.count(), 40)
+        self.assertEqual(QuizQuestion.objects.count(), sum(QuizSession.objects.values_list('total_questions', flat=True)))
+        self.assertTrue(QuizSession.objects.filter(completed_at__isnull=True).exists())
+        self.assertEqual(repair_cursors(QuizSession.objects.all()), 0)
+        call_command('check_user_stats', stdout=StringIO())
+        self.assertEqual(sum(QuestionCounters.objects.values_list('attempts', flat=True)), UserAnswer.objects.count())
+        rated = UserAnswer.objects.filter(quiz_session__user__isnull=False, quiz_session__completed_at__isnull=False)
+        self.assertEqual(sum(Question.objects.values_list('rating_answers', flat=True)), rated.count())
+        for difficulty, rating in Question.objects.filter(rating_answers=0).values_list('difficulty_level', 'rating'):
+            self.assertEqual(rating, DIFFICULTY_PRIORS[difficulty])
+
+    def test_same_seed_same_data(self):
+        snapshots = []
+        for _ in range(2):
+            self.generate(7)
+            snapshots.append(list(
+                UserAnswer.objects.order_by('id').values_list('selected_answer', 'is_correct', 'answered_at')
+            ))
+            UserAnswer.objects.all().delete()
+            QuizSession.objects.all().delete()
+            Category.objects.all().delete()
+            User.objects.all().delete()
+        self.assertEqual(snapshots[0], snapshots[1])
+
+
+class ImportExportTests(QuizTestCase):
+    """
+    Tests for the streaming question import and export commands.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def write_jsonl(self, name, rows):
+        with open(self.path(name), 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+        return self.path(name)
+
+    def row(self, **overrides):
+        row = {
+            'category': 'Science', 'question_text': 'What is H2O?',
+            'option_a': 'Water', 'option_b': 'Salt', 'option_c': 'Air', 'option_d': 'Fire',
+            'correct_answer': 'A', 'explanation': 'Two hydrogens, one oxygen.',
+        }
+        row.update(overrides)
+        return row
+
+    def test_import_upserts_by_content(self):
+        path = self.write_jsonl('questions.jsonl', [
+            self.row(),
+            self.row(question_text='  what is   h2o? ', explanation='Updated.'),
+            self.row(category='Space', question_text='Closest star?', correct_answer='b'),
+            self.row(question_text='Bad answer', correct_answer='E'),
+        ])
+        out = StringIO()
+        call_command('import_questions', path, stdout=out)
+        self.assertIn('2 created, 0 updated, 1 duplicates skipped, 1 invalid', out.getvalue())
+        self.assertIn('Line 4: correct_answer', out.getvalue())
+        self.assertEqual(Question.objects.get(category=self.science).explanation, 'Updated.')
+        self.assertEqual(Question.objects.get(category__name='Space').correct_answer, 'B')
+
+        path = self.write_jsonl('again.jsonl', [self.row(explanation='Final.', difficulty_level='hard')])
+        call_command('import_questions', path, stdout=StringIO())
+        question = Question.objects.get(category=self.science)
+        self.assertEqual((question.explanation, question.difficulty_level), ('Final.', 'hard'))
+
+    def test_import_seeds_ratings_from_difficulty(self):
+        path = self.write_jsonl('questions.jsonl', [
+            self.row(difficulty_level='easy'),
+            self.row(question_text='Closest star?', difficulty_level='hard'),
+        ])
+        call_command('import_questions', path, stdout=StringIO())
+        ratings = dict(Question.objects.values_list('difficulty_level', 'rating'))
+        self.assertEqual(ratings, {'easy': -1.0, 'hard': 1.0})
+
+        # Unrated questions follow a new difficulty, rated ones keep their rating
+        Question.objects.filter(difficulty_level='hard').update(rating=0.3, rating_answers=4)
+        path = self.write_jsonl('again.jsonl', [
+            self.row(difficulty_level='medium'),
+            self.row(question_text='Closest star?', difficulty_level='easy'),
+        ])
+        call_command('import_questions', path, stdout=StringIO())
+        ratings = dict(Question.objects.values_list('question_text', 'rating'))
+        self.assertEqual(ratings, {'What is H2O?': 0.0, 'Closest star?': 0.3})
+
+    def test_dry_run_writes_nothing(self):
+        path = self.write_jsonl('questions.jsonl', [self.row()])
+        call_command('import_questions', path, '--dry-run', stdout=StringIO())
+        self.assertFalse(Question.objects.exists())
+
+    def test_export_import_round_trip(self):
+        make_questions(self.science, 3)
+        make_questions(self.history, 2)
+        for name in ('questions.csv', 'questions.jsonl'):
+            call_command('export_questions', self.path(name), '--chunk-size', '2', stdout=StringIO())
+            out = StringIO()
+            call_command('import_questions', self.path(name), stdout=out)
+            self.assertIn('0 created, 5 updated', out.getvalue())
+        self.assertEqual(Question.objects.count(), 5)
+        Question.objects.all().delete()
+        call_command('import_questions', self.path('questions.csv'), stdout=StringIO())
+        self.assertEqual(Question.objects.filter(category=self.history).count(), 2)
+
+
+class ContentHashTests(QuizTestCase):
+    """
+    Tests for the indexed question content hash.
+    """
+
+    def test_hash_ignores_case_and_whitespace(self):
+        question = make_questions(self.science, 1)[0]
+        copy = Question(
+            category=self.history, question_text=f'  {question.question_text.upper()} ',
+            option_a='a', option_b='b', option_c='c', option_d='d',
+            correct_answer='B', explanation='Different.'
+        )
+        self.assertEqual(copy.compute_content_hash(), question.content_hash)
+        with self.assertRaises(ValidationError):
+            copy.full_clean()
+        with self.assertRaises(IntegrityError):
+            copy.save()
+
+    def test_save_keeps_hash_current(self):
+        question = make_questions(self.science, 1)[0]
+        question.question_text = 'Rewritten?'
+        question.save(update_fields=['question_text'])
+        question.refresh_from_db()
+        self.assertEqual(question.content_hash, question.compute_content_hash())
+        question.full_clean()
+
+    def test_backfill_hashes_and_reports_duplicates(self):
+        first, second, third = make_questions(self.science, 3)
+        Question.objects.filter(id=third.id).update(question_text=first.question_text)
+        Question.objects.update(content_hash=None)
+        out = StringIO()
+        call_command('backfill_content_hashes', '--batch-size', '1', stdout=out)
+        self.assertIn('Hashed 2 questions', out.getvalue())
+        self.assertIn(f'1 duplicate questions left without a hash: {third.id}', out.getvalue())
+        first.refresh_from_db()
+        self.assertEqual(first.content_hash, first.compute_content_hash())
+        self.assertIsNone(Question.objects.get(id=third.id).content_hash)
+
+
+class ExplainHotQueriesTests(QuizTestCase):
+    """
+    Tests for the query plan checker.
+    """
+
+    def test_hot_queries_use_indexes(self):
+        make_questions(self.science, 15)
+        User.objects.create_user('player')
+        out = StringIO()
+        call_command('explain_hot_queries', stdout=out)
+        self.assertIn('no full table scans', out.getvalue())
+        self.assertFalse(QuizSession.objects.exists())
+
+    def test_full_scans_resolve_aliases(self):
+        command = explain_hot_queries.Command()
+        command.scanned = explain_hot_queries.SQLITE_SCAN
+        sql = 'SELECT 1 FROM "auth_user" WHERE "id" IN (SELECT U0."user_id" FROM "quiz_quizsession" U0)'
+        plan = ['SEARCH auth_user USING INTEGER PRIMARY KEY (rowid=?)', 'SCAN U0', 'SCAN subquery-1',
+                'SCAN quiz_question USING COVERING INDEX quiz_question_cat_diff_idx']
+        self.assertEqual(command.full_scans(sql, plan), {'quiz_quizsession'})
+
+
+class HomePageCacheTests(QuizTestCase):
+    """
+    Tests for the cached home page fragments.
+    """
+
+    def test_warm_home_page_skips_quiz_queries(self):
+        make_questions(self.science, 3)
+        session = make_session(make_questions(self.history, 2), category=self.history)
+        complete_session(session)
+        with CaptureQueriesContext(connection) as cold:
+            response = self.client.get(reverse('quiz:home'))
+        self.assertContains(response, '3 questions')
+        self.assertContains(response, 'Recent Quiz Activity')
+        self.assertTrue(any('quiz_category' in q['sql'] for q in cold.captured_queries))
+        with CaptureQueriesContext(connection) as warm:
+            self.client.get(reverse('quiz:home'))
+        self.assertFalse(any('"quiz_' in q['sql'] for q in warm.captured_queries))
+
+    def test_question_changes_invalidate_catalog(self):
+        make_questions(self.science, 3)
+        self.client.get(reverse('quiz:home'))
+        make_questions(self.science, 1)
+        self.assertContains(self.client.get(reverse('quiz:home')), '4 questions')
+        Question.objects.filter(category=self.science).first().delete()
+        self.assertContains(self.client.get(reverse('quiz:home')), '3 questions')
+
+    def test_recent_sessions_expire(self):
+        self.client.get(reverse('quiz:home'))
+        session = make_session(make_questions(self.science, 2), category=self.science)
+        complete_session(session)
+        self.assertNotContains(self.client.get(reverse('quiz:home')), 'Recent Quiz Activity')
+        cache.delete(make_template_fragment_key('home_recent'))
+        self.assertContains(self.client.get(reverse('quiz:home')), 'Recent Quiz Activity')
+
+
+class SQLiteTuningTests(TestCase):
+    """
+    Tests for the SQLite performance mode.
+    """
+
+    def test_pragmas_applied_to_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class SQLiteStressTests(unittest.TestCase):
+    """
+    The stress command opens its own scratch databases, which Django's
+    TestCase would refuse to connect to.
+    """
+
+    def test_stress_has_no_locked_errors_when_tuned(self):
+        out = StringIO()
+        call_command('stress_sqlite', '--writers', '4', '--readers', '1', '--answers', '10', stdout=out)
+        modes = json.loads(out.getvalue())['modes']
+        self.assertEqual(modes['default']['journal_mode'], 'delete')
+        tuned = modes['tuned']
+        self.assertEqual((tuned['journal_mode'], tuned['locked_errors'], tuned['answers_written']), ('wal', 0, 40))
+
+
+class AsyncEndpointTests(QuizTestCase):
+    """
+    Tests for the async JSON endpoints served through the ASGI handler.
+    """
+
+    async def test_submit_and_details(self):
+        questions = await sync_to_async(make_questions)(self.science, 2)
+        session = await sync_to_async(make_session)(questions, self.science)
+        response = await self.async_client.post(reverse('quiz:submit_answer'), {
+            'session_id': session.id, 'question_id': questions[0].id, 'selected_answer': 'A',
+        }, content_type='application/json')
+        self.assertTrue(response.json()['is_correct'])
+        self.assertIn('Server-Timing', response)
+        session = await QuizSession.objects.aget(id=session.id)
+        self.assertEqual((session.answered_count, session.current_order), (1, 2))
+
+        url = reverse('quiz:get_question_details', args=[questions[0].id])
+        response = await self.async_client.get(url, {'session_id': session.id})
+        self.assertEqual(json.loads(response.content)['user_answer'], 'A')
+        response = await self.async_client.get(reverse('quiz:get_question_details', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_view_queries_are_counted(self):
+        query_stats.reset()
+        questions = await sync_to_async(make_questions)(self.science, 2)
+        session = await sync_to_async(make_session)(questions, self.science)
+        response = await self.async_client.post(reverse('quiz:submit_answer'), {
+            'session_id': session.id, 'question_id': questions[0].id, 'selected_answer': 'A',
+        }, content_type='application/json')
+        queries = int(response['Server-Timing'].split('desc="')[1].split()[0])
+        self.assertGreater(queries, 0)
+        self.assertEqual(query_stats.report()['quiz:submit_answer']['max_queries'], queries)
+
+    async def test_async_budget_is_enforced(self):
+        with mock.patch.object(views.submit_answer, 'query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                await self.async_client.post(reverse('quiz:submit_answer'), {
+                    'session_id': 0, 'question_id': 0, 'selected_answer': 'A',
+                }, content_type='application/json')
+
+
+class SubmitAnswersTests(QuizTestCase):
+    """
+    Tests for the batch answer submission endpoint.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.questions = make_questions(self.science, 4)
+        self.session = make_session(self.questions, self.science)
+
+    def submit(self, answers, session_id=None):
+        return self.client.post(reverse('quiz:submit_answers'), {
+            'session_id': session_id or self.session.id, 'answers': answers,
+        }, content_type='application/json')
+
+    def test_batch_is_graded_and_idempotent(self):
+        q = self.questions
+        answers = [
+            {'question_id': q[0].id, 'selected_answer': 'A'},
+            {'question_id': q[2].id, 'selected_answer': 'B'},
+            {'question_id': q[1].id, 'selected_answer': 'A'},
+            {'question_id': q[1].id, 'selected_answer': 'C'},
+            {'question_id': 0, 'selected_answer': 'A'},
+            {'question_id': q[3].id, 'selected_answer': 'E'},
+        ]
+        results = self.submit(answers).json()['results']
+        self.assertEqual(
+            [(r['success'], r.get('duplicate'), r.get('is_correct')) for r in results],
+            [(True, False, True), (True, False, False), (True, False, True), (True, True, True),
+             (False, None, None), (False, None, None)]
+        )
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.answered_count, self.session.score, self.session.current_order), (3, 2, 4))
+
+        # A retry changes nothing and reports the stored grading
+        results = self.submit(answers[:3]).json()['results']
+        self.assertTrue(all(r['duplicate'] for r in results))
+        self.assertEqual([r['is_correct'] for r in results], [True, False, True])
+        self.assertEqual(UserAnswer.objects.filter(quiz_session=self.session).count(), 3)
+
+    def test_size_limit(self):
+        answers = [{'question_id': self.questions[0].id, 'selected_answer': 'A'}] * (views.MAX_BATCH_ANSWERS + 1)
+        response = self.submit(answers)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(UserAnswer.objects.exists())
+        self.assertEqual(self.submit([]).status_code, 400)
+
+    def test_question_outside_session_is_reported(self):
+        other = make_questions(self.history, 1)[0]
+        results = self.submit([
+            {'question_id': other.id, 'selected_answer': 'A'},
+            {'question_id': self.questions[0].id, 'selected_answer': 'A'},
+        ]).json()['results']
+        self.assertEqual([r['success'] for r in results], [False, True])
+        self.assertEqual(results[0]['error'], 'Question not in this session')
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.answered_count, self.session.current_order), (1, 2))
+
+    def test_malformed_input_is_a_client_error(self):
+        url = reverse('quiz:submit_answers')
+        self.assertEqual(self.client.post(url, [], content_type='application/json').status_code, 400)
+        self.assertEqual(self.submit([{'question_id': self.questions[0].id}], session_id='abc').status_code, 400)
+        results = self.submit([
+            {'question_id': self.questions[0].id, 'selected_answer': 'A', 'time_taken': 'slow'},
+            {'question_id': str(self.questions[1].id), 'selected_answer': 'A', 'time_taken': 3},
+            {'question_id': 'abc', 'selected_answer': 'A'},
+        ], session_id=str(self.session.id)).json()['results']
+        self.assertEqual([r['success'] for r in results], [False, True, False])
+        self.assertEqual(results[0]['error'], 'Invalid time_taken')
+        self.assertEqual(results[1]['question_id'], self.questions[1].id)
+        self.assertEqual(UserAnswer.objects.get().question_id, self.questions[1].id)
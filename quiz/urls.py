@@ -9,9 +9,11 @@ urlpatterns = [
     path('mixed-quiz/', views.start_mixed_quiz, name='start_mixed_quiz'),
     path('quiz/<int:session_id>/', views.quiz_question, name='quiz_question'),
     path('submit-answer/', views.submit_answer, name='submit_answer'),
+    path('submit-answers/', views.submit_answers, name='submit_answers'),
     path('results/<int:session_id>/', views.quiz_results, name='quiz_results'),
     path('revision/<int:session_id>/', views.revision_mode, name='revision_mode'),
     path('api/question-details/<int:question_id>/', views.get_question_details, name='get_question_details'),
     path('leaderboard/', views.leaderboard, name='leaderboard'),
     path('user-stats/', views.user_stats, name='user_stats'),
+    path('user-stats/history/', views.session_history, name='session_history'),
 ]
\ No newline at end of file
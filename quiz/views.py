@@ -1,140 +1,109 @@
-from django.shortcuts import render
-
 # Create your views here.
-from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.response import TemplateResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.utils import timezone
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Avg, Count
+from django.db.models import Q, Avg
 from django.core.paginator import Paginator
 import json
-import random
-from datetime import timedelta
 
-from .models import Category, Question, QuizSession, QuizQuestion, UserAnswer
+from .models import Category, Question, QuizSession, UserAnswer, UserCategoryStats, UserStats
+from . import adaptive, leaderboard as leaderboards
+from .home import home_context
+from .ingest import AnswerQueueFull, answer_writer, write_behind_enabled
+from .instrumentation import query_budget
+from .paginator import InvalidCursor, KeysetPaginator
+from .payloads import details_json, question_payloads
+from .results import summarize
+from .sampling import question_sampler, rating_sampler
+from .services import arecord_answer, arecord_answers, build_quiz_session, complete_session, cursor_quiz_question, grade_answer
+
+# Most answers accepted by one submit_answers request
+MAX_BATCH_ANSWERS = 50
+# Sessions per page of the session history
+SESSION_HISTORY_PAGE_SIZE = 20
+# Upper bound (exclusive, in seconds) of a batch answer's time_taken
+MAX_TIME_TAKEN = 24 * 60 * 60
+
+def parse_id(value):
+    """A JSON id as an int: numbers and numeric strings in the primary key
+    range, None for anything else"""
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        value = int(value)
+    if isinstance(value, int) and not isinstance(value, bool) and 0 < value < 2 ** 63:
+        return value
+    return None
 
+# Budgets are for a signed-in player: they include the session and user
+# lookups, and on pages the site and two permission queries of base.html
+@query_budget(7)
 def home(request):
     """Home page with category selection"""
-    categories = Category.objects.all().annotate(
-        question_count=Count('questions')
-    )
-    
-    # Get recent quiz sessions for stats
-    recent_sessions = QuizSession.objects.filter(
-        completed_at__isnull=False
-    ).order_by('-completed_at')[:5]
-    
-    context = {
-        'categories': categories,
-        'recent_sessions': recent_sessions,
-        'total_questions': Question.objects.count(),
-        'total_categories': categories.count(),
-    }
-    return render(request, 'quiz/home.html', context)
+    # Catalog and recent sessions come from versioned/short-lived caches
+    context = home_context()
+    return TemplateResponse(request, 'quiz/home.html', context)
 
+@query_budget(12)
 def start_quiz(request, category_id):
     """Start a category-specific quiz"""
     category = get_object_or_404(Category, id=category_id)
+    adaptive_pick = request.user.is_authenticated and adaptive.adaptive_setting('ENABLED')
+    sampler = rating_sampler if adaptive_pick else question_sampler
     
-    # Get questions for this category
-    questions = list(Question.objects.filter(category=category))
-    
-    if len(questions) < 5:
-        return render(request, 'quiz/error.html', {
+    if sampler.count(category_id=category.id) < 5:
+        return TemplateResponse(request, 'quiz/error.html', {
             'error_message': f'Not enough questions in {category.name} category. Minimum 5 questions required.'
         })
     
-    # Shuffle and limit to 10-15 questions
-    random.shuffle(questions)
-    quiz_questions = questions[:min(15, len(questions))]
-    
-    # Create quiz session
-    session = QuizSession.objects.create(
-        user=request.user if request.user.is_authenticated else None,
-        session_key=request.session.session_key,
-        category=category,
-        is_mixed=False,
-        total_questions=len(quiz_questions)
-    )
-    
-    # Add questions to session
-    for i, question in enumerate(quiz_questions):
-        QuizQuestion.objects.create(
-            quiz_session=session,
-            question=question,
-            order=i + 1
-        )
+    # Pick up to 15 questions: near the player's level when signed in,
+    # otherwise at random
+    if adaptive_pick:
+        quiz_questions = adaptive.select_questions(request.user, category, 15)
+    else:
+        quiz_questions = question_sampler.sample(15, category_id=category.id)
+    
+    # Create quiz session with its questions
+    session = build_quiz_session(request, quiz_questions, category=category).session
     
     return redirect('quiz:quiz_question', session_id=session.id)
 
+@query_budget(8)
 def start_mixed_quiz(request):
     """Start a mixed quiz with questions from all categories"""
-    # Get questions from all categories
-    all_questions = list(Question.objects.all())
-    
-    if len(all_questions) < 10:
-        return render(request, 'quiz/error.html', {
+    if question_sampler.count() < 10:
+        return TemplateResponse(request, 'quiz/error.html', {
             'error_message': 'Not enough questions available. Minimum 10 questions required for mixed quiz.'
         })
     
-    # Shuffle and select 15 questions
-    random.shuffle(all_questions)
-    quiz_questions = all_questions[:15]
-    
-    # Create quiz session
-    session = QuizSession.objects.create(
-        user=request.user if request.user.is_authenticated else None,
-        session_key=request.session.session_key,
-        category=None,
-        is_mixed=True,
-        total_questions=len(quiz_questions)
-    )
-    
-    # Add questions to session
-    for i, question in enumerate(quiz_questions):
-        QuizQuestion.objects.create(
-            quiz_session=session,
-            question=question,
-            order=i + 1
-        )
+    # Pick 15 random questions from all categories
+    quiz_questions = question_sampler.sample(15)
+    
+    # Create quiz session with its questions
+    session = build_quiz_session(request, quiz_questions).session
     
     return redirect('quiz:quiz_question', session_id=session.id)
 
+# The last request of a session also completes it (leaderboard, stats and ratings)
+@query_budget(25)
 def quiz_question(request, session_id):
     """Display current quiz question"""
-    session = get_object_or_404(QuizSession, id=session_id)
+    answer_writer.sync(session_id)
+    session = get_object_or_404(QuizSession.objects.select_related('category'), id=session_id)
     
-    # Get all questions for this session in order
-    quiz_questions = QuizQuestion.objects.filter(
-        quiz_session=session
-    ).select_related('question').order_by('order')
-    
-    # Get answered questions
-    answered_questions = UserAnswer.objects.filter(
-        quiz_session=session
-    ).values_list('question_id', flat=True)
-    
-    # Find next unanswered question
-    current_quiz_question = None
-    for qq in quiz_questions:
-        if qq.question.id not in answered_questions:
-            current_quiz_question = qq
-            break
+    # Read the next question from the session cursor
+    current_quiz_question = cursor_quiz_question(session)
     
     # If no more questions, redirect to results
     if not current_quiz_question:
-        session.completed_at = timezone.now()
-        session.score = UserAnswer.objects.filter(
-            quiz_session=session, 
-            is_correct=True
-        ).count()
-        session.save()
+        if session.completed_at is None:
+            complete_session(session)
         return redirect('quiz:quiz_results', session_id=session.id)
     
     # Calculate progress
-    current_question_number = len(answered_questions) + 1
-    progress_percentage = (len(answered_questions) / session.total_questions) * 100
+    answered_count = current_quiz_question.answered_count
+    current_question_number = answered_count + 1
+    progress_percentage = (answered_count / session.total_questions) * 100
     
     context = {
         'session': session,
@@ -145,10 +114,11 @@ def quiz_question(request, session_id):
         'time_remaining': 30,  # 30 seconds per question
     }
     
-    return render(request, 'quiz/question.html', context)
+    return TemplateResponse(request, 'quiz/question.html', context)
 
 @csrf_exempt
-def submit_answer(request):
+@query_budget(7)
+async def submit_answer(request):
     """Submit answer via AJAX"""
     if request.method == 'POST':
         try:
@@ -158,27 +128,28 @@ def submit_answer(request):
             selected_answer = data.get('selected_answer')
             time_taken = data.get('time_taken', 0)
             
-            session = get_object_or_404(QuizSession, id=session_id)
-            question = get_object_or_404(Question, id=question_id)
-            
-            is_correct = selected_answer == question.correct_answer
+            session = await aget_object_or_404(QuizSession, id=session_id)
+            payload = await question_payloads.aget(question_id)
             
-            # Save user answer
-            UserAnswer.objects.create(
-                quiz_session=session,
-                question=question,
-                selected_answer=selected_answer,
-                is_correct=is_correct,
-                time_taken=timedelta(seconds=time_taken)
-            )
+            # Save user answer and advance the session cursor, or queue
+            # it for the background writer
+            if write_behind_enabled():
+                answer = await answer_writer.asubmit(session, question_id, selected_answer, payload.correct_answer, time_taken)
+            else:
+                answer = await arecord_answer(session, question_id, selected_answer, payload.correct_answer, time_taken)
             
             return JsonResponse({
                 'success': True,
-                'is_correct': is_correct,
-                'correct_answer': question.correct_answer,
-                'explanation': question.explanation
+                'is_correct': answer.is_correct,
+                'correct_answer': payload.correct_answer,
+                'explanation': payload.explanation
             })
             
+        except AnswerQueueFull as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=503)
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -187,46 +158,100 @@ def submit_answer(request):
     
     return JsonResponse({'success': False, 'error': 'Invalid request method'})
 
+@csrf_exempt
+@query_budget(9)
+async def submit_answers(request):
+    """Submit several answers of one session at once (offline and slow clients)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+    try:
+        data = json.loads(request.body)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'error': 'Request body must be a JSON object'}, status=400)
+    session_id = parse_id(data.get('session_id'))
+    if session_id is None:
+        return JsonResponse({'success': False, 'error': 'session_id must be a number'}, status=400)
+    items = data.get('answers')
+    if not isinstance(items, list) or not items:
+        return JsonResponse({'success': False, 'error': 'answers must be a non-empty list'}, status=400)
+    if len(items) > MAX_BATCH_ANSWERS:
+        return JsonResponse({
+            'success': False,
+            'error': f'At most {MAX_BATCH_ANSWERS} answers per request'
+        }, status=413)
+    
+    session = await aget_object_or_404(QuizSession, id=session_id)
+    items = [item if isinstance(item, dict) else {} for item in items]
+    question_ids = [parse_id(item.get('question_id')) for item in items]
+    payloads = await question_payloads.aget_many({question_id for question_id in question_ids if question_id is not None})
+    
+    # Grade every answer against one payload fetch; invalid items are reported, not saved
+    results, answers = [], []
+    for item, question_id in zip(items, question_ids):
+        selected_answer = item.get('selected_answer')
+        time_taken = item.get('time_taken', 0)
+        payload = payloads.get(question_id)
+        if payload is None:
+            results.append({'question_id': item.get('question_id'), 'success': False, 'error': 'Unknown question'})
+        elif selected_answer not in ('A', 'B', 'C', 'D'):
+            results.append({'question_id': question_id, 'success': False, 'error': 'Invalid answer'})
+        elif isinstance(time_taken, bool) or not isinstance(time_taken, (int, float)) or not 0 <= time_taken < MAX_TIME_TAKEN:
+            results.append({'question_id': question_id, 'success': False, 'error': 'Invalid time_taken'})
+        else:
+            answer = grade_answer(session, question_id, selected_answer, payload.correct_answer, time_taken)
+            answers.append(answer)
+            results.append(answer)
+    
+    # Queued single answers of this session must be saved before the batch
+    await answer_writer.await_written(session.id)
+    written, stored = await arecord_answers(answers) if answers else ([], {})
+    written = {id(answer) for answer in written}
+    
+    for i, result in enumerate(results):
+        if isinstance(result, UserAnswer):
+            payload = payloads[result.question_id]
+            duplicate = id(result) not in written
+            if duplicate and result.question_id not in stored:
+                results[i] = {'question_id': result.question_id, 'success': False, 'error': 'Question not in this session'}
+                continue
+            selected_answer = stored[result.question_id] if duplicate else result.selected_answer
+            results[i] = {
+                'question_id': result.question_id,
+                'success': True,
+                'duplicate': duplicate,
+                'is_correct': selected_answer == payload.correct_answer,
+                'correct_answer': payload.correct_answer,
+                'explanation': payload.explanation,
+            }
+    
+    return JsonResponse({'success': True, 'results': results})
+
+@query_budget(7)
 def quiz_results(request, session_id):
     """Display quiz results"""
-    session = get_object_or_404(QuizSession, id=session_id)
-    answers = UserAnswer.objects.filter(
-        quiz_session=session
-    ).select_related('question').order_by('answered_at')
-    
-    # Calculate statistics
-    correct_count = answers.filter(is_correct=True).count()
-    incorrect_count = answers.filter(is_correct=False).count()
-    percentage = session.get_percentage()
-    
-    # Category breakdown for mixed quiz
-    category_stats = {}
-    if session.is_mixed:
-        for answer in answers:
-            cat_name = answer.question.category.name
-            if cat_name not in category_stats:
-                category_stats[cat_name] = {'correct': 0, 'total': 0, 'half_total': 0,}
-            category_stats[cat_name]['total'] += 1
-            if answer.is_correct:
-                category_stats[cat_name]['correct'] += 1
-    
-        for cat, stats in category_stats.items():
-            stats['half_total'] = stats['total'] / 2
-
+    answer_writer.sync(session_id)
+    session = get_object_or_404(QuizSession.objects.select_related('category'), id=session_id)
+    
+    # Counts and category breakdown from one grouped query (cached once completed)
+    summary = summarize(session)
+    
     context = {
         'session': session,
-        'answers': answers,
-        'correct_count': correct_count,
-        'incorrect_count': incorrect_count,
-        'percentage': percentage,
+        'correct_count': summary['correct_count'],
+        'incorrect_count': summary['incorrect_count'],
+        'percentage': session.get_percentage(),
         'performance_message': session.get_performance_message(),
-        'category_stats': category_stats,
+        'category_stats': summary['category_stats'],
     }
     
-    return render(request, 'quiz/results.html', context)
+    return TemplateResponse(request, 'quiz/results.html', context)
 
+@query_budget(8)
 def revision_mode(request, session_id):
     """Review mode with detailed explanations"""
+    answer_writer.sync(session_id)
     session = get_object_or_404(QuizSession, id=session_id)
     answers = UserAnswer.objects.filter(
         quiz_session=session
@@ -242,98 +267,95 @@ def revision_mode(request, session_id):
         'answers': answers,
     }
     
-    return render(request, 'quiz/revision.html', context)
+    return TemplateResponse(request, 'quiz/revision.html', context)
 
-def get_question_details(request, question_id):
+@query_budget(4)
+async def get_question_details(request, question_id):
     """API endpoint for question details (for modals)"""
-    question = get_object_or_404(Question, id=question_id)
+    try:
+        payload = await question_payloads.aget(question_id)
+    except Question.DoesNotExist:
+        raise Http404('No Question matches the given query.')
     
     # Get user's answer if available
     user_answer = None
     if request.GET.get('session_id'):
         try:
             session_id = int(request.GET.get('session_id'))
-            answer = UserAnswer.objects.get(
+            await answer_writer.await_written(session_id)
+            user_answer = await UserAnswer.objects.filter(
                 quiz_session_id=session_id,
-                question=question
-            )
-            user_answer = answer.selected_answer
-        except (UserAnswer.DoesNotExist, ValueError):
+                question_id=question_id
+            ).values_list('selected_answer', flat=True).afirst()
+        except ValueError:
             pass
     
-    return JsonResponse({
-        'id': question.id,
-        'question': question.question_text,
-        'options': question.get_options(),
-        'correct_answer': question.correct_answer,
-        'explanation': question.explanation,
-        'explanations': question.get_explanations(),
-        'reference_link': question.reference_link,
-        'user_answer': user_answer,
-        'category': question.category.name,
-        'difficulty': question.difficulty_level,
-    })
+    return HttpResponse(details_json(payload, user_answer), content_type='application/json')
 
+@query_budget(6)
 def leaderboard(request):
     """Display leaderboard of top performers"""
-    # Get top sessions by percentage
-    top_sessions = QuizSession.objects.filter(
-        completed_at__isnull=False,
-        total_questions__gt=0
-    ).extra(
-        select={'percentage': '(score * 100.0 / total_questions)'}
-    ).order_by('-percentage', '-score', 'started_at')[:20]
+    # Read the materialized board, optionally for one category
+    category = None
+    if request.GET.get('category', '').isdigit():
+        category = get_object_or_404(Category, id=request.GET['category'])
+    top_sessions = leaderboards.top_entries(category)
     
     context = {
         'top_sessions': top_sessions,
+        'category': category,
     }
     
-    return render(request, 'quiz/leaderboard.html', context)
+    return TemplateResponse(request, 'quiz/leaderboard.html', context)
 
 @login_required
+@query_budget(8)
 def user_stats(request):
     """Display user statistics"""
     user_sessions = QuizSession.objects.filter(
         user=request.user,
         completed_at__isnull=False
-    ).order_by('-started_at')
-    
-    # Calculate statistics
-    total_sessions = user_sessions.count()
-    if total_sessions > 0:
-        avg_score = sum(s.get_percentage() for s in user_sessions) / total_sessions
-        best_score = max(s.get_percentage() for s in user_sessions)
-        total_questions_answered = sum(s.total_questions for s in user_sessions)
-        total_correct = sum(s.score for s in user_sessions)
-    else:
-        avg_score = best_score = total_questions_answered = total_correct = 0
+    ).select_related('category').order_by('-started_at')
+    
+    # Totals come from the pre-aggregated rollup
+    totals = UserStats.objects.filter(user=request.user).first() or UserStats(user=request.user)
     
     # Category performance
     category_performance = {}
-    for session in user_sessions:
-        if session.category:
-            cat_name = session.category.name
-            if cat_name not in category_performance:
-                category_performance[cat_name] = {'sessions': 0, 'total_score': 0, 'total_questions': 0}
-            category_performance[cat_name]['sessions'] += 1
-            category_performance[cat_name]['total_score'] += session.score
-            category_performance[cat_name]['total_questions'] += session.total_questions
-    
-    # Calculate percentages for categories
-    for cat_data in category_performance.values():
-        if cat_data['total_questions'] > 0:
-            cat_data['percentage'] = round((cat_data['total_score'] / cat_data['total_questions']) * 100)
-        else:
-            cat_data['percentage'] = 0
+    for cat_stats in UserCategoryStats.objects.filter(user=request.user).select_related('category').order_by('category__name'):
+        category_performance[cat_stats.category.name] = {
+            'sessions': cat_stats.sessions,
+            'total_score': cat_stats.total_score,
+            'total_questions': cat_stats.total_questions,
+            'percentage': cat_stats.get_percentage(),
+        }
     
     context = {
         'user_sessions': user_sessions[:10],  # Recent 10 sessions
-        'total_sessions': total_sessions,
-        'avg_score': round(avg_score, 1),
-        'best_score': best_score,
-        'total_questions_answered': total_questions_answered,
-        'total_correct': total_correct,
+        'total_sessions': totals.total_sessions,
+        'avg_score': totals.get_average_percentage(),
+        'best_score': totals.best_percentage,
+        'total_questions_answered': totals.total_questions,
+        'total_correct': totals.total_correct,
         'category_performance': category_performance,
     }
     
-    return render(request, 'quiz/user_stats.html', context)
\ No newline at end of file
+    return TemplateResponse(request, 'quiz/user_stats.html', context)
+
+@login_required
+@query_budget(6)
+def session_history(request):
+    """All of the user's completed sessions, newest first"""
+    sessions = QuizSession.objects.filter(
+        user=request.user,
+        completed_at__isnull=False
+    ).select_related('category')
+    
+    # Keyset pages: the last page costs the same as the first
+    paginator = KeysetPaginator(sessions, SESSION_HISTORY_PAGE_SIZE, ['-started_at', '-id'])
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        page = paginator.page()
+    
+    return TemplateResponse(request, 'quiz/session_history.html', {'page': page})
@@ -0,0 +1,18 @@
+"""
+ASGI config for quizsite project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server, e.g. ``uvicorn quizsite.asgi:application``, so
+the async quiz endpoints share one event loop per process.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "quizsite.settings.dev")
+
+application = get_asgi_application()
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "quiz.middleware.QueryBudgetMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -86,12 +87,46 @@ WSGI_APPLICATION = "quizsite.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+# The database profile is selected by environment: with POSTGRES_DB set the
+# site runs on PostgreSQL (see docker-compose.yml), otherwise on the SQLite file.
+#
+# PostgreSQL connections come from psycopg's pool, one pool per process. Each
+# gunicorn worker serves GUNICORN_THREADS requests at once, so that is the pool's
+# max_size; the server needs max_connections >= WEB_CONCURRENCY * GUNICORN_THREADS.
+# POSTGRES_POOL=0 switches to persistent connections (CONN_MAX_AGE) with health
+# checks instead, for setups where a pooler such as PgBouncer sits in front.
+
+if os.environ.get("POSTGRES_DB"):
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ["POSTGRES_DB"],
+            "USER": os.environ.get("POSTGRES_USER", "postgres"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        }
+    }
+    if os.environ.get("POSTGRES_POOL", "1") != "0":
+        threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+        DATABASES["default"]["OPTIONS"] = {
+            "pool": {
+                "min_size": 1,
+                "max_size": threads,
+                # Fail a request instead of queueing it forever on a starved pool
+                "timeout": 10,
+            },
+        }
+    else:
+        DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("POSTGRES_CONN_MAX_AGE", "60"))
+        DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        }
     }
-}
 
 
 # Password validation
@@ -180,3 +215,67 @@ WAGTAILADMIN_BASE_URL = "http://example.com"
 # if untrusted users are allowed to upload files -
 # see https://docs.wagtail.org/en/stable/advanced_topics/deploying.html#user-uploaded-files
 WAGTAILDOCS_EXTENSIONS = ['csv', 'docx', 'key', 'odt', 'pdf', 'pptx', 'rtf', 'txt', 'xlsx', 'zip']
+
+
+# Quiz settings
+
+# Cache of serialized questions used by the answer and question-details APIs.
+# MAX_BYTES bounds the in-process LRU tier, LOCAL_TTL (seconds) bounds how long
+# another process's edits can go unnoticed, and BACKEND optionally names a
+# Django cache alias (see CACHES) used as a shared second tier.
+QUIZ_QUESTION_CACHE = {
+    "MAX_BYTES": 8 * 1024 * 1024,
+    "LOCAL_TTL": 300,
+    "BACKEND": None,
+}
+
+# Write-behind mode for submit_answer. When ENABLED, graded answers go into a
+# bounded in-process queue (MAX_QUEUE) and a background thread saves them every
+# FLUSH_INTERVAL_MS or BATCH_SIZE answers. A full queue makes submit_answer
+# answer 503 after PUT_TIMEOUT seconds. Reads of a session wait up to
+# SYNC_TIMEOUT seconds for its queued answers. The queue is per process, so
+# only enable this when a quiz's requests are served by one process.
+QUIZ_ANSWER_WRITE_BEHIND = {
+    "ENABLED": False,
+    "MAX_QUEUE": 10000,
+    "BATCH_SIZE": 200,
+    "FLUSH_INTERVAL_MS": 50,
+    "PUT_TIMEOUT": 1.0,
+    "SYNC_TIMEOUT": 5.0,
+}
+
+# SQLite performance mode, applied to every new connection by quiz.sqlite.
+# WAL lets readers run alongside the writer, synchronous=NORMAL is durable
+# across application crashes in WAL mode, writers wait up to BUSY_TIMEOUT_MS
+# for the lock, and transactions begin IMMEDIATE so a read-then-write
+# transaction queues for the lock instead of failing with "database is
+# locked". MMAP_SIZE is in bytes, CACHE_SIZE_KIB per connection.
+QUIZ_SQLITE_TUNING = {
+    "ENABLED": True,
+    "JOURNAL_MODE": "WAL",
+    "SYNCHRONOUS": "NORMAL",
+    "BUSY_TIMEOUT_MS": 5000,
+    "MMAP_SIZE": 256 * 1024 * 1024,
+    "CACHE_SIZE_KIB": 64 * 1024,
+    "TRANSACTION_MODE": "IMMEDIATE",
+}
+
+# Adaptive question selection for signed-in players (quiz.adaptive).
+# Category quizzes aim at questions the player answers correctly with
+# TARGET_SUCCESS odds, skipping the SEEN_LIMIT questions they were served
+# most recently in that category. Mixed quizzes stay uniformly random.
+QUIZ_ADAPTIVE = {
+    "ENABLED": True,
+    "TARGET_SUCCESS": 0.7,
+    "SEEN_LIMIT": 200,
+}
+
+# Per-request SQL instrumentation (quiz.middleware.QueryBudgetMiddleware).
+# SERVER_TIMING adds a Server-Timing header with DB, render and total time
+# (it shows clients how long queries take, so only dev.py turns it on);
+# STRICT_BUDGETS turns views exceeding their @query_budget into errors
+# instead of log warnings.
+QUIZ_INSTRUMENTATION = {
+    "SERVER_TIMING": False,
+    "STRICT_BUDGETS": False,
+}
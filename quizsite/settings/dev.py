@@ -11,6 +11,9 @@ ALLOWED_HOSTS = ["*"]
 
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+# Expose per-request DB and render timings to the browser's dev tools
+QUIZ_INSTRUMENTATION = {**QUIZ_INSTRUMENTATION, "SERVER_TIMING": True}
+
 
 try:
     from .local import *